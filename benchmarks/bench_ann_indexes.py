@@ -0,0 +1,94 @@
+"""
+Recall-vs-latency and memory of each index type against the exact flat index.
+
+    python -m benchmarks.bench_ann_indexes --vectors 200000 --dim 384
+    python -m benchmarks.bench_ann_indexes --from-index cases   # vectors of a persisted store
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import index_store
+from index_store import INDEX_TYPES, make_index
+
+
+def synthetic_vectors(n: int, d: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Clustered, L2-normalized vectors, closer to sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, d)).astype("float32")
+    vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal((n, d)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def stored_vectors(name: str) -> np.ndarray:
+    index = faiss.read_index(os.path.join(index_store.INDEX_DIR, f"{name}.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def evaluate(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies = []
+    found = np.empty_like(truth)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found[i] = ids[0]
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {
+        "recall_at_k": round(float(recall), 4),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)) * 1000, 4),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)) * 1000, 4),
+        "bytes_per_vector": round(faiss.serialize_index(index).nbytes / index.ntotal, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--from-index", help="evaluate on the vectors of a persisted store, e.g. cases")
+    args = parser.parse_args()
+
+    vectors = stored_vectors(args.from_index) if args.from_index else synthetic_vectors(args.vectors, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    # Perturb so queries are near, not identical to, stored vectors
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype("float32")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    # Evaluate the requested type even on small inputs
+    index_store.ANN_MIN_VECTORS = 0
+    results = []
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = make_index(vectors, index_type)
+        build = time.perf_counter() - start
+        row = {"index_type": index_type, "build_seconds": round(build, 3),
+               **evaluate(index, queries, truth, args.k)}
+        results.append(row)
+        print(json.dumps(row), file=sys.stderr)
+
+    print(json.dumps({
+        "benchmark": "ann_indexes",
+        "vectors": len(vectors), "dim": vectors.shape[1], "k": args.k,
+        "ivf_nprobe": index_store.IVF_NPROBE, "hnsw_ef_search": index_store.HNSW_EF_SEARCH,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Latency of filtered vs unfiltered similarity search, and what over-fetching would cost.
+
+    python -m benchmarks.bench_filtered_search --claims 1000000 --claims-per-case 10
+    python -m benchmarks.bench_filtered_search --index-type hnsw --vectors 200000
+
+Claims: the numeric engine unfiltered, excluding the query claim, and restricted to
+the query claim's case. Vectors: a LiveIndex queried unfiltered, with an
+exclude-self selector and with a same-case selector, against the post-filter
+baseline (fetch `--fetch-k` neighbours, drop the non-matching ones) and how often
+that baseline comes back with fewer than k results.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import index_store
+from benchmarks.bench_ann_indexes import synthetic_vectors
+from benchmarks.synthetic import case_number, claim_number
+from claims_similarity import RAW_FEATURES, ClaimsSimilarityEngine
+from index_store import INDEX_TYPES, faiss_from_vectors
+from index_sync import LiveIndex
+
+
+class _QueryVectors(Embeddings):
+    """Query text "i" maps to stored vector i, so no embedding model is needed."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.vectors[int(text)].tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(t) for t in texts]
+
+
+def _timed(run, queries) -> tuple[dict, list]:
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(run(query))
+        latencies.append(time.perf_counter() - start)
+    ms = np.asarray(latencies) * 1000
+    return {"ms_p50": round(float(np.percentile(ms, 50)), 4), "ms_p95": round(float(np.percentile(ms, 95)), 4)}, results
+
+
+def bench_claims(n: int, per_case: int, queries: int, k: int) -> dict:
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 500, (n, len(RAW_FEATURES))).round(2)
+    claims = pd.DataFrame(values, columns=RAW_FEATURES)
+    claims.insert(0, "claim_number", [claim_number(i) for i in range(n)])
+    claims.insert(0, "case_number", [case_number(i // per_case) for i in range(n)])
+    start = time.perf_counter()
+    engine = ClaimsSimilarityEngine(load_claims=lambda: claims)
+    build = time.perf_counter() - start
+
+    picked = claims["claim_number"].to_numpy()[rng.choice(n, queries, replace=False)]
+    report = {"claims": n, "claims_per_case": per_case, "engine_build_seconds": round(build, 3)}
+    for label, kwargs in (("unfiltered", {}), ("exclude_self", {"exclude_self": True}),
+                          ("same_case_exclude_self", {"same_case": True, "exclude_self": True})):
+        latency, results = _timed(lambda c: engine.similar_to_claim(c, k, **kwargs), picked)
+        report[label] = {**latency, "self_returned": sum(r[0][0].metadata["claim_number"] == c
+                                                          for r, c in zip(results, picked) if r)}
+    return report
+
+
+def bench_vectors(n: int, dim: int, per_case: int, index_type: str, queries: int, k: int, fetch_k: int) -> dict:
+    vectors = synthetic_vectors(n, dim)
+    # Cases are assigned at random, so a case's documents are spread across the space
+    cases = np.random.default_rng(2).integers(0, max(1, n // per_case), n)
+    index_store.ANN_MIN_VECTORS = 0
+    start = time.perf_counter()
+    store = faiss_from_vectors([str(i) for i in range(n)], vectors,
+                               [{"case_number": case_number(int(c)), "doc": i} for i, c in enumerate(cases)],
+                               _QueryVectors(vectors), index_type)
+    index = LiveIndex("bench", store, lambda: [], key_field="doc")
+    build = time.perf_counter() - start
+
+    picked = np.random.default_rng(1).choice(n, queries, replace=False)
+    report = {"vectors": n, "dim": dim, "index_type": index_type, "build_seconds": round(build, 3)}
+    index.filtered_similarity_search_with_score("0", k, exclude={"doc": 0})  # builds the position lists
+    index.filtered_similarity_search_with_score("0", k, where={"case_number": case_number(int(cases[0]))})
+
+    runs = {
+        "unfiltered": lambda q: index.similarity_search_with_score(str(q), k=k),
+        "exclude_self": lambda q: index.filtered_similarity_search_with_score(str(q), k, exclude={"doc": int(q)}),
+        "same_case": lambda q: index.filtered_similarity_search_with_score(
+            str(q), k, where={"case_number": case_number(int(cases[q]))}),
+        f"post_filter_same_case_fetch_{fetch_k}": lambda q: [
+            hit for hit in index.similarity_search_with_score(str(q), k=fetch_k)
+            if hit[0].metadata["case_number"] == case_number(int(cases[q]))][:k],
+    }
+    for label, run in runs.items():
+        latency, results = _timed(run, picked)
+        expected = [min(k, int((cases == cases[q]).sum())) if "same_case" in label else k for q in picked]
+        report[label] = {**latency, "short_results": sum(len(r) < e for r, e in zip(results, expected))}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--claims", type=int, default=200000)
+    parser.add_argument("--claims-per-case", type=int, default=10)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--docs-per-case", type=int, default=50)
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, default=100)
+    args = parser.parse_args()
+
+    claims = bench_claims(args.claims, args.claims_per_case, args.queries, args.k)
+    print(json.dumps(claims), file=sys.stderr)
+    vectors = bench_vectors(args.vectors, args.dim, args.docs_per_case, args.index_type,
+                            args.queries, args.k, args.fetch_k)
+    print(json.dumps({"benchmark": "filtered_search", "k": args.k, "claims_engine": claims,
+                      "vector_index": vectors}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Latency, memory and accuracy parity of the inference backends against torch.
+
+    python -m benchmarks.bench_inference_backends
+    python -m benchmarks.bench_inference_backends --kind embedding --backends torch onnx-int8 --check
+
+Each backend runs in a fresh process, so load time and RSS are its own. With
+--check the exit status is 1 when any backend misses a parity threshold.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import chat_questions, write_corpus
+from inference_backends import BACKENDS
+from load_data import iter_documents
+
+QUESTION_TEMPLATES = ("What is {}?", "Why is {} needed?", "How does {} work?", "Who uses {}?")
+
+
+def corpus(n: int, seed: int = 0) -> list[str]:
+    """Chunks of data.txt topped up with synthetic paragraphs."""
+    texts = [doc.page_content for doc in iter_documents(["data.txt"])]
+    if len(texts) < n:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.txt")
+            write_corpus(path, n - len(texts), seed)
+            texts += [doc.page_content for doc in iter_documents([path])]
+    return texts[:n]
+
+
+def qa_pairs(contexts: list[str], n: int) -> list[tuple[str, str]]:
+    pairs = []
+    for i in range(n):
+        context = contexts[i % len(contexts)]
+        subject = " ".join(context.split()[:3]).strip(".,")
+        pairs.append((QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(subject), context))
+    return pairs
+
+
+def _percentiles(latencies: list[float]) -> dict:
+    ms = np.asarray(latencies) * 1000
+    return {"ms_p50": round(float(np.percentile(ms, 50)), 3), "ms_p95": round(float(np.percentile(ms, 95)), 3)}
+
+
+def run_backend(kind: str, backend: str, texts: list[str], queries: list[str], pairs: list[tuple]) -> dict:
+    """Runs in a fresh process: load the model, then time it and collect its outputs."""
+    from sentencetransformer import _rss_bytes, get_embedding_model, get_model_stats, get_qa_pipeline
+
+    rss_start = _rss_bytes()
+    start = time.perf_counter()
+    model = get_embedding_model(backend=backend) if kind == "embedding" else get_qa_pipeline(backend=backend)
+    result = {"kind": kind, "backend": backend, "load_seconds": round(time.perf_counter() - start, 3)}
+
+    if kind == "embedding":
+        model.embed_query(queries[0])
+        latencies = []
+        query_vectors = []
+        for query in queries:
+            t = time.perf_counter()
+            query_vectors.append(model.embed_query(query))
+            latencies.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        doc_vectors = model.embed_documents(texts)
+        batch_seconds = time.perf_counter() - t
+        result.update(query_latency=_percentiles(latencies),
+                      docs_per_second=round(len(texts) / batch_seconds, 1),
+                      doc_vectors=np.asarray(doc_vectors, dtype="float32"),
+                      query_vectors=np.asarray(query_vectors, dtype="float32"))
+    else:
+        model(question=pairs[0][0], context=pairs[0][1])
+        latencies = []
+        answers = []
+        for question, context in pairs:
+            t = time.perf_counter()
+            answers.append(model(question=question, context=context))
+            latencies.append(time.perf_counter() - t)
+        result.update(latency=_percentiles(latencies), answers=answers)
+
+    result["rss_delta_mib"] = round((_rss_bytes() - rss_start) / 2**20, 1)
+    result["process_rss_mib"] = round(get_model_stats()["process_rss_bytes"] / 2**20, 1)
+    return result
+
+
+def _tokens_f1(a: str, b: str) -> float:
+    a_tokens, b_tokens = a.lower().split(), b.lower().split()
+    common = sum(min(a_tokens.count(t), b_tokens.count(t)) for t in set(a_tokens))
+    if not a_tokens or not b_tokens or not common:
+        return float(a_tokens == b_tokens)
+    precision, recall = common / len(a_tokens), common / len(b_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def embedding_parity(reference: dict, candidate: dict, k: int) -> dict:
+    ref, cand = reference["doc_vectors"], candidate["doc_vectors"]
+    cosine = np.sum(ref * cand, axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(cand, axis=1))
+
+    def topk(queries, docs):
+        return np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+
+    ref_top = topk(reference["query_vectors"], ref)
+    cand_top = topk(candidate["query_vectors"], cand)
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)])
+    return {"cosine_mean": round(float(cosine.mean()), 5), "cosine_min": round(float(cosine.min()), 5),
+            f"retrieval_overlap_at_{k}": round(float(recall), 4)}
+
+
+def qa_parity(reference: dict, candidate: dict) -> dict:
+    pairs = list(zip(reference["answers"], candidate["answers"]))
+    return {
+        "exact_match": round(float(np.mean([a["answer"] == b["answer"] for a, b in pairs])), 4),
+        "answer_f1": round(float(np.mean([_tokens_f1(a["answer"], b["answer"]) for a, b in pairs])), 4),
+        "score_abs_delta_mean": round(float(np.mean([abs(a["score"] - b["score"]) for a, b in pairs])), 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--kind", nargs="+", default=["embedding", "qa"], choices=["embedding", "qa"])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="exit 1 when a backend misses a threshold")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--min-retrieval-overlap", type=float, default=0.9)
+    parser.add_argument("--min-answer-f1", type=float, default=0.9)
+    args = parser.parse_args()
+
+    texts = corpus(args.docs)
+    queries = chat_questions(args.queries)
+    pairs = qa_pairs(texts, args.queries)
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+
+    results, failures = [], []
+    for kind in args.kind:
+        reference = None
+        for backend in backends:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                run = executor.submit(run_backend, kind, backend, texts, queries, pairs).result()
+            if reference is None:
+                reference = run
+            if kind == "embedding":
+                parity = embedding_parity(reference, run, args.k)
+                if parity["cosine_min"] < args.min_cosine or parity[f"retrieval_overlap_at_{args.k}"] < args.min_retrieval_overlap:
+                    failures.append(f"{kind}/{backend}")
+            else:
+                parity = qa_parity(reference, run)
+                if parity["answer_f1"] < args.min_answer_f1:
+                    failures.append(f"{kind}/{backend}")
+            row = {k: v for k, v in run.items() if k not in ("doc_vectors", "query_vectors", "answers")}
+            row["parity_vs_torch"] = parity
+            results.append(row)
+            print(json.dumps(row), file=sys.stderr)
+
+    print(json.dumps({
+        "benchmark": "inference_backends", "cpu_count": os.cpu_count(),
+        "docs": len(texts), "queries": len(queries), "results": results, "parity_failures": failures,
+    }, indent=2))
+    if args.check and failures:
+        print(f"FAIL: below parity thresholds: {', '.join(failures)}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
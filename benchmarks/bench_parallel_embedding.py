@@ -0,0 +1,56 @@
+"""
+Docs/sec of index-build embedding versus worker count.
+
+    python -m benchmarks.bench_parallel_embedding --docs 20000 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel_embed import ParallelEmbedder
+from sentencetransformer import get_embedding_model
+
+WORDS = ("system crash export report login failure admin certificate sync latency node "
+         "patch update claim rate units discount expected workflow dashboard review").split()
+
+
+def synthetic_texts(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(8, 40))) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.docs)
+    results = []
+    for workers in args.workers:
+        start = time.perf_counter()
+        if workers == 1:
+            # Baseline: the in-process path used when EMBED_WORKERS=1
+            get_embedding_model().embed_documents(texts)
+        else:
+            with ParallelEmbedder(workers) as embedder:
+                embedder.embed(texts)
+        elapsed = time.perf_counter() - start
+        results.append({"workers": workers, "docs": len(texts), "seconds": round(elapsed, 3),
+                        "docs_per_second": round(len(texts) / elapsed, 1)})
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    base = results[0]["docs_per_second"]
+    for r in results:
+        r["speedup"] = round(r["docs_per_second"] / base, 2)
+    print(json.dumps({"benchmark": "parallel_embedding", "cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+End-to-end benchmark on synthetic data: index build, cold start, per-mode latency
+through build_graph(...).invoke and throughput under concurrent load.
+
+    python -m benchmarks.bench_pipeline --rows 10000 --output results/10k.json
+    python -m benchmarks.bench_pipeline --rows 999000 --modes case claim qc --requests 100
+
+Models are loaded from the local Hugging Face cache (offline) unless --online is given.
+Runs with the same arguments and seed use identical data and request sequences.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import case_number, chat_questions, claim_number, populate_database, write_corpus
+
+MODES = ("case", "claim", "batch", "chat", "qc")
+# Settings that change results; recorded with every run
+RECORDED_ENV = ("CASES_INDEX_TYPE", "CHAT_INDEX_TYPE", "EMBED_WORKERS", "GRAPH_MAX_CONCURRENCY",
+                "QA_MAX_BATCH_SIZE", "QA_MAX_WAIT_MS", "CHAT_TOP_K", "QUERY_CACHE_SIZE", "QC_MAX_CONCURRENCY")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000, help="cases and claims to generate")
+    parser.add_argument("--cases", type=int, help="overrides --rows for cases")
+    parser.add_argument("--claims", type=int, help="overrides --rows for claims")
+    parser.add_argument("--paragraphs", type=int, help="chat corpus lines (default rows/10, at least 100)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per mode")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per mode")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--throughput-requests", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep generated data and indexes here (default: temporary)")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--online", action="store_true", help="allow model downloads")
+    parser.add_argument("--startup-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.cases = args.cases or args.rows
+    args.claims = args.claims or args.rows
+    args.paragraphs = args.paragraphs or max(100, args.rows // 10)
+    return args
+
+
+def configure_environment(workdir: str, online: bool) -> None:
+    """Point the app at the synthetic data; must run before any app module is imported."""
+    os.environ["SQLITE_PATH"] = os.path.join(workdir, "cases.sqlite3")
+    os.environ["VECTOR_INDEX_DIR"] = os.path.join(workdir, "indexes")
+    os.environ["CHAT_DATA_PATHS"] = os.path.join(workdir, "corpus.txt")
+    # Background refreshes would compete with the measured requests
+    os.environ["CASE_INDEX_SYNC_INTERVAL"] = "0"
+    os.environ["CLAIM_ENGINE_REFRESH_INTERVAL"] = "0"
+    if not online:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+
+def start_app() -> tuple:
+    """Import and build everything chain_app warms up at start-up; returns (graph, timings)."""
+    timings = {}
+    start = time.perf_counter()
+    from claims_similarity import get_claims_engine
+    from graph import build_graph
+    from vector_store_case_data import get_case_index
+    from vector_store_chat_data import build_vectorstore
+    timings["import_seconds"] = time.perf_counter() - start
+
+    step = time.perf_counter()
+    get_case_index()
+    timings["case_index_seconds"] = time.perf_counter() - step
+    step = time.perf_counter()
+    get_claims_engine()
+    timings["claims_engine_seconds"] = time.perf_counter() - step
+    step = time.perf_counter()
+    vectorstore = build_vectorstore(os.environ["CHAT_DATA_PATHS"].split(","))
+    timings["chat_index_seconds"] = time.perf_counter() - step
+    step = time.perf_counter()
+    graph = build_graph(vectorstore)
+    timings["graph_compile_seconds"] = time.perf_counter() - step
+    timings["total_seconds"] = time.perf_counter() - start
+    return graph, {k: round(v, 3) for k, v in timings.items()}
+
+
+def measure_cold_start(args) -> dict:
+    """Start a fresh interpreter against the already persisted indexes."""
+    command = [sys.executable, "-m", "benchmarks.bench_pipeline", "--startup-only", "--workdir", args.workdir]
+    if args.online:
+        command.append("--online")
+    start = time.perf_counter()
+    output = subprocess.run(command, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    wall = time.perf_counter() - start
+    return {"process_seconds": round(wall, 3), **json.loads(output)}
+
+
+def make_requests(mode: str, n: int, args, rng: random.Random) -> list[dict]:
+    def state(question: str, graph_mode: str = "similarity") -> dict:
+        return {"question": question, "context": "", "answer": "", "mode": graph_mode}
+
+    if mode == "case":
+        return [state(case_number(rng.randrange(args.cases))) for _ in range(n)]
+    if mode == "claim":
+        return [state(claim_number(rng.randrange(args.claims))) for _ in range(n)]
+    if mode == "batch":
+        return [state(" ".join(
+            [case_number(rng.randrange(args.cases)) for _ in range(3)]
+            + [claim_number(rng.randrange(args.claims)) for _ in range(2)]
+        )) for _ in range(n)]
+    if mode == "chat":
+        return [state(q, "chat") for q in chat_questions(n, seed=rng.randrange(2**31))]
+    return [state(case_number(rng.randrange(args.cases)), "qc") for _ in range(n)]
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(ms),
+        "ms_mean": round(float(ms.mean()), 3),
+        "ms_p50": round(float(np.percentile(ms, 50)), 3),
+        "ms_p95": round(float(np.percentile(ms, 95)), 3),
+        "ms_p99": round(float(np.percentile(ms, 99)), 3),
+        "ms_max": round(float(ms.max()), 3),
+    }
+
+
+def timed_invoke(graph, state: dict) -> float:
+    start = time.perf_counter()
+    graph.invoke(state)
+    return time.perf_counter() - start
+
+
+def measure_latency(graph, states: list[dict], warmup: int) -> dict:
+    for state in states[:warmup]:
+        graph.invoke(state)
+    return latency_summary([timed_invoke(graph, state) for state in states[warmup:]])
+
+
+def measure_throughput(graph, states: list[dict], concurrency: int) -> dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(lambda s: timed_invoke(graph, s), states))
+    elapsed = time.perf_counter() - start
+    return {"concurrency": concurrency, "requests_per_second": round(len(states) / elapsed, 2),
+            **latency_summary(latencies)}
+
+
+def environment_info() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "env": {name: os.environ[name] for name in RECORDED_ENV if name in os.environ},
+    }
+
+
+def main():
+    args = parse_args()
+    if args.startup_only:
+        configure_environment(args.workdir, args.online)
+        _, timings = start_app()
+        print(json.dumps(timings))
+        return
+
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.makedirs(args.workdir, exist_ok=True)
+    configure_environment(args.workdir, args.online)
+
+    start = time.perf_counter()
+    populate_database(os.environ["SQLITE_PATH"], args.cases, args.claims, args.seed)
+    write_corpus(os.environ["CHAT_DATA_PATHS"], args.paragraphs, args.seed)
+    generation = round(time.perf_counter() - start, 3)
+    print(f"Generated {args.cases} cases, {args.claims} claims, {args.paragraphs} paragraphs in {generation}s",
+          file=sys.stderr)
+
+    # Indexes are built from scratch here (empty index dir) and persisted for the cold start
+    graph, build = start_app()
+    print(f"Index build: {json.dumps(build)}", file=sys.stderr)
+    cold = measure_cold_start(args)
+    print(f"Cold start: {json.dumps(cold)}", file=sys.stderr)
+
+    rng = random.Random(args.seed)
+    latency = {}
+    for mode in args.modes:
+        latency[mode] = measure_latency(graph, make_requests(mode, args.warmup + args.requests, args, rng), args.warmup)
+        print(f"{mode}: {json.dumps(latency[mode])}", file=sys.stderr)
+
+    per_mode = {mode: make_requests(mode, args.throughput_requests, args, rng) for mode in args.modes}
+    mixed = [per_mode[args.modes[i % len(args.modes)]][i] for i in range(args.throughput_requests)]
+    throughput = []
+    for concurrency in args.concurrency:
+        throughput.append(measure_throughput(graph, mixed, concurrency))
+        print(f"throughput: {json.dumps(throughput[-1])}", file=sys.stderr)
+
+    results = {
+        "benchmark": "pipeline",
+        "scale": {"cases": args.cases, "claims": args.claims, "paragraphs": args.paragraphs, "seed": args.seed},
+        "environment": environment_info(),
+        "data_generation_seconds": generation,
+        "index_build": build,
+        "cold_start": cold,
+        "latency": latency,
+        "throughput": throughput,
+    }
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
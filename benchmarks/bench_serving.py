@@ -0,0 +1,167 @@
+"""
+Memory per app worker and throughput as workers are added, with the indexes in a
+shared retrieval service versus loaded by every worker.
+
+    python -m benchmarks.bench_serving --rows 100000 --workers 1 2 4 8
+    python -m benchmarks.bench_serving --modes case claim --requests 500
+
+Each worker is a separate process running build_graph(...).invoke. All workers of
+a step start their measured requests at the same moment; throughput is the total
+requests over the time until the last one finishes.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_pipeline import configure_environment, environment_info, latency_summary, make_requests
+from benchmarks.synthetic import populate_database, write_corpus
+
+MODES = ("case", "claim", "batch", "chat")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="cases and claims to generate")
+    parser.add_argument("--paragraphs", type=int, help="chat corpus lines (default rows/10, at least 100)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per worker")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep generated data and indexes here (default: temporary)")
+    parser.add_argument("--online", action="store_true", help="allow model downloads")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.cases = args.claims = args.rows
+    args.paragraphs = args.paragraphs or max(100, args.rows // 10)
+    return args
+
+
+def run_worker(args) -> dict:
+    """One app worker: warm up, report memory, then run its requests from --start-at."""
+    from graph import build_graph
+    from sentencetransformer import _rss_bytes
+
+    graph = build_graph()
+    rng = random.Random(args.seed + os.getpid())
+    per_mode = {mode: make_requests(mode, args.requests, args, rng) for mode in args.modes}
+    for mode in args.modes:
+        graph.invoke(per_mode[mode][0])
+    rss = _rss_bytes()
+
+    states = [per_mode[args.modes[i % len(args.modes)]][i] for i in range(args.requests)]
+    time.sleep(max(0.0, args.start_at - time.time()))
+    latencies = []
+    for state in states:
+        start = time.perf_counter()
+        graph.invoke(state)
+        latencies.append(time.perf_counter() - start)
+    return {"rss_mib": round(rss / 2**20, 1), "finished_at": time.time(), "latencies": latencies}
+
+
+def run_step(args, workers: int, service_url: str) -> dict:
+    """Start `workers` worker processes, wait for all of them and aggregate."""
+    env = {**os.environ, "RETRIEVAL_SERVICE_URL": service_url, "STARTUP_WARMUP": "0"}
+    # Generous head start: every worker loads the QA model before the measured requests
+    start_at = time.time() + 30 + 5 * workers
+    command = [sys.executable, "-m", "benchmarks.bench_serving", "--worker", "--start-at", str(start_at),
+               "--rows", str(args.rows), "--paragraphs", str(args.paragraphs), "--requests", str(args.requests),
+               "--seed", str(args.seed), "--modes", *args.modes]
+    processes = [subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+    reports = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise SystemExit(f"Worker failed with status {process.returncode}")
+        reports.append(json.loads(output.strip().splitlines()[-1]))
+
+    elapsed = max(r["finished_at"] for r in reports) - start_at
+    latencies = [latency for r in reports for latency in r["latencies"]]
+    return {
+        "workers": workers,
+        "retrieval_service": bool(service_url),
+        "worker_rss_mib": [r["rss_mib"] for r in reports],
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        **latency_summary(latencies),
+    }
+
+
+def _process_rss_mib(pid: int) -> float:
+    with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def start_service(port: int) -> tuple:
+    env = {**os.environ, "RETRIEVAL_SERVICE_PORT": str(port), "RETRIEVAL_SERVICE_URL": ""}
+    service = subprocess.Popen([sys.executable, "-m", "retrieval_service"], cwd=ROOT, env=env)
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    while True:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=5) as response:
+                health = json.loads(response.read())
+            if len(health["ready"]) == len(health["resources"]):
+                return service, url, round(time.perf_counter() - start, 3)
+            failed = [name for name, state in health["resources"].items() if state["state"] == "failed"]
+            if failed:
+                raise SystemExit(f"Retrieval service failed to load {', '.join(failed)}")
+        except OSError:
+            if service.poll() is not None:
+                raise SystemExit("Retrieval service exited")
+        time.sleep(0.5)
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="bench_serving_")
+    os.makedirs(args.workdir, exist_ok=True)
+    configure_environment(args.workdir, args.online)
+    populate_database(os.environ["SQLITE_PATH"], args.cases, args.claims, args.seed)
+    write_corpus(os.environ["CHAT_DATA_PATHS"], args.paragraphs, args.seed)
+
+    # Builds and persists the indexes, so in-process workers below only load them
+    service, url, service_ready = start_service(args.port)
+    try:
+        print(f"Retrieval service ready in {service_ready}s", file=sys.stderr)
+        steps = []
+        for workers in args.workers:
+            steps.append(run_step(args, workers, url))
+            print(json.dumps(steps[-1]), file=sys.stderr)
+        service_rss = _process_rss_mib(service.pid)
+    finally:
+        service.terminate()
+        service.wait()
+
+    in_process = run_step(args, 1, "")
+    print(json.dumps(in_process), file=sys.stderr)
+    print(json.dumps({
+        "benchmark": "serving",
+        "scale": {"cases": args.cases, "claims": args.claims, "paragraphs": args.paragraphs, "seed": args.seed},
+        "environment": environment_info(),
+        "service_ready_seconds": service_ready,
+        "service_rss_mib": service_rss,
+        "in_process_worker": in_process,
+        "with_retrieval_service": steps,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
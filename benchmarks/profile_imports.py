@@ -0,0 +1,90 @@
+"""
+Import-time profile of an app module, from `python -X importtime`.
+
+    python -m benchmarks.profile_imports                        # chain_app
+    python -m benchmarks.profile_imports --module graph --budget-seconds 1.5
+
+Exits with status 1 when the import exceeds --budget-seconds or pulls in a
+module from --forbid, so a heavy import creeping back into start-up is caught.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded in the background or on first use, never by importing the app
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "sklearn", "matplotlib", "pandas", "faiss")
+
+
+def profile(module: str) -> list[dict]:
+    """(module, self_us, cumulative_us) for every import, in import order."""
+    env = {**os.environ, "STARTUP_WARMUP": "0", "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Importing {module} failed")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="chain_app")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-seconds", type=float, help="fail when the import takes longer")
+    parser.add_argument("--forbid", nargs="*", default=list(HEAVY_MODULES),
+                        help="fail when any of these top-level packages is imported")
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    target = next(r for r in reversed(rows) if r["module"] == args.module)
+    imported = {r["module"] for r in rows}
+    forbidden = sorted(name for name in args.forbid if name in imported)
+    # Top-level packages ranked by the time their first import took, dependencies included
+    packages = {}
+    for r in rows:
+        top = r["module"].split(".")[0]
+        if r["module"] == top and top != args.module:
+            packages[top] = packages.get(top, 0) + r["cumulative_us"]
+
+    report = {
+        "benchmark": "import_profile",
+        "module": args.module,
+        "total_seconds": round(target["cumulative_us"] / 1e6, 3),
+        "modules_imported": len(rows),
+        "forbidden_imported": forbidden,
+        "top_packages_ms": {name: round(us / 1000, 1) for name, us in
+                            sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]},
+        "top_self_ms": {r["module"]: round(r["self_us"] / 1000, 1) for r in
+                        sorted(rows, key=lambda r: -r["self_us"])[:args.top]},
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if args.budget_seconds is not None and report["total_seconds"] > args.budget_seconds:
+        failures.append(f"import took {report['total_seconds']}s (budget {args.budget_seconds}s)")
+    if forbidden:
+        failures.append(f"heavy modules imported: {', '.join(forbidden)}")
+    if failures:
+        print(f"FAIL: {'; '.join(failures)}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Seeded synthetic cases, claims and chat corpora for the benchmarks.
+
+Identifiers follow the app's 4-6 digit pattern (MR1000-MR999999, CL1000-CL999999),
+so at most 999,000 cases and 999,000 claims can be generated.
+"""
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from oracle_client import init_memory_db
+
+MAX_IDS = 999000
+WORDS = ("system crash export report login failure admin certificate sync latency node "
+         "patch update claim rate units discount expected workflow dashboard review "
+         "timeout database replica backup restore invoice payment provider member").split()
+
+
+def case_number(i: int) -> str:
+    return f"MR{1000 + i}"
+
+
+def claim_number(i: int) -> str:
+    return f"CL{1000 + i}"
+
+
+def sentence(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def populate_database(path: str, cases: int, claims: int, seed: int = 0, mismatch_rate: float = 0.05) -> None:
+    """Replace the tables in the SQLite file at `path` with `cases` cases and `claims` claims
+    spread over them; `mismatch_rate` of the claims carry a pricing error."""
+    if cases > MAX_IDS or claims > MAX_IDS:
+        raise ValueError(f"At most {MAX_IDS} cases and claims fit the identifier pattern")
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    init_memory_db(conn)
+    conn.execute("DELETE FROM claims_table")
+    conn.execute("DELETE FROM cases_table")
+    conn.executemany(
+        "INSERT INTO cases_table (case_number, case_description, case_comments) VALUES (?, ?, ?)",
+        ((case_number(i), sentence(rng, 4, 10), sentence(rng, 4, 14)) for i in range(cases)),
+    )
+
+    def claim_rows():
+        for i in range(claims):
+            base_rate, units = rng.randint(50, 200), rng.randint(1, 10)
+            discount = rng.randint(0, base_rate)
+            calculated = base_rate * units - discount
+            expected = calculated
+            if rng.random() < mismatch_rate:
+                expected += rng.choice((-1, 1)) * rng.randint(5, 60)
+            yield claim_number(i), case_number(rng.randrange(cases)), base_rate, units, discount, calculated, expected
+
+    conn.executemany(
+        "INSERT INTO claims_table (claim_number, case_number, base_rate, units, discount, "
+        "calculated_amount, expected_amount) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        claim_rows(),
+    )
+    conn.commit()
+    conn.close()
+
+
+def write_corpus(path: str, paragraphs: int, seed: int = 0) -> None:
+    """Chat knowledge base in the data.txt layout: one paragraph per line."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(paragraphs):
+            f.write(". ".join(sentence(rng, 6, 18) for _ in range(rng.randint(2, 8))) + ".\n")
+
+
+def chat_questions(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [f"What is the {' '.join(rng.choices(WORDS, k=3))}?" for _ in range(n)]
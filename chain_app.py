@@ -1,15 +1,33 @@
+import asyncio
+import os
 import chainlit as cl
-from vector_store_chat_data import build_vectorstore
 from graph import build_graph
-from time import sleep
+from graph_runner import GraphRunner, GraphBusyError
+from qa_batcher import get_qa_batcher
+from query_cache import get_cache_stats
+from nodes import get_similarity_index
+from oracle_client import get_db_stats
+from qc_runs import get_qc_runs, COMPLETED, FAILED
+from metrics import start_metrics_server
+from startup import start_warmup
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Opt-in PCA plot of similarity results, rendered after the table has been sent
+SIMILARITY_PLOT = os.environ.get("SIMILARITY_PLOT", "0") == "1"
+# Seconds between progress polls of a background QC run
+QC_POLL_INTERVAL = float(os.environ.get("QC_POLL_INTERVAL", "1"))
+
+MODE_LABELS = {"chat": "💬 Chat", "similarity": "🔍 Similarity", "qc": "🧪 QC Nurse"}
+
 try:
-    vectorstore = build_vectorstore("data.txt")
-    graph = build_graph(vectorstore)
+    # Models and indexes load in the background; the graph itself is cheap to build
+    warmup = start_warmup()
+    graph = build_graph()
+    runner = GraphRunner(graph)
+    start_metrics_server()
 except Exception as e:
     logger.error(f"Initialization failed: {str(e)}")
     raise
@@ -27,8 +45,10 @@ async def start():
     try:
         #cl.user_session.set("mode", "chat")
 
+        loading = [MODE_LABELS[m] for m in MODE_LABELS if not warmup.is_ready(m)]
+        note = f"\n⏳ Still loading: {', '.join(loading)}" if loading else ""
         await cl.Message(
-            content="## 🚀 Business Data Assistant\nSelect a mode:",
+            content=f"## 🚀 Business Data Assistant\nSelect a mode:{note}",
             actions=[
                 create_action("set_chat_mode", "💬 Chat Mode", "Ask business questions", {"mode": "chat"}),
                 create_action("set_similarity_mode", "🔍 Similarity Search", "Find similar cases", {"mode": "similarity"}),
@@ -49,7 +69,112 @@ async def on_similarity_action(action: cl.Action):
 
 @cl.action_callback("set_qc_mode")
 async def on_qc_action(action: cl.Action):
-    await handle_mode_change("qc", "🧪 **QC Nurse Mode Activated**\nEnter Case Number for QC Task:")
+    await handle_mode_change("qc", "🧪 **QC Nurse Mode Activated**\nEnter Case Number for QC Task (`status <run id>`, `resume <run id>` and `runs` track background runs):")
+
+def read_uploaded_csv(message: cl.Message) -> str:
+    texts = []
+    for element in message.elements or []:
+        path = getattr(element, "path", None)
+        if path and (element.name or "").lower().endswith(".csv"):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                texts.append(f.read())
+    return "\n".join(texts)
+
+def render_similarity_plot(result: dict):
+    from vector_plot import plot_similarity_results
+
+    docs_and_scores = result.get("retrieved_docs") or []
+    if len(docs_and_scores) < 2:
+        return None
+    vectors = get_similarity_index(result.get("similarity_source", "case")).vectors_for(
+        [doc for doc, _ in docs_and_scores]
+    )
+    if vectors is None:
+        return None
+    png, _ = plot_similarity_results(docs_and_scores, vectors)
+    return png
+
+async def attach_similarity_plot(msg: cl.Message, result: dict):
+    try:
+        png = await asyncio.to_thread(render_similarity_plot, result)
+        if png:
+            await cl.Image(name="similarity_plot.png", content=png, display="inline").send(for_id=msg.id)
+    except Exception as e:
+        logger.error(f"Similarity plot failed: {str(e)}")
+
+async def follow_qc_run(msg: cl.Message, run_id: str):
+    """Stream a background QC run's checkpointed progress into `msg` until it ends."""
+    try:
+        shown = 0
+        while True:
+            status = await asyncio.to_thread(get_qc_runs().status, run_id)
+            for line in status["report"][shown:]:
+                await msg.stream_token(line + "\n")
+            shown = len(status["report"])
+            if status["status"] == COMPLETED and status["failed_claims"]:
+                await msg.stream_token(f"\n**{len(status['failed_claims'])} claims failed QC**\n"
+                                       + "\n".join(f"• {claim}" for claim in status["failed_claims"]))
+            if status["status"] == FAILED:
+                await msg.stream_token(f"⚠️ QC run failed: {status['error']}\nSend `resume {run_id}` to continue it.")
+            if status["status"] in (COMPLETED, FAILED):
+                break
+            await asyncio.sleep(QC_POLL_INTERVAL)
+        await msg.update()
+    except Exception as e:
+        logger.error(f"Following QC run {run_id} failed: {str(e)}")
+
+async def handle_qc_message(question: str):
+    """QC runs execute on background workers; `status <id>`, `resume <id>` and `runs` inspect them."""
+    qc_runs = get_qc_runs()
+    command, _, run_id = question.partition(" ")
+    command, run_id = command.lower(), run_id.strip()
+
+    if command == "runs":
+        runs = await asyncio.to_thread(qc_runs.list_runs)
+        lines = [f"- `{r['run_id']}` {r['question']}: {r['status']}" for r in runs]
+        await cl.Message(content="\n".join(lines) or "No QC runs yet").send()
+        return
+    if command == "status" and run_id:
+        status = await asyncio.to_thread(qc_runs.status, run_id)
+        if status is None:
+            await cl.Message(content=f"❌ Unknown QC run `{run_id}`").send()
+            return
+        await cl.Message(content=(
+            f"QC run `{run_id}` ({status['case_number'] or status['question']}): **{status['status']}**, "
+            f"{status['reviewed']}/{status['claims']} claims reviewed, {len(status['failed_claims'])} failed\n"
+            + "\n".join(status["report"])
+        )).send()
+        return
+    if command == "resume" and run_id:
+        resumed = await asyncio.to_thread(qc_runs.resume, run_id)
+        if not resumed:
+            await cl.Message(content=f"❌ QC run `{run_id}` is unknown or did not fail").send()
+            return
+    else:
+        run_id = await asyncio.to_thread(qc_runs.submit, question)
+
+    msg = cl.Message(content=f"🧪 QC run `{run_id}` queued (send `status {run_id}` any time)\n")
+    await msg.send()
+    # Progress is followed in the background so this request is not held open
+    asyncio.create_task(follow_qc_run(msg, run_id))
+
+async def modes_not_ready_reply(mode: str) -> bool:
+    """Tell the user `mode` is still loading (or failed to load); False when it is ready."""
+    missing = warmup.missing(mode)
+    if not missing:
+        return False
+    errors = warmup.errors(mode)
+    if errors:
+        content = (f"⚠️ {MODE_LABELS[mode]} mode failed to load ("
+                   + "; ".join(f"{k}: {v}" for k, v in errors.items()) + "). Retrying in the background.")
+        warmup.retry(mode)
+    else:
+        content = f"⏳ {MODE_LABELS[mode]} mode is still loading ({', '.join(missing)}). Please try again shortly."
+    ready = [MODE_LABELS[m] for m in warmup.ready_modes()]
+    if ready:
+        content += f"\nReady now: {', '.join(ready)}"
+    await cl.Message(content=content).send()
+    return True
 
 async def handle_mode_change(new_mode: str, message: str):
     try:
@@ -74,34 +199,72 @@ async def on_message(message: cl.Message):
             return
 
         question = message.content.strip()
+        if mode == "similarity":
+            # Identifiers from uploaded CSV files are appended and handled as one batch
+            uploaded = await asyncio.to_thread(read_uploaded_csv, message)
+            question = f"{question}\n{uploaded}".strip()
         if not question:
             await cl.Message(content="❌ Please enter a question").send()
             return
 
+        if await modes_not_ready_reply(mode):
+            return
+
+        if mode == "qc":
+            await handle_qc_message(question)
+            return
+
         msg = cl.Message(content="")
         await msg.send()
 
-        result = graph.invoke({
-            "question": question,
-            "context": "",
-            "answer": "",
-            "mode": mode
-        })
-
-        answer = result.get("answer", "No answer generated")
+        # "custom" items are partial answer chunks emitted by nodes; "values" is the running state
+        result = {}
+        streamed = False
+        try:
+            async for stream_mode, chunk in runner.astream({
+                "question": question,
+                "context": "",
+                "answer": "",
+                "mode": mode
+            }, stream_mode=["custom", "values"]):
+                if stream_mode == "custom":
+                    await msg.stream_token(chunk)
+                    streamed = True
+                else:
+                    result = chunk
+        except GraphBusyError:
+            logger.warning(f"Rejected request, graph runner saturated: {runner.stats()}")
+            await msg.stream_token("⚠️ The assistant is busy right now. Please try again shortly.")
+            await msg.update()
+            return
+        # The stats calls take locks; only gather them when they will be logged
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Graph runner: {runner.stats()}")
+            if mode == "chat":
+                logger.debug(f"QA batcher: {get_qa_batcher().stats()}")
+            logger.debug(f"Query caches: {get_cache_stats()}")
+            logger.debug(f"Database: {get_db_stats()}")
 
-        for word in answer:
-            await msg.stream_token(word)
-            sleep(0.03)
+        if not streamed:
+            await msg.stream_token(result.get("answer", "No answer generated"))
 
         await msg.update()
 
+        if result.get("batch_csv"):
+            await cl.File(
+                name="similarity_results.csv",
+                content=result["batch_csv"].encode("utf-8"),
+                display="inline"
+            ).send(for_id=msg.id)
+
+        if SIMILARITY_PLOT and mode == "similarity" and result.get("similarity_source"):
+            # Fire-and-forget so the table answer is never delayed by plotting
+            asyncio.create_task(attach_similarity_plot(msg, result))
+
     except Exception as e:
         logger.error(f"Message error: {str(e)}")
         await cl.Message(content=f"⚠️ Error: {str(e)}").send()
 
-graph.get_graph().print_ascii()
-
 if __name__ == "__main__":
     from chainlit.cli import run_chainlit
     graph.get_graph().print_ascii()
@@ -0,0 +1,285 @@
+# claims_similarity.py (numeric k-NN engine for claims)
+import logging
+import os
+import re
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+from langchain_core.documents import Document
+from oracle_client import fetch_claim_block_sums, fetch_claims_in_blocks, get_claims_data
+from metrics import span
+from retrieval_service import connect_remote
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Seconds between change checks against claims_table (0 disables the background refresh)
+REFRESH_INTERVAL = float(os.environ.get("CLAIM_ENGINE_REFRESH_INTERVAL", "30"))
+# Seconds between full reloads, which also pick up changes the block sums cannot see
+# (e.g. values swapped between claims of one block) and re-standardize the features
+FULL_REFRESH_INTERVAL = float(os.environ.get("CLAIM_ENGINE_FULL_REFRESH_INTERVAL", "600"))
+# Distance-matrix cells computed per block (~64 MiB of float32) in batch queries
+BLOCK_CELLS = 16 * 2**20
+
+RAW_FEATURES = ["base_rate", "units", "discount", "calculated_amount", "expected_amount"]
+
+
+def feature_matrix(raw: np.ndarray) -> np.ndarray:
+    """Raw claim columns (n x 5) plus derived pricing fields, as float32."""
+    raw = np.asarray(raw, dtype="float32").reshape(-1, len(RAW_FEATURES))
+    base_rate, units, discount, calculated, expected = raw.T
+    derived = np.column_stack([
+        calculated - expected,                    # calculated vs expected delta
+        base_rate * units - discount - calculated,  # recomputation error
+    ])
+    return np.hstack([raw, derived]).astype("float32")
+
+
+class _Snapshot:
+    """Immutable normalized matrix; replaced wholesale on refresh so readers never lock."""
+
+    def __init__(self, claims_df: "pd.DataFrame", version: int, stats: tuple = None, blocks=None):
+        self.version = version
+        self.frame = claims_df.reset_index(drop=True)
+        self.claim_numbers = self.frame["claim_number"].to_numpy()
+        self.case_numbers = self.frame["case_number"].to_numpy()
+        self.raw = self.frame[RAW_FEATURES].to_numpy()
+        # Claim blocks as oracle_client.CLAIM_BLOCK_SQL computes them
+        if blocks is None:
+            blocks = self.frame["claim_number"].astype(str).str[:-3]
+        self.blocks = blocks.reset_index(drop=True)
+
+        features = feature_matrix(self.raw)
+        if stats is not None:
+            self.mean, self.std = stats
+        else:
+            self.mean = features.mean(axis=0) if len(features) else np.zeros(features.shape[1], "float32")
+            std = features.std(axis=0) if len(features) else np.ones(features.shape[1], "float32")
+            self.std = np.where(std > 0, std, 1.0).astype("float32")
+        self.matrix = np.ascontiguousarray((features - self.mean) / self.std, dtype="float32")
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.row_of = dict(zip(self.claim_numbers, range(len(self.claim_numbers))))
+        # case number -> its claims' row indices (ascending), for same-case search
+        self.rows_of_case = self.frame.groupby("case_number", sort=False).indices
+
+    def updated(self, blocks: list[str], claims_df: "pd.DataFrame", version: int) -> "_Snapshot":
+        """
+        Copy with the claims of `blocks` replaced by `claims_df` (their current rows).
+        The standardization is kept, so unchanged claims keep their vectors; a full
+        refresh recomputes it.
+        """
+        import pandas as pd
+
+        keep = ~self.blocks.isin(blocks).to_numpy()
+        frames, block_parts = [self.frame[keep]], [self.blocks[keep]]
+        if len(claims_df):
+            frames.append(claims_df[self.frame.columns])
+            block_parts.append(claims_df["claim_number"].astype(str).str[:-3])
+        return _Snapshot(pd.concat(frames, ignore_index=True), version, stats=(self.mean, self.std),
+                         blocks=pd.concat(block_parts, ignore_index=True))
+
+    def normalize(self, raw: np.ndarray) -> np.ndarray:
+        return (feature_matrix(raw) - self.mean) / self.std
+
+
+class ClaimsSimilarityEngine:
+    """
+    k-NN over standardized claim pricing features with vectorized squared-L2
+    distances. Scores follow FAISS L2 semantics (lower is more similar).
+    """
+
+    def __init__(self, load_claims=get_claims_data, load_block_sums=None, load_blocks=None):
+        """
+        `load_claims` reads the whole table. With `load_block_sums` (per-block sums,
+        see oracle_client.fetch_claim_block_sums) and `load_blocks` (the claims of some
+        blocks), refresh() re-reads only the blocks that changed since the last one.
+        """
+        self._load_claims = load_claims
+        self._load_block_sums = load_block_sums
+        self._load_blocks = load_blocks
+        self._block_sums = None
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.refresh(full=True)
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def refresh(self, full: bool = False) -> int:
+        """Apply claims_table changes; returns the number of claim blocks re-read (-1 for all)."""
+        version = self._snapshot.version + 1 if self._snapshot is not None else 0
+        if self._load_block_sums is None:
+            self._snapshot = _Snapshot(self._load_claims(), version)
+            return -1
+
+        # Sums are read before the rows: a change in between is seen again next time
+        sums = self._load_block_sums()
+        if full or self._snapshot is None:
+            self._snapshot = _Snapshot(self._load_claims(), version)
+            self._block_sums = sums
+            return -1
+
+        changed = sorted(block for block in sums.keys() | self._block_sums.keys()
+                         if sums.get(block) != self._block_sums.get(block))
+        if changed:
+            self._snapshot = self._snapshot.updated(changed, self._load_blocks(changed), version)
+            logger.info(f"Refreshed {len(changed)} changed claim blocks")
+        self._block_sums = sums
+        return len(changed)
+
+    def start(self, interval_seconds: float, full_interval_seconds: float = FULL_REFRESH_INTERVAL) -> None:
+        if self._thread is not None or interval_seconds <= 0:
+            return
+
+        def run():
+            last_full = time.monotonic()
+            while not self._stop.wait(interval_seconds):
+                try:
+                    full = full_interval_seconds > 0 and time.monotonic() - last_full >= full_interval_seconds
+                    self.refresh(full=full)
+                    if full:
+                        last_full = time.monotonic()
+                except Exception as e:
+                    logger.error(f"Claims engine refresh failed: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name="refresh-claims-engine", daemon=True)
+        self._thread.start()
+
+    def _topk(self, snap: _Snapshot, queries: np.ndarray, k: int, rows: np.ndarray = None,
+              exclude: np.ndarray = None):
+        """
+        Indices and squared distances of the k nearest rows for each query row.
+        `rows` (ascending) restricts the search to those rows before any distance is
+        computed; `exclude` gives one row per query to leave out (-1 for none).
+        Excluded or missing neighbours come back with an infinite distance.
+        """
+        matrix, sq_norms = snap.matrix, snap.sq_norms
+        if rows is not None:
+            matrix, sq_norms = matrix[rows], sq_norms[rows]
+        n = len(matrix)
+        k = min(k, n)
+        queries = np.asarray(queries, dtype="float32")
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        if exclude is not None:
+            # Position of each excluded row within `matrix`, -1 when it is not a candidate
+            exclude = np.asarray(exclude, dtype="int64")
+            if rows is not None:
+                at = np.clip(np.searchsorted(rows, exclude), 0, max(n - 1, 0))
+                exclude = np.where((exclude >= 0) & (rows[at] == exclude), at, -1)
+
+        best_idx = np.empty((len(queries), 0), dtype="int64")
+        best_dist = np.empty((len(queries), 0), dtype="float32")
+        block_rows = max(1024, BLOCK_CELLS // max(len(queries), 1))
+        for start in range(0, n, block_rows):
+            block = matrix[start:start + block_rows]
+            dist = sq_norms[start:start + block_rows][None, :] - 2 * queries @ block.T + q_norms[:, None]
+            np.maximum(dist, 0, out=dist)
+            if exclude is not None:
+                hit = (exclude >= start) & (exclude < start + len(block))
+                dist[np.nonzero(hit)[0], exclude[hit] - start] = np.inf
+            kb = min(k, dist.shape[1])
+            idx = np.argpartition(dist, kb - 1, axis=1)[:, :kb]
+            best_idx = np.hstack([best_idx, idx + start])
+            best_dist = np.hstack([best_dist, np.take_along_axis(dist, idx, axis=1)])
+            if best_idx.shape[1] > k:
+                keep = np.argpartition(best_dist, k - 1, axis=1)[:, :k]
+                best_idx = np.take_along_axis(best_idx, keep, axis=1)
+                best_dist = np.take_along_axis(best_dist, keep, axis=1)
+
+        order = np.argsort(best_dist, axis=1)
+        best_idx = np.take_along_axis(best_idx, order, axis=1)
+        if rows is not None:
+            best_idx = rows[best_idx]
+        return best_idx, np.take_along_axis(best_dist, order, axis=1)
+
+    def _document(self, snap: _Snapshot, i: int) -> Document:
+        return Document(
+            page_content=" ".join(str(v) for v in snap.raw[i]),
+            metadata={"case_number": snap.case_numbers[i], "claim_number": snap.claim_numbers[i]},
+        )
+
+    def search_vectors(self, queries: np.ndarray, k: int = 5, case_number: str = None,
+                       exclude_claims: list[str] = None) -> list[list[tuple[Document, float]]]:
+        """
+        Batch k-NN for already-normalized query vectors, optionally among the claims
+        of `case_number` only and without `exclude_claims[i]` in the results of query i.
+        """
+        snap = self._snapshot
+        rows = None
+        if case_number is not None:
+            rows = snap.rows_of_case.get(case_number)
+            if rows is None:
+                return [[] for _ in range(len(queries))]
+        exclude = None
+        if exclude_claims is not None:
+            exclude = [snap.row_of.get(claim, -1) for claim in exclude_claims]
+        if not len(snap.matrix) or not len(queries):
+            return [[] for _ in range(len(queries))]
+        with span("claims_knn") as s:
+            s.size = len(queries)
+            indices, distances = self._topk(snap, queries, k, rows, exclude)
+        return [
+            [(self._document(snap, int(i)), float(d)) for i, d in zip(row_idx, row_dist) if np.isfinite(d)]
+            for row_idx, row_dist in zip(indices, distances)
+        ]
+
+    def search_values(self, values_rows, k: int = 5, case_number: str = None,
+                      exclude_claims: list[str] = None) -> list[list[tuple[Document, float]]]:
+        """Batch k-NN for raw (base_rate, units, discount, calculated, expected) rows."""
+        snap = self._snapshot
+        return self.search_vectors(snap.normalize(np.asarray(values_rows, dtype="float32")), k,
+                                   case_number, exclude_claims)
+
+    def similar_to_claim(self, claim_number: str, k: int = 5, same_case: bool = False,
+                         exclude_self: bool = False) -> list[tuple[Document, float]]:
+        """Nearest claims to a stored claim, optionally within its own case and without itself."""
+        snap = self._snapshot
+        row = snap.row_of.get(claim_number)
+        if row is None:
+            return []
+        return self.search_vectors(
+            snap.matrix[row:row + 1], k,
+            case_number=snap.case_numbers[row] if same_case else None,
+            exclude_claims=[claim_number] if exclude_self else None,
+        )[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 5) -> list[tuple[Document, float]]:
+        """Free-text entry point: the first five numbers in `query` are the claim values."""
+        numbers = re.findall(r"-?\d+(?:\.\d+)?", query)
+        if len(numbers) < len(RAW_FEATURES):
+            return []
+        return self.search_values([[float(n) for n in numbers[:len(RAW_FEATURES)]]], k)[0]
+
+    def vectors_for(self, docs: list[Document]):
+        """Normalized feature vectors of `docs` by claim number, or None if any is missing."""
+        snap = self._snapshot
+        rows = [snap.row_of.get(doc.metadata.get("claim_number")) for doc in docs]
+        if any(row is None for row in rows):
+            return None
+        return snap.matrix[rows]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_claims_engine() -> ClaimsSimilarityEngine:
+    """Shared engine, or the retrieval service's when RETRIEVAL_SERVICE_URL is set."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                remote = connect_remote("claims")
+                if remote is not None:
+                    _engine = remote
+                else:
+                    _engine = ClaimsSimilarityEngine(load_block_sums=fetch_claim_block_sums,
+                                                     load_blocks=fetch_claims_in_blocks)
+                    _engine.start(REFRESH_INTERVAL)
+    return _engine
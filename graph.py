@@ -1,14 +1,21 @@
-from typing import TypedDict, Literal
-from langgraph.graph import StateGraph
+import operator
+import os
+from typing import Annotated, TypedDict, Literal
+from langgraph.graph import END, StateGraph
+from metrics import instrument_node
 from nodes import (
     oracle_fetch_node,
     get_similarity_node,
     format_case_table_node,
     format_claim_table_node,
+    batch_similarity_node,
+    format_batch_table_node,
     get_retriever_node,
     answer_node,
     qc_fetch_claims_node,
+    route_qc_fetch,
     qc_create_task_node,
+    route_qc_claims,
     qc_review_node,
     qc_check_complete_node,
     qc_finalize_node,
@@ -22,34 +29,50 @@ class QAState(TypedDict):
     mode: Literal["similarity", "chat", "qc"]
     case_number: str
     retrieved_docs: list
+    answer_score: float
+    similarity_source: str
+    identifiers: list[str]
+    batch_results: list
+    batch_csv: str
     qc_status: str
     qc_progress: list[str]
     qc_claims: list[str]
     qualified_claims: list[str]
-    reviewed_claims: list[str]
+    qc_claim_rows: list[dict]
+    # Merged from the parallel per-claim review branches
+    reviewed_claims: Annotated[list[str], operator.add]
+
+# Upper bound on nodes run at once within a step, i.e. parallel QC claim reviews
+QC_MAX_CONCURRENCY = int(os.environ.get("QC_MAX_CONCURRENCY", "16"))
+
+def add_node(builder: StateGraph, name: str, node) -> None:
+    """Add a node, timed as step `node:<name>` when metrics or tracing are enabled."""
+    builder.add_node(name, instrument_node(name, node))
 
 class GraphComponents:
     """Container class for organizing graph components."""
     
     @staticmethod
-    def core_nodes(builder: StateGraph, vectorstore) -> None:
+    def core_nodes(builder: StateGraph, vectorstore=None) -> None:
         """Add core question answering nodes."""
-        builder.add_node("oracle", oracle_fetch_node)
-        builder.add_node("similarity_case", get_similarity_node("case"))
-        builder.add_node("similarity_claim", get_similarity_node("claim"))
-        builder.add_node("format_case", format_case_table_node)
-        builder.add_node("format_claim", format_claim_table_node)
-        builder.add_node("retriever", get_retriever_node(vectorstore))
-        builder.add_node("qa", answer_node)
+        add_node(builder, "oracle", oracle_fetch_node)
+        add_node(builder, "similarity_case", get_similarity_node("case"))
+        add_node(builder, "similarity_claim", get_similarity_node("claim"))
+        add_node(builder, "format_case", format_case_table_node)
+        add_node(builder, "format_claim", format_claim_table_node)
+        add_node(builder, "similarity_batch", batch_similarity_node)
+        add_node(builder, "format_batch", format_batch_table_node)
+        add_node(builder, "retriever", get_retriever_node(vectorstore))
+        add_node(builder, "qa", answer_node)
     
     @staticmethod
     def qc_nodes(builder: StateGraph) -> None:
         """Add quality control workflow nodes."""
-        builder.add_node("qc_fetch", qc_fetch_claims_node)
-        builder.add_node("qc_task", qc_create_task_node)
-        builder.add_node("qc_review", qc_review_node)
-        builder.add_node("qc_check", qc_check_complete_node)
-        builder.add_node("qc_done", qc_finalize_node)
+        add_node(builder, "qc_fetch", qc_fetch_claims_node)
+        add_node(builder, "qc_task", qc_create_task_node)
+        add_node(builder, "qc_review", qc_review_node)
+        add_node(builder, "qc_check", qc_check_complete_node)
+        add_node(builder, "qc_done", qc_finalize_node)
     
     @staticmethod
     def routing(builder: StateGraph) -> None:
@@ -75,6 +98,7 @@ class GraphComponents:
             {
                 "similarity_case": "similarity_case",
                 "similarity_claim": "similarity_claim",
+                "similarity_batch": "similarity_batch",
                 "unsupported_case": "format_case",
                 "unsupported_claim": "format_claim"
             }
@@ -86,13 +110,18 @@ class GraphComponents:
         # Similarity flow edges
         builder.add_edge("similarity_case", "format_case")
         builder.add_edge("similarity_claim", "format_claim")
+        builder.add_edge("similarity_batch", "format_batch")
         
         # Chat flow edge
         builder.add_edge("retriever", "qa")
         
-        # QC workflow edges
-        builder.add_edge("qc_fetch", "qc_task")
-        builder.add_edge("qc_task", "qc_review")
+        GraphComponents.qc_edges(builder)
+
+    @staticmethod
+    def qc_edges(builder: StateGraph) -> None:
+        """Configure the QC workflow edges."""
+        builder.add_conditional_edges("qc_fetch", route_qc_fetch, ["qc_task", END])
+        builder.add_conditional_edges("qc_task", route_qc_claims, ["qc_review", "qc_check"])
         builder.add_edge("qc_review", "qc_check")
         builder.add_edge("qc_check", "qc_done")
     
@@ -102,10 +131,11 @@ class GraphComponents:
         builder.set_finish_point("qa")
         builder.set_finish_point("format_case")
         builder.set_finish_point("format_claim")
+        builder.set_finish_point("format_batch")
         builder.set_finish_point("qc_done")
 
-def build_graph(vectorstore) -> StateGraph:
-    """Build and compile the QA workflow graph."""
+def build_graph(vectorstore=None) -> StateGraph:
+    """Build and compile the QA workflow graph; without `vectorstore` chat uses the shared chat store."""
     builder = StateGraph(state_schema=QAState)
     
     # Add all components in logical order
@@ -115,4 +145,16 @@ def build_graph(vectorstore) -> StateGraph:
     GraphComponents.edges(builder)
     GraphComponents.finish_points(builder)
     
-    return builder.compile()
\ No newline at end of file
+    return builder.compile().with_config({"max_concurrency": QC_MAX_CONCURRENCY})
+
+def build_qc_graph(checkpointer=None) -> StateGraph:
+    """
+    QC workflow on its own, compiled with a checkpointer so each completed
+    node is persisted and an interrupted run resumes from its last step.
+    """
+    builder = StateGraph(state_schema=QAState)
+    GraphComponents.qc_nodes(builder)
+    builder.set_entry_point("qc_fetch")
+    GraphComponents.qc_edges(builder)
+    builder.set_finish_point("qc_done")
+    return builder.compile(checkpointer=checkpointer).with_config({"max_concurrency": QC_MAX_CONCURRENCY})
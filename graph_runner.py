@@ -0,0 +1,123 @@
+# graph_runner.py (non-blocking execution of the compiled LangGraph graph)
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import request_trace
+
+logger = logging.getLogger(__name__)
+
+# FAISS, torch and sqlite release the GIL, so a thread pool gives real parallelism here
+MAX_CONCURRENCY = int(os.environ.get("GRAPH_MAX_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+# Requests allowed to wait for a worker before new ones are rejected (0 = unbounded)
+MAX_QUEUE = int(os.environ.get("GRAPH_MAX_QUEUE", "0"))
+
+
+class GraphBusyError(RuntimeError):
+    """Raised when the wait queue is full."""
+
+
+class GraphRunner:
+    """
+    Runs a compiled graph off the event loop on a bounded worker pool.
+    At most `max_concurrency` requests execute at once; the rest wait in FIFO order
+    and are visible through `stats()`.
+    """
+
+    def __init__(self, graph, max_concurrency: int = MAX_CONCURRENCY, max_queue: int = MAX_QUEUE):
+        self.graph = graph
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="graph")
+        self._semaphore = None
+        self._counter_lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def _slot(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the loop Chainlit is actually running
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` on the pool once a slot is free."""
+        with self._counter_lock:
+            if self.max_queue and self._queued >= self.max_queue:
+                self._rejected += 1
+                raise GraphBusyError(f"{self._queued} requests already waiting")
+            self._queued += 1
+
+        try:
+            await self._slot().acquire()
+        finally:
+            with self._counter_lock:
+                self._queued -= 1
+
+        with self._counter_lock:
+            self._running += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            with self._counter_lock:
+                self._completed += 1
+            return result
+        except Exception:
+            with self._counter_lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._counter_lock:
+                self._running -= 1
+            self._slot().release()
+
+    async def ainvoke(self, state: dict, config: dict = None) -> dict:
+        def invoke():
+            with request_trace(state.get("mode", "graph")):
+                return self.graph.invoke(state, config)
+
+        return await self.run(invoke)
+
+    async def astream(self, state: dict, config: dict = None, stream_mode="values"):
+        """
+        Async iterator over `graph.stream(...)` items as the worker produces them.
+        The graph still runs on the pool; items are handed to the loop one by one.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+
+        def produce():
+            # Traced on the worker thread; node threads inherit the trace context
+            with request_trace(state.get("mode", "graph")):
+                for item in self.graph.stream(state, config, stream_mode=stream_mode):
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        task = asyncio.ensure_future(self.run(produce))
+        # Fires after every item queued by produce(), or immediately if rejected/failed
+        task.add_done_callback(lambda _: queue.put_nowait(done))
+
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            yield item
+        await task
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queued": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,373 @@
+# index_store.py (persistent on-disk FAISS indexes)
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from sentencetransformer import embedding_model_id, get_embedding_model, getSentenceModel
+from query_cache import CachedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", ".vector_indexes")
+# Memory-map the stored index instead of reading it into RAM (read-only indexes only)
+INDEX_MMAP = os.environ.get("VECTOR_INDEX_MMAP", "0") == "1"
+
+# Index families selectable per store through <STORE>_INDEX_TYPE (CASES_, CHAT_)
+INDEX_TYPES = ("flat", "sq8", "pq", "hnsw", "ivf", "ivfsq8", "ivfpq")
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", "16"))
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", "64"))
+# Approximate types need enough vectors to train on; smaller stores stay exact
+ANN_MIN_VECTORS = int(os.environ.get("ANN_MIN_VECTORS", "10000"))
+# Filters matching at most this many vectors are searched exactly over just those vectors
+FILTER_EXACT_MAX = int(os.environ.get("FILTER_EXACT_MAX", "10000"))
+
+
+def fingerprint_documents(documents: list[Document], model_name: str = None) -> str:
+    """Stable hash of the document contents, metadata and embedding model (and backend)."""
+    h = hashlib.sha256()
+    h.update(embedding_model_id(model_name).encode("utf-8"))
+    for doc in documents:
+        h.update(b"\x1e")
+        h.update(doc.page_content.encode("utf-8"))
+        h.update(b"\x1f")
+        h.update(json.dumps(doc.metadata, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def fingerprint_files(paths: list[str], model_name: str = None, extra: str = "") -> str:
+    """Stable hash of file names and contents (streamed in 1 MiB blocks), embedding model
+    (and backend) and `extra` (e.g. chunking parameters)."""
+    h = hashlib.sha256()
+    h.update(embedding_model_id(model_name).encode("utf-8"))
+    h.update(extra.encode("utf-8"))
+    for path in paths:
+        h.update(b"\x1e" + os.path.abspath(path).encode("utf-8") + b"\x1f")
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def index_type_for(name: str) -> str:
+    """Configured index type of a store, e.g. CASES_INDEX_TYPE for "cases", CHAT_INDEX_TYPE for "chat_data"."""
+    index_type = os.environ.get(f"{name.split('_')[0].upper()}_INDEX_TYPE", "flat").lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r} for {name}; expected one of {INDEX_TYPES}")
+    return index_type
+
+
+def factory_string(index_type: str, n: int, d: int) -> str:
+    """faiss.index_factory description for `index_type` sized for n vectors of dimension d."""
+    nlist = max(1, min(int(4 * n ** 0.5), n // 39))
+    # PQ sub-quantizers of 4 dimensions each (1 byte per 4 floats, 16x smaller than flat)
+    m = next(d // sub for sub in (4, 2, 1) if d % sub == 0)
+    return {
+        "flat": "Flat",
+        "sq8": "SQ8",
+        "pq": f"PQ{m}",
+        "hnsw": "HNSW32",
+        "ivf": f"IVF{nlist},Flat",
+        "ivfsq8": f"IVF{nlist},SQ8",
+        "ivfpq": f"IVF{nlist},PQ{m}",
+    }[index_type]
+
+
+def configure_index(index) -> None:
+    """Apply search-time parameters; also needed after reading an index from disk."""
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = IVF_NPROBE
+        # Lets IVF indexes reconstruct vectors by position (plots, filtered search, sync).
+        # Positions stay sequential (remove_documents refills), as the array map needs;
+        # a hashtable map is corrupted by add() without explicit ids.
+        ivf.set_direct_map_type(faiss.DirectMap.Array)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+
+
+def accepts_selector(index) -> bool:
+    """Whether index.search honours an IDSelector; IndexPQ rejects any search parameters."""
+    import faiss
+
+    return not isinstance(index, faiss.IndexPQ)
+
+
+def search_parameters(index, selector):
+    """Search parameters that restrict `index` to the ids accepted by `selector`; a
+    parameters object replaces the index's own nprobe/efSearch, so they are repeated."""
+    import faiss
+
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=IVF_NPROBE)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=HNSW_EF_SEARCH)
+    return faiss.SearchParameters(sel=selector)
+
+
+def search_subset(index, vectors, ids, k: int):
+    """index.search restricted to the positions `ids`, computed exactly from their
+    reconstructed vectors (squared L2, like the indexes here). Costs O(len(ids)), and
+    approximate indexes cannot miss a match that their probes or graph would skip."""
+    import numpy as np
+
+    ids = np.asarray(ids, dtype="int64")
+    k = min(k, len(ids))
+    if not k:
+        return np.empty((len(vectors), 0), dtype="float32"), np.empty((len(vectors), 0), dtype="int64")
+    candidates = index.reconstruct_batch(ids)
+    dist = (np.einsum("ij,ij->i", candidates, candidates)[None, :] - 2 * vectors @ candidates.T
+            + np.einsum("ij,ij->i", vectors, vectors)[:, None])
+    np.maximum(dist, 0, out=dist)
+    top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(dist, top, axis=1), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    return np.take_along_axis(dist, top, axis=1), ids[top]
+
+
+def expected_index_type(index_type: str, n: int) -> str:
+    """Type make_index builds for `index_type` and n vectors: flat below ANN_MIN_VECTORS."""
+    return "flat" if n < ANN_MIN_VECTORS else index_type
+
+
+def index_type_of(index) -> str:
+    """INDEX_TYPES name of a built FAISS index (what make_index actually produced)."""
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        if isinstance(ivf, faiss.IndexIVFPQ):
+            return "ivfpq"
+        return "ivfsq8" if isinstance(ivf, faiss.IndexIVFScalarQuantizer) else "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    return "sq8" if isinstance(index, faiss.IndexScalarQuantizer) else "flat"
+
+
+def make_index(vectors, index_type: str = "flat"):
+    """Train (if needed) and fill a FAISS index of the requested type."""
+    import faiss
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, d = vectors.shape
+    if expected_index_type(index_type, n) != index_type:
+        logger.info(f"{n} vectors is below ANN_MIN_VECTORS; using an exact flat index instead of {index_type}")
+        index_type = "flat"
+
+    index = faiss.index_factory(d, factory_string(index_type, n, d), faiss.METRIC_L2)
+    if not index.is_trained:
+        sample = vectors
+        if n > 100_000:
+            sample = vectors[np.random.default_rng(0).choice(n, 100_000, replace=False)]
+        index.train(sample)
+    index.add(vectors)
+    configure_index(index)
+    return index
+
+
+def convert_index(store: FAISS, index_type: str) -> FAISS:
+    """Rebuild `store.index` as `index_type` from its own vectors; positions are unchanged."""
+    if index_type != "flat" and store.index.ntotal:
+        store.index = make_index(store.index.reconstruct_n(0, store.index.ntotal), index_type)
+    return store
+
+
+def removes_in_place(index) -> bool:
+    """Whether remove_ids compacts `index` cheaply and in order, as FAISS.delete assumes."""
+    import faiss
+
+    return isinstance(index, faiss.IndexFlatCodes)
+
+
+def rebuilt_index(store: FAISS, doc_ids: list[str] = (), vectors=None, ids: list[str] = (),
+                  index_type: str = None) -> tuple:
+    """
+    (index, index_to_docstore_id) of `store` without `doc_ids` and with `vectors`
+    (docstore ids `ids`) appended, built on a copy so `store` can still be searched
+    meanwhile. IVF leaves gaps in its labels and HNSW cannot remove at all, so they are
+    refilled from the remaining stored vectors (training is kept, nothing is
+    re-embedded); with `index_type` the copy is a new index of that type instead.
+    """
+    import faiss
+    import numpy as np
+
+    doomed = set(doc_ids)
+    mapping = sorted(store.index_to_docstore_id.items())
+    keep = np.fromiter((pos for pos, doc_id in mapping if doc_id not in doomed), dtype="int64")
+    kept = store.index.reconstruct_batch(keep) if len(keep) else np.empty((0, store.index.d), dtype="float32")
+    if vectors is not None and len(vectors):
+        kept = np.vstack([kept, np.asarray(vectors, dtype="float32")])
+
+    if index_type is not None:
+        index = make_index(kept, index_type)
+    else:
+        index = faiss.clone_index(store.index)
+        index.reset()
+        index.add(kept)
+        configure_index(index)
+    docstore_ids = [store.index_to_docstore_id[int(pos)] for pos in keep] + list(ids)
+    return index, dict(enumerate(docstore_ids))
+
+
+def remove_documents(store: FAISS, doc_ids: list[str]) -> None:
+    """store.delete() for every index type (see rebuilt_index for IVF and HNSW)."""
+    if removes_in_place(store.index):
+        store.delete(doc_ids)
+        return
+
+    store.index, store.index_to_docstore_id = rebuilt_index(store, doc_ids)
+    store.docstore.delete(list(set(doc_ids)))
+
+
+def _paths(name: str) -> dict:
+    return {
+        "index": os.path.join(INDEX_DIR, f"{name}.faiss"),
+        "docstore": os.path.join(INDEX_DIR, f"{name}.pkl"),
+        "meta": os.path.join(INDEX_DIR, f"{name}.json"),
+    }
+
+
+def _read_meta(name: str) -> dict:
+    try:
+        with open(_paths(name)["meta"], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_index(name: str, store: FAISS, fingerprint: str, model_name: str = None) -> None:
+    """Write index, docstore and metadata; the metadata file is replaced last so a
+    crash mid-save leaves a fingerprint mismatch rather than a corrupt index."""
+    import faiss
+
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    paths = _paths(name)
+    suffix = f".tmp-{os.getpid()}"
+
+    faiss.write_index(store.index, paths["index"] + suffix)
+    with open(paths["docstore"] + suffix, "wb") as f:
+        pickle.dump((store.docstore, store.index_to_docstore_id), f)
+    with open(paths["meta"] + suffix, "w", encoding="utf-8") as f:
+        json.dump({
+            "fingerprint": fingerprint,
+            "model_name": model_name or getSentenceModel(),
+            "ntotal": store.index.ntotal,
+            # What was built: small stores are flat whatever their configured type
+            "index_type": index_type_of(store.index),
+            "saved_at": time.time(),
+        }, f)
+
+    # Invalidate the old metadata first so readers never pair it with new files
+    if os.path.exists(paths["meta"]):
+        os.remove(paths["meta"])
+    os.replace(paths["index"] + suffix, paths["index"])
+    os.replace(paths["docstore"] + suffix, paths["docstore"])
+    os.replace(paths["meta"] + suffix, paths["meta"])
+
+
+def load_index(name: str, fingerprint: str, embeddings=None, mmap: bool = None) -> FAISS | None:
+    """Return the stored index if its fingerprint matches, otherwise None."""
+    import faiss
+
+    meta = _read_meta(name)
+    if meta.get("fingerprint") != fingerprint:
+        return None
+    stored, configured = meta.get("index_type", "flat"), index_type_for(name)
+    wanted = expected_index_type(configured, meta.get("ntotal", 0))
+    # A flat index holds the exact vectors, so it is converted below rather than re-embedded
+    if stored not in (configured, wanted, "flat"):
+        return None
+
+    paths = _paths(name)
+    mmap = INDEX_MMAP if mmap is None else mmap
+    try:
+        if mmap:
+            try:
+                index = faiss.read_index(paths["index"], faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                # Not every index type supports mmap; fall back to a regular read
+                index = faiss.read_index(paths["index"])
+        else:
+            index = faiss.read_index(paths["index"])
+        with open(paths["docstore"], "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    except (OSError, RuntimeError, pickle.UnpicklingError) as e:
+        logger.warning(f"Stored index {name} unreadable, rebuilding: {e}")
+        return None
+    configure_index(index)
+    if stored not in (configured, wanted):
+        logger.info(f"Converting stored {name} index from {stored} to {wanted}")
+        index = make_index(index.reconstruct_n(0, index.ntotal), wanted)
+
+    return FAISS(
+        embedding_function=embeddings or CachedEmbeddings(get_embedding_model(meta.get("model_name"))),
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def faiss_from_vectors(texts: list[str], vectors, metadatas: list[dict], embeddings,
+                       index_type: str = "flat") -> FAISS:
+    """Wrap precomputed vectors in a FAISS store without the list-of-lists round trip
+    that FAISS.from_embeddings does."""
+    import uuid
+
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    index = make_index(vectors, index_type)
+    ids = [uuid.uuid4().hex for _ in texts]
+    docstore = InMemoryDocstore({
+        doc_id: Document(id=doc_id, page_content=text, metadata=metadata)
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
+def build_store(documents: list[Document], model_name: str = None, index_type: str = "flat") -> FAISS:
+    """Embed `documents` into a new store, across EMBED_WORKERS processes for large builds."""
+    from parallel_embed import EMBED_WORKERS, PARALLEL_MIN_DOCUMENTS, build_faiss_parallel
+
+    if EMBED_WORKERS > 1 and len(documents) >= PARALLEL_MIN_DOCUMENTS:
+        return build_faiss_parallel(documents, EMBED_WORKERS, model_name, index_type)
+    embeddings = CachedEmbeddings(get_embedding_model(model_name))
+    texts = [doc.page_content for doc in documents]
+    return faiss_from_vectors(
+        texts, embeddings.embed_documents(texts), [doc.metadata for doc in documents], embeddings, index_type
+    )
+
+
+def load_or_build(name: str, documents: list[Document], model_name: str = None,
+                  fingerprint: str = None, mmap: bool = None) -> FAISS:
+    """Reload the named index from disk when the source is unchanged, else re-embed and save it.
+    Pass mmap=False for indexes that will be modified in place."""
+    model_name = model_name or getSentenceModel()
+    fingerprint = fingerprint or fingerprint_documents(documents, model_name)
+    embeddings = CachedEmbeddings(get_embedding_model(model_name))
+
+    start = time.perf_counter()
+    store = load_index(name, fingerprint, embeddings, mmap=mmap)
+    if store is not None:
+        logger.info(f"Loaded {name} index from disk ({store.index.ntotal} vectors, "
+                    f"{time.perf_counter() - start:.2f}s)")
+        return store
+
+    store = build_store(documents, model_name, index_type_for(name))
+    save_index(name, store, fingerprint, model_name)
+    logger.info(f"Built {name} index ({store.index.ntotal} vectors, "
+                f"{time.perf_counter() - start:.2f}s) and saved to {INDEX_DIR}")
+    return store
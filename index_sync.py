@@ -0,0 +1,463 @@
+# index_sync.py (incremental maintenance of live FAISS indexes)
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from typing import Callable
+
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from index_store import (
+    FILTER_EXACT_MAX,
+    accepts_selector,
+    expected_index_type,
+    index_type_of,
+    rebuilt_index,
+    remove_documents,
+    removes_in_place,
+    search_parameters,
+    search_subset,
+)
+from lexical_index import HYBRID_SEARCH, LexicalIndex, hybrid_search, lexical_index_for, matches_filter
+from query_cache import cached_search, invalidate_index
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    def reading(self):
+        return _Guard(self.acquire_read, self.release_read)
+
+    def writing(self):
+        return _Guard(self.acquire_write, self.release_write)
+
+
+class _Guard:
+    def __init__(self, acquire, release):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._release()
+        return False
+
+
+def change_marker(doc: Document) -> str:
+    """Hash of everything a row contributes to the index; differs iff the vector must change."""
+    payload = doc.page_content + "\x1f" + json.dumps(doc.metadata, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class StaticIndex:
+    """Search interface of LiveIndex over a store that never changes (the chat knowledge base)."""
+
+    def __init__(self, name: str, store: FAISS):
+        self.name = name
+        self.store = store
+        self.lexical = lexical_index_for(store) if HYBRID_SEARCH else None
+
+    def similarity_search_with_score(self, query: str, k: int = 4):
+        def search():
+            with span(f"vector_search:{self.name}") as s:
+                hits = self.store.similarity_search_with_score(query, k=k)
+                s.size = len(hits)
+                return hits
+
+        # Static for the life of the process, hence version 0
+        return cached_search(self.name, 0, query, k, search)
+
+    def hybrid_search_with_score(self, query: str, k: int = 4):
+        """Dense and BM25 rankings fused (see lexical_index.hybrid_search); dense only without HYBRID_SEARCH."""
+        if self.lexical is None:
+            return self.similarity_search_with_score(query, k=k)
+        return cached_search(f"{self.name}:hybrid", 0, query, k, lambda: hybrid_search(
+            self.name, query, k, lambda n: self.similarity_search_with_score(query, k=n), self.lexical))
+
+
+def _filter_key(query: str, where: dict, exclude: dict) -> str:
+    """Search-cache key of a filtered query."""
+    if not where and not exclude:
+        return query
+    return query + "\x1f" + json.dumps([where, exclude], sort_keys=True, default=str)
+
+
+def _group_positions(docs: list, field: str) -> dict:
+    """{value of metadata `field`: positions in `docs` that carry it}"""
+    import numpy as np
+
+    groups = {}
+    for pos, doc in enumerate(docs):
+        if isinstance(doc, Document) and field in doc.metadata:
+            groups.setdefault(doc.metadata[field], []).append(pos)
+    return {value: np.asarray(p, dtype="int64") for value, p in groups.items()}
+
+
+class LiveIndex:
+    """
+    FAISS store kept in step with a source table.
+
+    `load_documents` returns the current rows as Documents whose metadata carries
+    the primary key under `key_field`. `sync()` diffs them against the index by key
+    and change marker and embeds only inserted/updated rows. Embedding happens
+    outside the lock, and so do rebuilds of IVF/HNSW indexes (which cannot remove in
+    place); the write lock is held only for in-place add/remove or to swap in the
+    rebuilt index. A flat index is converted to `index_type` once the table has grown
+    past ANN_MIN_VECTORS. With HYBRID_SEARCH an inverted index of the same documents
+    is kept in step.
+    """
+
+    def __init__(self, name: str, store: FAISS, load_documents: Callable[[], list[Document]],
+                 key_field: str, on_synced: Callable[[list[Document]], None] = None,
+                 index_type: str = "flat"):
+        self.name = name
+        self.store = store
+        self.key_field = key_field
+        self.index_type = index_type
+        self._load_documents = load_documents
+        self._on_synced = on_synced
+        self._lock = ReadWriteLock()
+        self._sync_lock = threading.Lock()
+        self._version = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+        # primary key -> (docstore id, change marker)
+        self._entries = {}
+        for doc_id in store.index_to_docstore_id.values():
+            doc = store.docstore.search(doc_id)
+            if isinstance(doc, Document) and self.key_field in doc.metadata:
+                self._entries[doc.metadata[self.key_field]] = (doc_id, change_marker(doc))
+        self.lexical = LexicalIndex.from_store(store) if HYBRID_SEARCH else None
+        # metadata field -> {value: index positions} for filtered search; built on first
+        # use of a field and replaced by sync() together with the index it describes
+        self._positions_by_field = {}
+
+    @property
+    def version(self) -> int:
+        """Incremented on every applied change; use it to invalidate derived caches."""
+        return self._version
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        def search():
+            with span(f"vector_search:{self.name}") as s, self._lock.reading():
+                hits = self.store.similarity_search_with_score(query, k=k, **kwargs)
+                s.size = len(hits)
+                return hits
+
+        if kwargs:
+            return search()
+        return cached_search(self.name, self._version, query, k, search)
+
+    def filtered_similarity_search_with_score(self, query: str, k: int = 4, where: dict = None,
+                                              exclude: dict = None):
+        """
+        Top `k` among the documents whose metadata matches `where` and not `exclude`
+        (field -> value or list of values). Matching positions come from per-field
+        position lists: up to FILTER_EXACT_MAX of them are scored exactly on their
+        own, larger sets restrict the FAISS search through an IDSelector. Indexes
+        without selector support (PQ) score `where` matches exactly and fetch
+        k + len(excluded) neighbours for `exclude` alone, dropping the excluded ones.
+        """
+        if not where and not exclude:
+            return self.similarity_search_with_score(query, k=k)
+
+        def search():
+            import numpy as np
+
+            vectors = self._query_vectors([query], single=True)
+            with span(f"vector_search:{self.name}") as s, self._lock.reading():
+                allowed, excluded = self._filter_positions(where or {}, exclude or {})
+                index = self.store.index
+                if allowed is not None and (len(allowed) <= FILTER_EXACT_MAX or not accepts_selector(index)):
+                    hits = self._hits(*search_subset(index, vectors, allowed, k))[0]
+                elif allowed is None and not accepts_selector(index):
+                    scores, positions = index.search(vectors, k + len(excluded))
+                    keep = ~np.isin(positions[0], excluded)
+                    hits = self._hits(scores[:, keep][:, :k], positions[:, keep][:, :k])[0]
+                else:
+                    hits = self._search(vectors, k, self._selector(allowed, excluded))[0]
+                s.size = len(hits)
+                return hits
+
+        return cached_search(self.name, self._version, _filter_key(query, where, exclude), k, search)
+
+    def hybrid_search_with_score(self, query: str, k: int = 4, where: dict = None, exclude: dict = None):
+        """Dense and BM25 rankings fused (see lexical_index.hybrid_search), both restricted
+        by `where`/`exclude`; dense only without HYBRID_SEARCH."""
+        if self.lexical is None:
+            return self.filtered_similarity_search_with_score(query, k=k, where=where, exclude=exclude)
+
+        def search():
+            return hybrid_search(
+                self.name, query, k,
+                lambda n: self.filtered_similarity_search_with_score(query, k=n, where=where, exclude=exclude),
+                self.lexical, reading=self._lock.reading,
+                accept=(lambda doc: matches_filter(doc.metadata, where, exclude)) if where or exclude else None,
+            )
+
+        return cached_search(f"{self.name}:hybrid", self._version, _filter_key(query, where, exclude), k, search)
+
+    def batch_similarity_search_with_score(self, queries: list[str], k: int = 4,
+                                           exclude_keys: list = None) -> list[list]:
+        """
+        One batched embedding call and one multi-query FAISS search for all `queries`.
+        `exclude_keys` holds one primary key per query to leave out of its results
+        (e.g. the queried row itself); a selector per query would split the batch, so
+        one extra neighbour is fetched instead.
+        """
+        if not queries:
+            return []
+        vectors = self._query_vectors(queries)
+        fetch = k + 1 if exclude_keys else k
+
+        with span(f"vector_search:{self.name}") as s, self._lock.reading():
+            s.size = len(queries)
+            results = self._search(vectors, fetch)
+        if exclude_keys:
+            results = [[(doc, score) for doc, score in hits if doc.metadata.get(self.key_field) != key][:k]
+                       for hits, key in zip(results, exclude_keys)]
+        return results
+
+    def _query_vectors(self, queries: list[str], single: bool = False):
+        import faiss
+        import numpy as np
+
+        embeddings = self.store.embedding_function
+        # embed_query goes through the query-embedding cache
+        raw = [embeddings.embed_query(queries[0])] if single else embeddings.embed_documents(queries)
+        vectors = np.asarray(raw, dtype="float32")
+        if getattr(self.store, "_normalize_L2", False):
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _search(self, vectors, k: int, selector=None) -> list[list]:
+        """(doc, score) hits per query vector; the caller holds the read lock."""
+        params = None if selector is None else search_parameters(self.store.index, selector)
+        return self._hits(*self.store.index.search(vectors, k, params=params))
+
+    def _hits(self, scores, positions) -> list[list]:
+        results = []
+        for row_scores, row_positions in zip(scores, positions):
+            hits = []
+            for score, pos in zip(row_scores, row_positions):
+                if pos == -1:
+                    continue
+                doc = self.store.docstore.search(self.store.index_to_docstore_id[int(pos)])
+                hits.append((doc, float(score)))
+            results.append(hits)
+        return results
+
+    def _field_positions(self, field: str) -> dict:
+        """Index positions per value of metadata `field`; the caller holds the read lock."""
+        by_value = self._positions_by_field.get(field)
+        if by_value is None:
+            # First filter on this field; from then on sync() keeps it current
+            docs = [self.store.docstore.search(doc_id) for _, doc_id in sorted(self.store.index_to_docstore_id.items())]
+            by_value = _group_positions(docs, field)
+            self._positions_by_field[field] = by_value
+        return by_value
+
+    def _positions(self, field: str, values):
+        import numpy as np
+
+        by_value = self._field_positions(field)
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        found = [by_value[v] for v in values if v in by_value]
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype="int64")
+
+    def _filter_positions(self, where: dict, exclude: dict):
+        """(positions allowed by `where` minus `exclude`, or None without `where`; excluded positions)."""
+        import numpy as np
+
+        excluded = np.empty(0, dtype="int64")
+        for field, values in exclude.items():
+            excluded = np.union1d(excluded, self._positions(field, values))
+        if not where:
+            return None, excluded
+        allowed = None
+        for field, values in where.items():
+            positions = self._positions(field, values)
+            allowed = positions if allowed is None else np.intersect1d(allowed, positions)
+        return np.setdiff1d(allowed, excluded, assume_unique=True), excluded
+
+    def _selector(self, allowed, excluded):
+        """IDSelector accepting `allowed` (when given) or everything but `excluded`."""
+        import faiss
+
+        if allowed is not None:
+            return faiss.IDSelectorBatch(allowed)
+        if not len(excluded):
+            return None
+        inner = faiss.IDSelectorBatch(excluded)
+        selector = faiss.IDSelectorNot(inner)
+        # The wrapper does not own `inner`; keep it alive as long as the selector
+        selector.referenced_objects = [inner]
+        return selector
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        with self._lock.reading():
+            return self.store.similarity_search(query, k=k, **kwargs)
+
+    def reading(self):
+        """Hold the read lock while using `store` directly."""
+        return self._lock.reading()
+
+    def vectors_for(self, docs: list[Document]):
+        """Stored vectors of `docs` (looked up by primary key), or None if any is missing."""
+        import numpy as np
+
+        with self._lock.reading():
+            positions = {doc_id: pos for pos, doc_id in self.store.index_to_docstore_id.items()}
+            vectors = []
+            for doc in docs:
+                entry = self._entries.get(doc.metadata.get(self.key_field))
+                if entry is None or entry[0] not in positions:
+                    return None
+                vectors.append(self.store.index.reconstruct(int(positions[entry[0]])))
+        return np.vstack(vectors)
+
+    def sync(self) -> dict:
+        """Apply inserted, updated and deleted rows. Returns counts per change type."""
+        with self._sync_lock:
+            documents = self._load_documents()
+            current = {doc.metadata[self.key_field]: doc for doc in documents}
+
+            added, updated = [], []
+            for key, doc in current.items():
+                entry = self._entries.get(key)
+                if entry is None:
+                    added.append(doc)
+                elif entry[1] != change_marker(doc):
+                    updated.append(doc)
+            deleted = [key for key in self._entries if key not in current]
+
+            changed = added + updated
+            if changed or deleted:
+                # The expensive part runs without blocking readers
+                texts = [d.page_content for d in changed]
+                metadatas = [d.metadata for d in changed]
+                vectors = self.store.embedding_function.embed_documents(texts) if changed else []
+                new_ids = [uuid.uuid4().hex for _ in changed]
+                stale_ids = [self._entries[d.metadata[self.key_field]][0] for d in updated]
+                stale_ids += [self._entries[key][0] for key in deleted]
+                positions_by_field = self._positions_after(stale_ids, changed)
+
+                current_type = index_type_of(self.store.index)
+                target_type = expected_index_type(self.index_type, self.store.index.ntotal - len(stale_ids) + len(changed))
+                convert = current_type == "flat" and target_type != "flat"
+                rebuilt = None
+                if convert or (stale_ids and not removes_in_place(self.store.index)):
+                    # Built on a copy while readers keep using the current index
+                    rebuilt = rebuilt_index(self.store, stale_ids, vectors, new_ids,
+                                            target_type if convert else None)
+                    if convert:
+                        logger.info(f"Converting {self.name} index from flat to {target_type}")
+
+                with self._lock.writing():
+                    if rebuilt is not None:
+                        self.store.index, self.store.index_to_docstore_id = rebuilt
+                        if stale_ids:
+                            self.store.docstore.delete(stale_ids)
+                        self.store.docstore.add({
+                            doc_id: Document(id=doc_id, page_content=text, metadata=metadata)
+                            for doc_id, text, metadata in zip(new_ids, texts, metadatas)
+                        })
+                    else:
+                        if stale_ids:
+                            remove_documents(self.store, stale_ids)
+                        if changed:
+                            self.store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=new_ids)
+                    if self.lexical is not None:
+                        self.lexical.remove(stale_ids)
+                        self.lexical.add(new_ids, [self.store.docstore.search(i) for i in new_ids])
+                    self._positions_by_field = positions_by_field
+                    self._version += 1
+                invalidate_index(self.name)
+
+                for key in deleted:
+                    del self._entries[key]
+                for doc, doc_id in zip(changed, new_ids):
+                    self._entries[doc.metadata[self.key_field]] = (doc_id, change_marker(doc))
+
+                if self._on_synced is not None:
+                    with self._lock.reading():
+                        self._on_synced(documents)
+
+            counts = {"added": len(added), "updated": len(updated), "deleted": len(deleted)}
+            if changed or deleted:
+                logger.info(f"Synced {self.name} index: {counts}")
+            return counts
+
+    def _positions_after(self, stale_ids: list[str], changed: list[Document]) -> dict:
+        """
+        Position lists of the fields in use, as they will be once `stale_ids` are removed
+        and `changed` appended. Both removal paths compact the remaining positions in
+        order, so this is computed before taking the write lock and swapped in under it.
+        """
+        if not self._positions_by_field:
+            return {}
+        stale = set(stale_ids)
+        docs = [self.store.docstore.search(doc_id)
+                for _, doc_id in sorted(self.store.index_to_docstore_id.items()) if doc_id not in stale]
+        docs += changed
+        return {field: _group_positions(docs, field) for field in list(self._positions_by_field)}
+
+    def start(self, interval_seconds: float) -> None:
+        """Run `sync()` every `interval_seconds` on a daemon thread."""
+        if self._thread is not None or interval_seconds <= 0:
+            return
+
+        def run():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.error(f"Sync of {self.name} index failed: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name=f"sync-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
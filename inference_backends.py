@@ -0,0 +1,147 @@
+# inference_backends.py (CPU inference backends for the embedding and QA models)
+# torch       full-precision PyTorch (the reference)
+# torch-int8  PyTorch with dynamically int8-quantized Linear layers
+# onnx        ONNX Runtime graph exported once and cached under ONNX_CACHE_DIR
+# onnx-int8   the same graph with int8-quantized weights
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+ONNX_CACHE_DIR = os.environ.get("ONNX_CACHE_DIR", ".onnx_models")
+# Instruction set the int8 ONNX weights are quantized for: avx2, avx512, avx512_vnni or arm64
+ONNX_QUANT_TARGET = os.environ.get("ONNX_QUANT_TARGET", "avx2")
+ONNX_FILE = "model.onnx"
+
+
+def check_backend(backend: str) -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def quantize_torch(module):
+    """Int8 dynamic quantization of every Linear layer, in place."""
+    import torch
+
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def export_onnx(model_name: str, task: str, quantize: bool = False) -> str:
+    """
+    Directory with `model_name` exported to ONNX for `task` ("feature-extraction" or
+    "question-answering") plus its tokenizer. Exported on first use only; the
+    directory appears atomically, so concurrent processes never read a partial export.
+    """
+    target = os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "--"), task + ("-int8" if quantize else ""))
+    if os.path.exists(os.path.join(target, ONNX_FILE)):
+        return target
+
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTModelForQuestionAnswering, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    start = time.perf_counter()
+    model_class = ORTModelForQuestionAnswering if task == "question-answering" else ORTModelForFeatureExtraction
+    tmp = f"{target}.tmp-{os.getpid()}"
+    model_class.from_pretrained(model_name, export=True).save_pretrained(tmp)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(tmp)
+    if quantize:
+        config = getattr(AutoQuantizationConfig, ONNX_QUANT_TARGET)(is_static=False, per_channel=False)
+        ORTQuantizer.from_pretrained(tmp, file_name=ONNX_FILE).quantize(save_dir=tmp, quantization_config=config)
+        os.replace(os.path.join(tmp, "model_quantized.onnx"), os.path.join(tmp, ONNX_FILE))
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        # Another process finished the same export first
+        shutil.rmtree(tmp, ignore_errors=True)
+    logger.info(f"Exported {model_name} ({task}{', int8' if quantize else ''}) to {target} "
+                f"in {time.perf_counter() - start:.1f}s")
+    return target
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an ONNX Runtime session: mean pooling over the
+    attention mask, then L2 normalization, as in all-MiniLM-L6-v2's
+    sentence-transformers pipeline.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False, batch_size: int = 32,
+                 max_length: int = 256, normalize: bool = True):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = export_onnx(model_name, "feature-extraction", quantize)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Read at construction so embedding worker processes can split the cores
+        options.intra_op_num_threads = int(os.environ.get("ONNX_THREADS", "0"))
+        self._session = ort.InferenceSession(os.path.join(path, ONNX_FILE), options,
+                                             providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(path)
+        self.model_name = f"{model_name}@{'onnx-int8' if quantize else 'onnx'}"
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.normalize = normalize
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        parts = []
+        for i in range(0, len(texts), self.batch_size):
+            encoded = self._tokenizer(texts[i:i + self.batch_size], padding=True, truncation=True,
+                                      max_length=self.max_length, return_tensors="np")
+            feeds = {name: value.astype("int64") for name, value in encoded.items() if name in self._input_names}
+            hidden = self._session.run(None, feeds)[0]
+            mask = encoded["attention_mask"][..., None].astype("float32")
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            parts.append(pooled.astype("float32"))
+        return np.vstack(parts) if parts else np.empty((0, 0), dtype="float32")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text])[0].tolist()
+
+
+def load_embeddings(model_name: str, backend: str) -> Embeddings:
+    check_backend(backend)
+    if backend.startswith("onnx"):
+        return OnnxEmbeddings(model_name, quantize=backend == "onnx-int8")
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    if backend == "torch-int8":
+        quantize_torch(embeddings._client)
+        # Keeps query-cache entries of different backends apart
+        embeddings.model_name = f"{model_name}@{backend}"
+    return embeddings
+
+
+def load_qa_pipeline(model_name: str, backend: str):
+    check_backend(backend)
+    from transformers import AutoTokenizer, pipeline
+
+    if backend.startswith("onnx"):
+        from optimum.onnxruntime import ORTModelForQuestionAnswering
+
+        path = export_onnx(model_name, "question-answering", quantize=backend == "onnx-int8")
+        model = ORTModelForQuestionAnswering.from_pretrained(path, file_name=ONNX_FILE)
+        return pipeline("question-answering", model=model, tokenizer=AutoTokenizer.from_pretrained(path))
+
+    qa = pipeline("question-answering", model=model_name)
+    if backend == "torch-int8":
+        quantize_torch(qa.model)
+    return qa
@@ -0,0 +1,191 @@
+# lexical_index.py (BM25 inverted indexes kept beside the vector stores, and hybrid search)
+# Dense search misses exact tokens (product names, acronyms, people) and always pays
+# for a query embedding; the inverted index catches those and, for keyword queries,
+# answers without touching the embedding model at all.
+import logging
+import math
+import os
+import re
+import threading
+import weakref
+from collections import Counter
+from contextlib import nullcontext
+from heapq import nlargest
+from typing import Callable
+
+from langchain_core.documents import Document
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# "0" restores dense-only search
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "1") == "1"
+# Hits taken from each retriever before the rankings are fused
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", "20"))
+# Reciprocal rank fusion constant; larger values flatten the weight of top ranks
+HYBRID_RRF_K = int(os.environ.get("HYBRID_RRF_K", "60"))
+# Queries with at most this many content terms, all of them indexed, skip the
+# embedding model and are answered from the inverted index alone (0 disables)
+KEYWORD_FAST_PATH_TERMS = int(os.environ.get("KEYWORD_FAST_PATH_TERMS", "3"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset("""
+a an and are as at be but by can do does for from had has have how i if in into is it its
+me my no not of on or our so such that the their then there these they this to was we were
+what when where which who whom why will with you your
+""".split())
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 over an inverted index of the documents of one vector store, keyed by the
+    same docstore ids. Not locked itself: LiveIndex updates it under its write lock,
+    and static stores never change after the build.
+    """
+
+    def __init__(self):
+        self._postings = {}  # term -> {doc id: term frequency}
+        self._lengths = {}  # doc id -> number of terms
+        self._docs = {}
+        self._total_length = 0
+
+    @classmethod
+    def from_store(cls, store) -> "LexicalIndex":
+        index = cls()
+        ids = list(store.index_to_docstore_id.values())
+        index.add(ids, [store.docstore.search(doc_id) for doc_id in ids])
+        return index
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_ids: list[str], docs: list[Document]) -> None:
+        for doc_id, doc in zip(doc_ids, docs):
+            if not isinstance(doc, Document):
+                continue
+            if doc_id in self._docs:
+                self.remove([doc_id])
+            terms = tokenize(doc.page_content)
+            for term, count in Counter(terms).items():
+                self._postings.setdefault(term, {})[doc_id] = count
+            self._lengths[doc_id] = len(terms)
+            self._total_length += len(terms)
+            self._docs[doc_id] = doc
+
+    def remove(self, doc_ids: list[str]) -> None:
+        for doc_id in doc_ids:
+            doc = self._docs.pop(doc_id, None)
+            if doc is None:
+                continue
+            for term in set(tokenize(doc.page_content)):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._total_length -= self._lengths.pop(doc_id)
+
+    def is_keyword_query(self, terms: list[str]) -> bool:
+        """Short query whose every term is indexed: exact matching ranks it well enough."""
+        return 0 < len(terms) <= KEYWORD_FAST_PATH_TERMS and all(t in self._postings for t in terms)
+
+    def search(self, terms: list[str], k: int,
+               accept: Callable[[Document], bool] = None) -> list[tuple[Document, float]]:
+        """Top `k` documents by BM25 score for the tokenized query `terms`, among those `accept` allows."""
+        n = len(self._docs)
+        if not n or not terms:
+            return []
+        average_length = self._total_length / n or 1.0
+        scores = {}
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        if accept is not None:
+            # Every posting is scored anyway, so filtering the scores loses no matches
+            scores = {doc_id: score for doc_id, score in scores.items() if accept(self._docs[doc_id])}
+        return [(self._docs[doc_id], score) for doc_id, score in
+                nlargest(k, scores.items(), key=lambda item: item[1])]
+
+
+def matches_filter(metadata: dict, where: dict = None, exclude: dict = None) -> bool:
+    """True when `metadata` matches every field of `where` and no field of `exclude`
+    (field -> value or list of values)."""
+    def hit(field, values):
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        return field in metadata and metadata[field] in values
+
+    return all(hit(f, v) for f, v in (where or {}).items()) and not any(hit(f, v) for f, v in (exclude or {}).items())
+
+
+def _doc_key(doc: Document):
+    return getattr(doc, "id", None) or doc.page_content
+
+
+def fuse(rankings: list[list[tuple[Document, float]]], k: int) -> list[tuple[Document, float]]:
+    """Reciprocal rank fusion: sum of 1 / (HYBRID_RRF_K + rank) over the rankings, highest first."""
+    fused, docs = {}, {}
+    for ranking in rankings:
+        for rank, (doc, _) in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            docs.setdefault(key, doc)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (HYBRID_RRF_K + rank)
+    return [(docs[key], score) for key, score in nlargest(k, fused.items(), key=lambda item: item[1])]
+
+
+def hybrid_search(name: str, query: str, k: int, dense_search: Callable[[int], list],
+                  lexical: LexicalIndex, reading=None,
+                  accept: Callable[[Document], bool] = None) -> list[tuple[Document, float]]:
+    """
+    Fused BM25 + dense ranking of `query`, scored by reciprocal rank (higher is closer,
+    unlike the L2 distances of dense-only search).
+    `dense_search(n)` returns the top n (doc, score) pairs of the vector store, with
+    the same filter as `accept` applies to lexical hits; `reading()` guards lexical
+    reads when the index is updated concurrently.
+    """
+    terms = tokenize(query)
+    guard = reading or nullcontext
+
+    def lexical_search(n: int):
+        with span(f"lexical_search:{name}") as s, guard():
+            hits = lexical.search(terms, n, accept)
+            s.size = len(hits)
+            return hits
+
+    with guard():
+        keyword_query = lexical.is_keyword_query(terms)
+    if keyword_query:
+        hits = lexical_search(k)
+        # Fewer than k matches: the dense ranking fills the rest below
+        if len(hits) >= k:
+            return fuse([hits], k)
+
+    candidates = max(k, HYBRID_CANDIDATES)
+    return fuse([dense_search(candidates), lexical_search(candidates)], k)
+
+
+_store_indexes = weakref.WeakKeyDictionary()
+_store_indexes_lock = threading.Lock()
+
+
+def lexical_index_for(store) -> LexicalIndex:
+    """Inverted index of a static vector store, built once per store on first use."""
+    index = _store_indexes.get(store)
+    if index is None:
+        with _store_indexes_lock:
+            index = _store_indexes.get(store)
+            if index is None:
+                index = LexicalIndex.from_store(store)
+                _store_indexes[store] = index
+                logger.info(f"Built inverted index over {len(index)} documents")
+    return index
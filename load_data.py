@@ -1,6 +1,86 @@
+import os
+import re
+from typing import Iterable, Iterator
 from langchain_core.documents import Document
 
+CHUNK_SIZE = int(os.environ.get("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", "150"))
+TEXT_EXTENSIONS = (".txt", ".md")
+# Part of the stored chat index fingerprint; bump when split_text changes its output
+SPLIT_VERSION = 2
+WHITESPACE = " \t\n"
+SENTENCE_PUNCTUATION = ".!?;,"
+WORD_START = re.compile(r"(?<!\S)\S")
+
+
+def iter_text_files(paths: Iterable[str]) -> Iterator[str]:
+    """Expand files and directories (recursively, sorted) into text file paths."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(TEXT_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _cut(text: str, start: int, end: int, chunk_overlap: int) -> int:
+    """End of the chunk starting at `start`: the last whitespace before `end` (past the
+    overlap when possible), else just after sentence punctuation, else `end` itself,
+    which only happens for a word longer than the chunk."""
+    for lower in (start + chunk_overlap + 1, start + 1):
+        cut = max(text.rfind(c, lower, end) for c in WHITESPACE)
+        if cut != -1:
+            return cut
+    cut = max(text.rfind(c, start + 1, end) for c in SENTENCE_PUNCTUATION)
+    return cut + 1 if cut != -1 else end
+
+
+def split_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """
+    Overlapping windows of at most `chunk_size` characters, cut at whitespace (or
+    sentence punctuation) rather than inside a word. The overlap is the whole words
+    in the last `chunk_overlap` characters of the previous chunk, possibly none.
+    """
+    if len(text) <= chunk_size:
+        return [text]
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text) and not text[end].isspace():
+            end = _cut(text, start, end, chunk_overlap)
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        # Next chunk starts at the first word beginning inside the overlap, else after this one
+        word = WORD_START.search(text, max(end - chunk_overlap, start + 1), end)
+        start = word.start() if word else end
+        while start < len(text) and text[start].isspace():
+            start += 1
+    return [c for c in chunks if c]
+
+
+def iter_documents(paths: Iterable[str], chunk_size: int = CHUNK_SIZE,
+                   chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[Document]:
+    """
+    Lazily read each file line by line (one line is one paragraph, as in data.txt)
+    and yield overlapping chunks; only the current line is held in memory.
+    """
+    for file_path in iter_text_files(paths):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                for chunk_no, chunk in enumerate(split_text(line, chunk_size, chunk_overlap)):
+                    yield Document(
+                        page_content=chunk,
+                        metadata={"source": file_path, "line": line_no, "chunk": chunk_no}
+                    )
+
+
 def load_documents_from_txt(file_path: str) -> list[Document]:
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    return [Document(page_content=line.strip()) for line in lines if line.strip()]
+    return list(iter_documents([file_path]))
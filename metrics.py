@@ -0,0 +1,210 @@
+# metrics.py (per-node and per-step latency metrics, request traces)
+# Disabled by default: span() then returns a shared no-op object and
+# instrument_node() returns the node unchanged, so the cost is one branch.
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Aggregate step timings for the Prometheus exposition
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+# Log one JSON line per request listing every step it ran
+TRACE_LOG = os.environ.get("TRACE_LOG", "0") == "1"
+# Serve /metrics on this port (0 = not served)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+ENABLED = METRICS_ENABLED or TRACE_LOG
+
+# Histogram bucket bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_steps = {}
+_steps_lock = threading.Lock()
+_trace = ContextVar("trace", default=None)
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of `values` (0.0 when empty), for the pool and batcher stats."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class _StepStats:
+    __slots__ = ("count", "wall", "cpu", "size", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.size = 0
+        self.buckets = [0] * len(BUCKETS)
+
+
+def _record(step: str, wall: float, cpu: float, size: int) -> None:
+    with _steps_lock:
+        stats = _steps.get(step)
+        if stats is None:
+            stats = _steps[step] = _StepStats()
+        stats.count += 1
+        stats.wall += wall
+        stats.cpu += cpu
+        stats.size += size
+        for i, bound in enumerate(BUCKETS):
+            if wall <= bound:
+                stats.buckets[i] += 1
+                break
+
+
+class _Span:
+    """Times one step: wall clock and CPU time of the calling thread; set `size` for payloads."""
+
+    __slots__ = ("step", "size", "_wall", "_cpu")
+
+    def __init__(self, step: str):
+        self.step = step
+        self.size = 0
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        if METRICS_ENABLED:
+            _record(self.step, wall, cpu, self.size)
+        trace = _trace.get()
+        if trace is not None:
+            trace["steps"].append({
+                "step": self.step,
+                "start_ms": round((self._wall - trace["start"]) * 1000, 3),
+                "wall_ms": round(wall * 1000, 3),
+                "cpu_ms": round(cpu * 1000, 3),
+                "size": self.size,
+                "error": exc[0].__name__ if exc[0] else None,
+            })
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    size = property(lambda self: 0, lambda self, value: None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(step: str):
+    """`with span("db:fetch_case_data") as s: ...; s.size = len(rows)`"""
+    return _Span(step) if ENABLED else _NOOP
+
+
+def payload_size(value) -> int:
+    """Characters of string fields plus elements of collections in a node's state update."""
+    if isinstance(value, dict):
+        return sum(len(v) for v in value.values() if isinstance(v, (str, list, dict, tuple)))
+    return len(value) if isinstance(value, (str, list, tuple)) else 0
+
+
+def instrument_node(name: str, fn):
+    """Wrap a graph node so each call is recorded as step `node:<name>`."""
+    if not ENABLED:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        with span(f"node:{name}") as s:
+            update = fn(state)
+            s.size = payload_size(update)
+        return update
+
+    return wrapper
+
+
+@contextmanager
+def request_trace(label: str):
+    """Collect the steps run in this context (including graph node threads) and log them at the end."""
+    if not TRACE_LOG:
+        yield
+        return
+    trace = {"start": time.perf_counter(), "steps": []}
+    token = _trace.set(trace)
+    try:
+        yield
+    finally:
+        _trace.reset(token)
+        total = time.perf_counter() - trace["start"]
+        logger.info(f"trace {json.dumps({'request': label, 'total_ms': round(total * 1000, 3), 'steps': trace['steps']})}")
+
+
+def render_prometheus() -> str:
+    """Step metrics in the Prometheus text exposition format."""
+    with _steps_lock:
+        snapshot = {
+            step: (s.count, s.wall, s.cpu, s.size, list(s.buckets)) for step, s in sorted(_steps.items())
+        }
+    lines = [
+        "# HELP pipeline_step_seconds Wall time per pipeline step.",
+        "# TYPE pipeline_step_seconds histogram",
+    ]
+    for step, (count, wall, _, _, buckets) in snapshot.items():
+        cumulative = 0
+        for bound, n in zip(BUCKETS, buckets):
+            cumulative += n
+            lines.append(f'pipeline_step_seconds_bucket{{step="{step}",le="{bound}"}} {cumulative}')
+        lines.append(f'pipeline_step_seconds_bucket{{step="{step}",le="+Inf"}} {count}')
+        lines.append(f'pipeline_step_seconds_sum{{step="{step}"}} {wall:.6f}')
+        lines.append(f'pipeline_step_seconds_count{{step="{step}"}} {count}')
+    lines += [
+        "# HELP pipeline_step_cpu_seconds_total CPU time of the executing thread per pipeline step.",
+        "# TYPE pipeline_step_cpu_seconds_total counter",
+    ]
+    lines += [f'pipeline_step_cpu_seconds_total{{step="{step}"}} {v[2]:.6f}' for step, v in snapshot.items()]
+    lines += [
+        "# HELP pipeline_step_payload_size_total Payload size handled per pipeline step (rows, items or characters).",
+        "# TYPE pipeline_step_payload_size_total counter",
+    ]
+    lines += [f'pipeline_step_payload_size_total{{step="{step}"}} {v[3]}' for step, v in snapshot.items()]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT):
+    """Serve /metrics from a daemon thread; returns the server, or None when no port is set."""
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on :{port}/metrics")
+    return server
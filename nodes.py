@@ -1,26 +1,52 @@
+import csv
+import io
+import os
 import re
-from transformers import pipeline
-from langchain_community.vectorstores import FAISS
-from oracle_client import fetch_case_data,fetch_claim_data
-from vector_store_case_data import build_oracle_vectorstore,find_similar_cases
-from vector_store_claims_data import build_claims_vectorstore
-from vector_plot import plot_similarity_results
-
-from langchain_huggingface import HuggingFaceEmbeddings
-from sentencetransformer import getSentenceModel
-
-embedding_model = HuggingFaceEmbeddings(model_name=getSentenceModel())
-
-model_path = "distilbert-base-cased-distilled-squad"
-qa_pipeline = pipeline("question-answering", model=model_path)
-
-oracle_vectorstore = build_oracle_vectorstore()
-claims_vectorstore = build_claims_vectorstore()
+from langgraph.config import get_stream_writer
+from langgraph.graph import END
+from langgraph.types import Send
+from oracle_client import fetch_case_data,fetch_claim_data,fetch_cases_batch,fetch_claims_batch,fetch_claims_for_case
+from vector_store_case_data import get_case_index
+from vector_store_chat_data import get_chat_index
+from claims_similarity import get_claims_engine
+
+from qa_batcher import get_qa_batcher
+from index_sync import StaticIndex
+from lexical_index import HYBRID_SEARCH
+
+# Chat mode: passages retrieved per question, and the QA confidence at which the
+# top passage's answer is accepted without reading the others
+CHAT_TOP_K = int(os.environ.get("CHAT_TOP_K", "4"))
+CHAT_EARLY_EXIT_SCORE = float(os.environ.get("CHAT_EARLY_EXIT_SCORE", "0.5"))
+# Similar items listed per identifier when a message carries several identifiers
+BATCH_TOP_K = int(os.environ.get("BATCH_TOP_K", "3"))
+# "0" lists the queried case/claim among its own similar results (always rank 1)
+SIMILARITY_EXCLUDE_SELF = os.environ.get("SIMILARITY_EXCLUDE_SELF", "1") == "1"
+
+QC_CASE_PATTERN = re.compile(r"\b(?:MR)?(\d{4,6})\b", re.IGNORECASE)
+IDENTIFIER_PATTERN = re.compile(r"\b(MR\d{4,6}|CL\d{4,6})\b", re.IGNORECASE)
+# "CL123456 same case" restricts similar claims to the claims of CL123456's case
+SAME_CASE_PATTERN = re.compile(r"\bsame[\s_-]*case\b", re.IGNORECASE)
+
+
+
+def emit(text: str) -> None:
+    """Send a partial answer chunk to the UI when the graph runs with stream_mode="custom"."""
+    try:
+        get_stream_writer()(text)
+    except RuntimeError:
+        # Called outside a graph run (e.g. directly from a script)
+        pass
 
 
 def oracle_fetch_node(state: dict) -> dict:
     query = state["question"]
-    match = re.search(r"\b(MR\d{4,6}|CL\d{4,6})\b", query, re.IGNORECASE)
+    # Several identifiers (typed or from an uploaded CSV) are handled as one batch
+    identifiers = list(dict.fromkeys(m.upper() for m in IDENTIFIER_PATTERN.findall(query)))
+    if len(identifiers) > 1:
+        return {**state, "identifiers": identifiers, "case_number": ""}
+
+    match = IDENTIFIER_PATTERN.search(query)
     identifier = match.group(0) if match else ""
     state["case_number"] = identifier  # keep original field name
     # 1. Handle case ID
@@ -52,9 +78,18 @@ def get_similarity_node(source_type="case"):
     def similarity_node(state: dict) -> dict:
         case_number = state.get("case_number", "")
         if source_type == "case":
-            docs_and_scores = oracle_vectorstore.similarity_search_with_score(state.get("context", ""), k=5)
+            exclude = {"case_number": case_number} if SIMILARITY_EXCLUDE_SELF and case_number else None
+            docs_and_scores = get_case_index().hybrid_search_with_score(state.get("context", ""), k=5,
+                                                                        exclude=exclude)
         elif source_type == "claim":
-            docs_and_scores = claims_vectorstore.similarity_search_with_score(state.get("context", ""), k=5)
+            if case_number.startswith("CL"):
+                docs_and_scores = get_claims_engine().similar_to_claim(
+                    case_number, k=5,
+                    same_case=bool(SAME_CASE_PATTERN.search(state.get("question", ""))),
+                    exclude_self=SIMILARITY_EXCLUDE_SELF,
+                )
+            else:
+                docs_and_scores = get_claims_engine().similarity_search_with_score(state.get("context", ""), k=5)
         else:
             docs_and_scores = []
 
@@ -64,46 +99,131 @@ def get_similarity_node(source_type="case"):
                 "retrieved_docs": [],
                 "answer": f"⚠️ No similar documents found for {case_number}."
             }
-        viz_data = plot_similarity_results(docs_and_scores, embedding_model)        
 
         return {
             **state,
-            "retrieved_docs": docs_and_scores
+            "retrieved_docs": docs_and_scores,
+            "similarity_source": source_type
         }
     return similarity_node
 
 
+def get_similarity_index(source_type: str):
+    """Live index behind the case or claim similarity node."""
+    # The case index is kept in sync with cases_table; claims are compared on their
+    # numeric pricing fields rather than embedded text
+    return get_case_index() if source_type == "case" else get_claims_engine()
+
+
+def batch_similarity_node(state: dict) -> dict:
+    identifiers = state.get("identifiers", [])
+    case_ids = [i for i in identifiers if i.startswith("MR")]
+    claim_ids = [i for i in identifiers if i.startswith("CL")]
+    hits_by_id = {}
+
+    if case_ids:
+        texts = fetch_cases_batch(case_ids)
+        found = [c for c in case_ids if texts.get(c, "").strip()]
+        for case_id, hits in zip(found, get_case_index().batch_similarity_search_with_score(
+                [texts[c] for c in found], k=BATCH_TOP_K,
+                exclude_keys=found if SIMILARITY_EXCLUDE_SELF else None)):
+            hits_by_id[case_id] = hits
+
+    if claim_ids:
+        values = fetch_claims_batch(claim_ids)
+        found = [c for c in claim_ids if c in values]
+        if found:
+            for claim_id, hits in zip(found, get_claims_engine().search_values(
+                    [values[c] for c in found], k=BATCH_TOP_K,
+                    exclude_claims=found if SIMILARITY_EXCLUDE_SELF else None)):
+                hits_by_id[claim_id] = hits
+
+    # (query id, rank, matched case #, matched claim #, text, score); rank 0 marks a missing id
+    rows = []
+    for identifier in identifiers:
+        hits = hits_by_id.get(identifier)
+        if hits is None:
+            rows.append((identifier, 0, "", "", "⚠️ Not found", None))
+            continue
+        for rank, (doc, score) in enumerate(hits, start=1):
+            rows.append((
+                identifier, rank,
+                doc.metadata.get("case_number", ""), doc.metadata.get("claim_number", ""),
+                doc.page_content, float(score)
+            ))
+    return {**state, "batch_results": rows}
+
+
+def format_batch_table_node(state: dict) -> dict:
+    rows = state.get("batch_results", [])
+    formatted_table = "| Query | Rank | Case # | Claim # | Text | Score |\n"
+    formatted_table += "|-------|------|--------|---------|------|-------|\n"
+    emit(formatted_table)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["query_id", "rank", "case_number", "claim_number", "text", "score"])
+    for query_id, rank, case_number, claim_number, text, score in rows:
+        score_text = f"{score:.4f}" if score is not None else ""
+        row = f"| {query_id} | {rank or '-'} | {case_number} | {claim_number} | {text} | {score_text} |\n"
+        emit(row)
+        formatted_table += row
+        writer.writerow([query_id, rank or "", case_number, claim_number, text, score_text])
+
+    return {**state, "answer": formatted_table, "batch_csv": buffer.getvalue()}
+
+
 def format_case_table_node(state: dict) -> dict:
     docs_and_scores = state.get("retrieved_docs", [])
-    formatted_table = "| Rank | Similar Case | Score |\n|------|----------------|-------|\n"
+    if not docs_and_scores:
+        # Keep the "not found" warning set by an earlier node instead of an empty table
+        return state
+    # Hybrid results carry fused rank scores (higher is closer), not L2 distances
+    score_header = "Relevance" if HYBRID_SEARCH else "Score"
+    formatted_table = f"| Rank | Similar Case | {score_header} |\n|------|----------------|-------|\n"
+    emit(formatted_table)
     for i, (doc, score) in enumerate(docs_and_scores):
-        formatted_table += f"| {i+1} | {doc.page_content} | {score:.4f} |\n"
+        row = f"| {i+1} | {doc.page_content} | {score:.4f} |\n"
+        emit(row)
+        formatted_table += row
     return {**state, "answer": formatted_table}
 	
 
 def format_claim_table_node(state: dict) -> dict:
     docs_and_scores = state.get("retrieved_docs", [])
+    if not docs_and_scores:
+        # Keep the "not found" warning set by an earlier node instead of an empty table
+        return state
     formatted_table = "| Rank | Case # | Claim # | Claim Text | Score |\n"
     formatted_table += "|------|--------|----------|-------------|--------|\n"
+    emit(formatted_table)
 
     for i, (doc, score) in enumerate(docs_and_scores):
         meta = doc.metadata
         case_number = meta.get("case_number", "N/A")
         claim_number = meta.get("claim_number", "N/A")
 
-        formatted_table += f"| {i+1} | {case_number} | {claim_number} | {doc.page_content} | {score:.4f} |\n"
+        row = f"| {i+1} | {case_number} | {claim_number} | {doc.page_content} | {score:.4f} |\n"
+        emit(row)
+        formatted_table += row
 
     return {**state, "answer": formatted_table}
 
 
 
-def get_retriever_node(vectorstore: FAISS):
+def get_retriever_node(vectorstore=None):
+    """Retriever over `vectorstore`, or over the shared chat index (built on first use) when None."""
+    static_index = StaticIndex("chat", vectorstore) if vectorstore is not None else None
+
     def retriever_node(state: dict) -> dict:
         query = state["question"]
-        docs = vectorstore.similarity_search(query)
+        index = static_index or get_chat_index()
+        # Exact terms (product names, acronyms, people) are matched by the inverted index
+        docs_and_scores = index.hybrid_search_with_score(query, k=CHAT_TOP_K)
         return {
             "question": query,
-            "context": docs[0].page_content if docs else ""
+            "context": docs_and_scores[0][0].page_content if docs_and_scores else "",
+            "retrieved_docs": docs_and_scores
         }
     return retriever_node
 
@@ -112,14 +232,38 @@ def answer_node(state: dict) -> dict:
     if state.get("mode") != "chat":
         return {**state, "answer": "⚠️ Chat responses are only available in Chat Mode."}
 
-    result = qa_pipeline(question=state["question"], context=state["context"])
-    return {**state, "answer": result["answer"]}
+    passages = [doc.page_content for doc, _ in state.get("retrieved_docs") or []]
+    if not passages:
+        passages = [state["context"]]
+
+    batcher = get_qa_batcher()
+    # Easy questions are answered confidently from the closest passage
+    best = {**batcher(state["question"], passages[0]), "source": passages[0]}
+
+    if best["score"] < CHAT_EARLY_EXIT_SCORE and len(passages) > 1:
+        futures = batcher.submit_many(state["question"], passages[1:])
+        for passage, future in zip(passages[1:], futures):
+            result = future.result()
+            if result["score"] > best["score"]:
+                best = {**result, "source": passage}
+
+    answer = f"{best['answer']}\n\n> 📄 Source: {best['source']}"
+    emit(answer)
+    return {
+        **state,
+        "answer": answer,
+        "context": best["source"],
+        "answer_score": float(best["score"])
+    }
 
 
 def route_by_identifier(state):
     query = state.get("question", "").strip()
     case_number = state.get("case_number", "")
 
+    if len(state.get("identifiers") or []) > 1:
+        return "similarity_batch"
+
     # Route based on known identifier
     if case_number.startswith("MR"):
         return "similarity_case"
@@ -136,56 +280,105 @@ def route_by_identifier(state):
     return "unsupported_case"
 
 # ------------------ QC Nurse Agentic AI ------------------
+# QC nodes return only the keys they change: reviewed_claims is merged from
+# parallel per-claim branches, so echoing the whole state would duplicate it.
 
 def qc_fetch_claims_node(state: dict) -> dict:
-    case_number = state.get("case_number", "000000")
-    claims = [f"Claim-{case_number}-{i}" for i in range(1, 4)]
-    progress = ["✅ Fetched all claims under the case"]
-    return {
-        **state,
+    match = QC_CASE_PATTERN.search(state.get("question", ""))
+    case_number = f"MR{match.group(1)}" if match else state.get("case_number", "")
+    claim_rows = fetch_claims_for_case(case_number).to_dict("records") if case_number else []
+    claims = [row["claim_number"] for row in claim_rows]
+    if claims:
+        progress = [f"✅ Fetched {len(claims)} claims under case {case_number}"]
+        status = progress[0]
+    elif case_number:
+        progress = [f"⚠️ No claims found for case {case_number}; QC was not run"]
+        status = "QC Incomplete"
+    else:
+        progress = ["⚠️ No case number found in the request; QC was not run"]
+        status = "QC Incomplete"
+    emit(progress[0] + "\n")
+    update = {
+        "case_number": case_number,
         "qc_claims": claims,
+        "qc_claim_rows": claim_rows,
         "qc_progress": progress,  # Initialize progress list
-        "qc_status": progress[0]
+        "qc_status": status
     }
+    if not claims:
+        update["answer"] = progress[0]
+    return update
+
+def route_qc_fetch(state: dict):
+    """Stop before any task, rule check or email when the case has no claims."""
+    return "qc_task" if state.get("qc_claims") else END
 
 def qc_create_task_node(state: dict) -> dict:
     claims = state.get("qc_claims", [])
+    rows = state.get("qc_claim_rows", [])
+    # Pricing rules run once over the whole claim set; each branch then only reports its row
+    if rows:
+        import pandas as pd
+        from qc_rules import evaluate_claims
+
+        rows = evaluate_claims(pd.DataFrame(rows)).to_dict("records")
     progress = state.get("qc_progress", []) + ["✅ Created QC Task"]
+    emit(progress[-1] + "\n")
     return {
-        **state,
         "qualified_claims": claims,
+        "qc_claim_rows": rows,
         "qc_status": progress[-1],
         "qc_progress": progress
     }
 
-def qc_review_node(state: dict) -> dict:
-    reviewed = [f"{claim}: Reviewed ✅" for claim in state.get("qualified_claims", [])]
-    progress = state.get("qc_progress", []) + ["✅ Reviewed each claim and updated QC Status"]
-    return {
-        **state,
-        "reviewed_claims": reviewed,
-        "qc_status": progress[-1],
-        "qc_progress": progress
-    }
+def route_qc_claims(state: dict):
+    """Fan out one qc_review branch per qualified claim (map step); none goes straight to qc_check."""
+    qualified = set(state.get("qualified_claims", []))
+    rows = [row for row in state.get("qc_claim_rows", []) if row["claim_number"] in qualified]
+    if not rows:
+        return "qc_check"
+    return [Send("qc_review", {"claim": row}) for row in rows]
+
+def qc_review_node(payload: dict) -> dict:
+    """Review a single claim; runs as an independent parallel branch."""
+    claim = payload["claim"]
+    if claim.get("qc_passed", True):
+        reviewed = f"{claim['claim_number']}: Reviewed ✅ Passed"
+    else:
+        reviewed = f"{claim['claim_number']}: Reviewed ❌ Failed ({claim['qc_reasons']})"
+    emit(f"• {reviewed}\n")
+    return {"reviewed_claims": [reviewed]}
 
 def qc_check_complete_node(state: dict) -> dict:
-    all_done = all("Reviewed" in c for c in state.get("reviewed_claims", []))
-    progress = state.get("qc_progress", []) + ["✅ Verified all claims are reviewed"]
+    reviewed = state.get("reviewed_claims", [])
+    all_done = len(reviewed) == len(state.get("qualified_claims", [])) and all("Reviewed" in c for c in reviewed)
+    failed = sum("Failed" in c for c in reviewed)
+    progress = state.get("qc_progress", []) + [
+        f"✅ Reviewed each claim and updated QC Status ({len(reviewed) - failed} passed, {failed} failed)",
+        "✅ Verified all claims are reviewed" if all_done else "⚠️ Some claims were not reviewed"
+    ]
+    emit("\n".join(progress[-2:]) + "\n")
     status = "QC Completed" if all_done else "QC Incomplete"
     return {
-        **state,
         "qc_status": status,
         "qc_progress": progress
     }
 
+def qc_report_lines(state: dict) -> list[str]:
+    """qc_progress with each claim's review listed after the task was created, in the
+    order the run emits them; the list only grows while the run progresses."""
+    progress = state.get("qc_progress", [])
+    split = progress.index("✅ Created QC Task") + 1 if "✅ Created QC Task" in progress else len(progress)
+    return progress[:split] + [f"• {reviewed}" for reviewed in state.get("reviewed_claims", [])] + progress[split:]
+
 def qc_finalize_node(state: dict) -> dict:
     progress = state.get("qc_progress", []) + [
         "✅ QC Task Completed and Closed",
         "✅ Sent confirmation email"
     ]
+    emit("\n".join(progress[-2:]))
     return {
-        **state,
-        "answer": "\n".join(progress),
+        "answer": "\n".join(qc_report_lines({**state, "qc_progress": progress})),
         "qc_status": "Email sent",
         "qc_progress": progress
-    }
\ No newline at end of file
+    }
@@ -1,14 +1,66 @@
 # oracle_client.py (extended for claims)
+# Pooled access to cases_table/claims_table. Locally this is a file-backed SQLite
+# stand-in seeded with demo rows; set DB_BACKEND=oracle to use an Oracle database.
+import asyncio
+import logging
+import os
+import queue
 import sqlite3
-import pandas as pd
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
 
-def init_memory_db():
-    conn = sqlite3.connect(":memory:")
+from metrics import percentile, span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DB_BACKEND = os.environ.get("DB_BACKEND", "sqlite")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "case_data.sqlite3")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+# Per-connection prepared statement cache
+DB_STATEMENT_CACHE = 64
+
+# Named binds (:name) are understood by both sqlite3 and oracledb
+CASE_BY_NUMBER_SQL = """
+    SELECT case_description, case_comments
+    FROM cases_table
+    WHERE case_number = :case_number
+"""
+CLAIM_BY_NUMBER_SQL = """
+    SELECT base_rate, units, discount, calculated_amount, expected_amount
+    FROM claims_table
+    WHERE claim_number = :claim_number
+"""
+ALL_CASES_SQL = "SELECT case_number, case_description, case_comments FROM cases_table ORDER BY case_number"
+ALL_CLAIMS_SQL = "SELECT * FROM claims_table"
+# claims_table has no change-marker column. Claims are grouped into blocks of up to
+# 1000 claim numbers (all but the last three characters), and each block is summed in
+# the database, so a refresh reads only the blocks whose sums changed
+CLAIM_BLOCK_SQL = "SUBSTR(claim_number, 1, LENGTH(claim_number) - 3)"
+CLAIM_BLOCK_SUMS_SQL = f"""
+    SELECT {CLAIM_BLOCK_SQL}, COUNT(*), SUM(base_rate), SUM(units), SUM(discount),
+           SUM(calculated_amount), SUM(expected_amount), SUM(LENGTH(case_number))
+    FROM claims_table
+    GROUP BY {CLAIM_BLOCK_SQL}
+"""
+# Oracle rejects IN lists longer than 1000 expressions
+IN_LIST_LIMIT = 1000
+
+
+def init_memory_db(conn=None):
+    """Create and seed the demo tables (SQLite stand-in only); no-op if already seeded."""
+    conn = conn or sqlite3.connect(":memory:", check_same_thread=False)
     cursor = conn.cursor()
 
     # Create case table
     cursor.execute("""
-        CREATE TABLE cases_table (
+        CREATE TABLE IF NOT EXISTS cases_table (
             case_number TEXT PRIMARY KEY,
             case_description TEXT,
             case_comments TEXT
@@ -16,7 +68,7 @@ def init_memory_db():
     """)
 
     cursor.executemany("""
-        INSERT INTO cases_table (case_number, case_description, case_comments)
+        INSERT OR IGNORE INTO cases_table (case_number, case_description, case_comments)
         VALUES (?, ?, ?)
     """, [
         ("MR123456", "System crash when exporting reports", "Issue occurs after patch update."),
@@ -26,7 +78,7 @@ def init_memory_db():
 
     # Create claims table
     cursor.execute("""
-        CREATE TABLE claims_table (
+        CREATE TABLE IF NOT EXISTS claims_table (
             claim_number TEXT PRIMARY KEY,
             case_number TEXT,
             base_rate INTEGER,
@@ -39,7 +91,7 @@ def init_memory_db():
     """)
 
     cursor.executemany("""
-        INSERT INTO claims_table (claim_number, case_number, base_rate, units, discount, calculated_amount, expected_amount)
+        INSERT OR IGNORE INTO claims_table (claim_number, case_number, base_rate, units, discount, calculated_amount, expected_amount)
         VALUES (?, ?, ?, ?, ?, ?, ?)
     """, [
         ("CL123456", "456789", 100, 3, 50, 250, 300),
@@ -51,35 +103,274 @@ def init_memory_db():
     conn.commit()
     return conn
 
-DB_CONN = init_memory_db()
+
+# Queued in place of a connection that was discarded (see ConnectionPool._discard)
+_FREED = object()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections. A connection is used by one thread at a
+    time; idle connections are reused most-recently-used first so their
+    statement caches stay warm.
+    """
+
+    def __init__(self, connect, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self._connect = connect
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._acquires = 0
+        self._waits = 0
+        self._wait_times = deque(maxlen=1000)
+
+    def _create(self):
+        """A new connection if the pool is below its size, else None."""
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _acquire(self):
+        deadline = None
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._create()
+                if conn is None:
+                    if deadline is None:
+                        deadline = time.monotonic() + self.timeout
+                        with self._lock:
+                            self._waits += 1
+                    try:
+                        conn = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        raise TimeoutError(f"No database connection free after {self.timeout}s") from None
+            # _FREED marks a slot given up by a discarded connection: open a new one in it
+            if conn is not _FREED:
+                return conn
+
+    def _discard(self, conn):
+        """Close a connection that failed mid-use instead of handing it out again."""
+        try:
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Closing a failed database connection raised: {e}")
+        with self._lock:
+            self._created -= 1
+        # Wakes a thread waiting for a connection so it can open one in the freed slot
+        self._idle.put(_FREED)
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection; it is closed and replaced if the block raises."""
+        start = time.perf_counter()
+        conn = self._acquire()
+        with self._lock:
+            self._in_use += 1
+            self._acquires += 1
+            self._wait_times.append(time.perf_counter() - start)
+        try:
+            yield conn
+        except BaseException:
+            self._discard(conn)
+            raise
+        else:
+            self._idle.put(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = list(self._wait_times)
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "utilization": round(self._in_use / self.size, 3),
+                "acquires": self._acquires,
+                "waits": self._waits,
+                "acquire_ms_p95": round(percentile(waits, 95) * 1000, 3),
+            }
+
+
+def _sqlite_connect():
+    conn = sqlite3.connect(SQLITE_PATH, timeout=30, check_same_thread=False,
+                           cached_statements=DB_STATEMENT_CACHE)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _oracle_connect():
+    import oracledb
+
+    conn = oracledb.connect(
+        user=os.environ["ORACLE_USER"],
+        password=os.environ["ORACLE_PASSWORD"],
+        dsn=os.environ["ORACLE_DSN"],
+    )
+    conn.stmtcachesize = DB_STATEMENT_CACHE
+    return conn
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_query_times = defaultdict(lambda: deque(maxlen=1000))
+_query_counts = defaultdict(int)
+_query_stats_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if DB_BACKEND == "oracle":
+                    _pool = ConnectionPool(_oracle_connect)
+                else:
+                    pool = ConnectionPool(_sqlite_connect)
+                    with pool.connection() as conn:
+                        init_memory_db(conn)
+                    _pool = pool
+    return _pool
+
+
+def _execute(name: str, sql: str, params: dict = None, fetch: str = "all"):
+    """Run one query on a pooled connection; returns (rows, column names)."""
+    start = time.perf_counter()
+    with span(f"db:{name}") as s, get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params or {})
+            rows = cursor.fetchone() if fetch == "one" else cursor.fetchall()
+            columns = [d[0].lower() for d in cursor.description or []]
+        finally:
+            cursor.close()
+        s.size = (1 if rows else 0) if fetch == "one" else len(rows)
+    with _query_stats_lock:
+        _query_times[name].append(time.perf_counter() - start)
+        _query_counts[name] += 1
+    return rows, columns
+
 
 def fetch_case_data(case_number: str) -> str:
-    cursor = DB_CONN.cursor()
-    cursor.execute("""
-        SELECT case_description, case_comments
-        FROM cases_table
-        WHERE case_number = ?
-    """, (case_number,))
-    row = cursor.fetchone()
+    row, _ = _execute("fetch_case_data", CASE_BY_NUMBER_SQL, {"case_number": case_number}, fetch="one")
     if row:
         return f"{row[0]} {row[1]}"
     else:
         return ""
-    
+
 def fetch_claim_data(claim_number: str) -> str:
-    cursor = DB_CONN.cursor()
-    cursor.execute("""
-        SELECT base_rate, units, discount, calculated_amount, expected_amount
-        FROM claims_table
-        WHERE claim_number = ?
-    """, (claim_number,))
-    row = cursor.fetchone()
+    row, _ = _execute("fetch_claim_data", CLAIM_BY_NUMBER_SQL, {"claim_number": claim_number}, fetch="one")
     if row:
         return (
             f"{row[0]} {row[1]} {row[2]} {row[3]} {row[4]}"
         )
     return ""
 
-def get_claims_data() -> pd.DataFrame:
-    query = "SELECT * FROM claims_table"
-    return pd.read_sql(query, DB_CONN)
+def _in_clause(column: str, values: list) -> tuple[str, dict]:
+    binds = {f"v{i}": value for i, value in enumerate(values)}
+    return f"{column} IN ({', '.join(':' + name for name in binds)})", binds
+
+def fetch_cases_batch(case_numbers: list[str]) -> dict[str, str]:
+    """Case text for many case numbers with one `WHERE ... IN` query per 1000 ids."""
+    texts = {}
+    for start in range(0, len(case_numbers), IN_LIST_LIMIT):
+        clause, binds = _in_clause("case_number", case_numbers[start:start + IN_LIST_LIMIT])
+        rows, _ = _execute(
+            "fetch_cases_batch",
+            f"SELECT case_number, case_description, case_comments FROM cases_table WHERE {clause}",
+            binds,
+        )
+        texts.update({num: f"{desc} {comments}" for num, desc, comments in rows})
+    return texts
+
+def fetch_claims_batch(claim_numbers: list[str]) -> dict[str, tuple]:
+    """(base_rate, units, discount, calculated_amount, expected_amount) for many claim numbers."""
+    values = {}
+    for start in range(0, len(claim_numbers), IN_LIST_LIMIT):
+        clause, binds = _in_clause("claim_number", claim_numbers[start:start + IN_LIST_LIMIT])
+        rows, _ = _execute(
+            "fetch_claims_batch",
+            "SELECT claim_number, base_rate, units, discount, calculated_amount, expected_amount "
+            f"FROM claims_table WHERE {clause}",
+            binds,
+        )
+        values.update({row[0]: tuple(row[1:]) for row in rows})
+    return values
+
+def fetch_claims_for_case(case_number: str) -> "pd.DataFrame":
+    """All claims of a case; claims_table stores the case number with or without the MR prefix."""
+    digits = case_number.upper().removeprefix("MR")
+    rows, columns = _execute(
+        "fetch_claims_for_case",
+        "SELECT * FROM claims_table WHERE case_number IN (:bare, :prefixed) ORDER BY claim_number",
+        {"bare": digits, "prefixed": f"MR{digits}"},
+    )
+    import pandas as pd
+
+    return pd.DataFrame(rows, columns=columns)
+
+def fetch_all_cases() -> list[tuple]:
+    rows, _ = _execute("fetch_all_cases", ALL_CASES_SQL)
+    return rows
+
+def get_claims_data() -> "pd.DataFrame":
+    rows, columns = _execute("get_claims_data", ALL_CLAIMS_SQL)
+    import pandas as pd
+
+    return pd.DataFrame(rows, columns=columns)
+
+def fetch_claim_block_sums() -> dict[str, tuple]:
+    """{claim block: (count, column sums...)}; a changed row changes its block's sums."""
+    rows, _ = _execute("fetch_claim_block_sums", CLAIM_BLOCK_SUMS_SQL)
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+def fetch_claims_in_blocks(blocks: list[str]) -> "pd.DataFrame":
+    """All claims of the given claim blocks, one `WHERE ... IN` query per 1000 blocks."""
+    rows, columns = [], []
+    for start in range(0, len(blocks), IN_LIST_LIMIT):
+        clause, binds = _in_clause(CLAIM_BLOCK_SQL, blocks[start:start + IN_LIST_LIMIT])
+        chunk, columns = _execute("fetch_claims_in_blocks", f"SELECT * FROM claims_table WHERE {clause}", binds)
+        rows.extend(chunk)
+    import pandas as pd
+
+    return pd.DataFrame(rows, columns=columns)
+
+async def afetch_case_data(case_number: str) -> str:
+    return await asyncio.to_thread(fetch_case_data, case_number)
+
+async def afetch_claim_data(claim_number: str) -> str:
+    return await asyncio.to_thread(fetch_claim_data, claim_number)
+
+async def aget_claims_data() -> "pd.DataFrame":
+    return await asyncio.to_thread(get_claims_data)
+
+
+def get_db_stats() -> dict:
+    """Pool utilization and per-query latency (recent window)."""
+    with _query_stats_lock:
+        queries = {name: (_query_counts[name], list(times)) for name, times in _query_times.items()}
+    return {
+        "backend": DB_BACKEND,
+        "pool": get_pool().stats(),
+        "queries": {
+            name: {
+                "count": count,
+                "ms_p50": round(percentile(times, 50) * 1000, 3),
+                "ms_p95": round(percentile(times, 95) * 1000, 3),
+            }
+            for name, (count, times) in queries.items()
+        },
+    }
@@ -0,0 +1,114 @@
+# parallel_embed.py (multi-process embedding for index builds)
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Iterable, Iterator
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from index_store import faiss_from_vectors
+from query_cache import CachedEmbeddings
+from sentencetransformer import get_embedding_model, getSentenceModel
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for index builds (1 keeps embedding in-process)
+EMBED_WORKERS = int(os.environ.get("EMBED_WORKERS", "1"))
+# Texts per encode call inside a worker
+EMBED_WORKER_BATCH_SIZE = int(os.environ.get("EMBED_WORKER_BATCH_SIZE", "128"))
+# Below this many documents the pool start-up cost outweighs the speed-up
+PARALLEL_MIN_DOCUMENTS = int(os.environ.get("PARALLEL_MIN_DOCUMENTS", "2000"))
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    # Split the cores between workers instead of every worker using all of them
+    os.environ["ONNX_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    get_embedding_model(model_name)
+
+
+def _embed_shard(args) -> np.ndarray:
+    model_name, texts, batch_size = args
+    model = get_embedding_model(model_name)
+    parts = [
+        np.asarray(model.embed_documents(texts[i:i + batch_size]), dtype="float32")
+        for i in range(0, len(texts), batch_size)
+    ]
+    return np.vstack(parts) if parts else np.empty((0, 0), dtype="float32")
+
+
+class ParallelEmbedder:
+    """
+    Process pool where each worker loads the embedding model once (spawned, so no
+    torch state is forked) and embeds contiguous shards; results keep input order.
+    """
+
+    def __init__(self, workers: int = EMBED_WORKERS, model_name: str = None,
+                 batch_size: int = EMBED_WORKER_BATCH_SIZE):
+        self.workers = max(1, workers)
+        self.model_name = model_name or getSentenceModel()
+        self.batch_size = batch_size
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_name, threads),
+        )
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed `texts` split into ~4 shards per worker for load balancing."""
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        shard_size = max(self.batch_size, -(-len(texts) // (self.workers * 4)))
+        shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+        results = self._executor.map(_embed_shard, [(self.model_name, s, self.batch_size) for s in shards])
+        return np.vstack(list(results))
+
+    def imap(self, batches: Iterable[list[str]]) -> Iterator[np.ndarray]:
+        """Embed a stream of batches in order, keeping at most 2 per worker in flight."""
+        pending = deque()
+        for batch in batches:
+            pending.append(self._executor.submit(_embed_shard, (self.model_name, batch, self.batch_size)))
+            if len(pending) >= self.workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def build_faiss_parallel(documents: list[Document], workers: int = EMBED_WORKERS,
+                         model_name: str = None, index_type: str = "flat") -> FAISS:
+    """FAISS.from_documents equivalent whose embedding is sharded across processes;
+    shard vectors are merged into one index in document order."""
+    model_name = model_name or getSentenceModel()
+    texts = [doc.page_content for doc in documents]
+
+    start = time.perf_counter()
+    with ParallelEmbedder(workers, model_name) as embedder:
+        vectors = embedder.embed(texts)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Embedded {len(texts)} documents with {workers} workers in {elapsed:.2f}s "
+                f"({len(texts) / elapsed if elapsed else 0:.0f} docs/s)")
+
+    return faiss_from_vectors(
+        texts, vectors, [doc.metadata for doc in documents],
+        CachedEmbeddings(get_embedding_model(model_name)), index_type,
+    )
@@ -0,0 +1,138 @@
+# qa_batcher.py (micro-batching in front of the question-answering pipeline)
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from sentencetransformer import get_qa_pipeline
+from metrics import percentile, span
+
+logger = logging.getLogger(__name__)
+
+QA_MAX_BATCH_SIZE = int(os.environ.get("QA_MAX_BATCH_SIZE", "16"))
+QA_MAX_WAIT_MS = float(os.environ.get("QA_MAX_WAIT_MS", "10"))
+
+
+class QABatcher:
+    """
+    Collects QA requests arriving within `max_wait_ms` of each other (up to
+    `max_batch_size`) and runs them as one batched pipeline call on a single
+    worker thread. Callers block on a Future for their own result.
+    """
+
+    def __init__(self, pipeline=None, max_batch_size: int = QA_MAX_BATCH_SIZE,
+                 max_wait_ms: float = QA_MAX_WAIT_MS):
+        self._pipeline = pipeline
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._queue_wait = deque(maxlen=1000)
+        self._inference = deque(maxlen=1000)
+        self._batch_sizes = deque(maxlen=1000)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="qa-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, question: str, context: str) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((question, context, future, time.perf_counter()))
+        return future
+
+    def submit_many(self, question: str, contexts: list[str]) -> list[Future]:
+        """One question against several contexts; they usually land in the same batch."""
+        return [self.submit(question, context) for context in contexts]
+
+    def __call__(self, question: str, context: str) -> dict:
+        return self.submit(question, context).result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                pipeline = self._pipeline or get_qa_pipeline()
+                with span("qa_inference") as s:
+                    s.size = len(batch)
+                    results = pipeline(
+                        question=[q for q, _, _, _ in batch],
+                        context=[c for _, c, _, _ in batch],
+                        batch_size=len(batch),
+                    )
+                # The pipeline unwraps single-item batches
+                if isinstance(results, dict):
+                    results = [results]
+                for (_, _, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"QA batch of {len(batch)} failed: {str(e)}")
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+            finished = time.perf_counter()
+
+            with self._stats_lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._batch_sizes.append(len(batch))
+                self._inference.append(finished - started)
+                self._queue_wait.extend(started - enqueued for _, _, _, enqueued in batch)
+
+    def stats(self) -> dict:
+        """Throughput and latency figures (recent window) for tuning the batch window."""
+        with self._stats_lock:
+            sizes = list(self._batch_sizes)
+            inference = list(self._inference)
+            waits = list(self._queue_wait)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "requests": self._requests,
+                "batches": self._batches,
+                "pending": self._queue.qsize(),
+                "avg_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+                "queue_wait_ms_p50": round(percentile(waits, 50) * 1000, 2),
+                "queue_wait_ms_p95": round(percentile(waits, 95) * 1000, 2),
+                "inference_ms_p50": round(percentile(inference, 50) * 1000, 2),
+                "inference_ms_p95": round(percentile(inference, 95) * 1000, 2),
+                "inference_throughput_rps": round(sum(sizes) / sum(inference), 2) if inference and sum(inference) else 0.0,
+            }
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_qa_batcher() -> QABatcher:
+    """Process-wide batcher shared by every graph worker thread."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = QABatcher()
+    return _batcher
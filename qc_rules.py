@@ -0,0 +1,90 @@
+# qc_rules.py (vectorized claim pricing checks for QC review)
+import os
+
+import numpy as np
+import pandas as pd
+
+# A difference is tolerated up to max(absolute tolerance, relative tolerance * |expected|)
+QC_ABS_TOLERANCE = float(os.environ.get("QC_ABS_TOLERANCE", "0.01"))
+QC_REL_TOLERANCE = float(os.environ.get("QC_REL_TOLERANCE", "0.0"))
+
+AMOUNT_COLUMNS = ["base_rate", "units", "discount", "calculated_amount", "expected_amount"]
+
+
+def _fmt(values: pd.Series) -> pd.Series:
+    # 250.0 -> "250", 12.5 -> "12.5"
+    return values.map(lambda v: f"{v:g}")
+
+
+# (rule name, failing-row mask, reason text for the failing rows); each works on whole columns
+RULES = [
+    (
+        "missing_values",
+        lambda c: c[AMOUNT_COLUMNS].isna().any(axis=1),
+        lambda c: pd.Series("missing pricing fields", index=c.index),
+    ),
+    (
+        "discount_exceeds_gross",
+        lambda c: c["discount"] > c["gross"],
+        lambda c: "discount " + _fmt(c["discount"]) + " exceeds base_rate*units " + _fmt(c["gross"]),
+    ),
+    (
+        "negative_amount",
+        lambda c: (c["calculated_amount"] < 0) | (c["recomputed"] < 0),
+        lambda c: pd.Series("negative amount", index=c.index),
+    ),
+    (
+        "calculated_mismatch",
+        lambda c: (c["calculated_amount"] - c["recomputed"]).abs() > c["tolerance"],
+        lambda c: "calculated " + _fmt(c["calculated_amount"]) + " != base_rate*units-discount " + _fmt(c["recomputed"]),
+    ),
+    (
+        "expected_mismatch",
+        lambda c: (c["calculated_amount"] - c["expected_amount"]).abs() > c["tolerance"],
+        lambda c: "calculated " + _fmt(c["calculated_amount"]) + " != expected " + _fmt(c["expected_amount"]),
+    ),
+]
+
+
+def evaluate_claims(claims: pd.DataFrame, abs_tolerance: float = QC_ABS_TOLERANCE,
+                    rel_tolerance: float = QC_REL_TOLERANCE) -> pd.DataFrame:
+    """
+    Apply every rule to the whole claim set with column operations. Returns the
+    input columns plus recomputed_amount, qc_passed, qc_failed_rules and qc_reasons
+    (reason strings are only built for failing rows).
+    """
+    c = claims.copy()
+    for column in AMOUNT_COLUMNS:
+        c[column] = pd.to_numeric(c[column], errors="coerce").astype("float64")
+    c["gross"] = c["base_rate"] * c["units"]
+    c["recomputed"] = c["gross"] - c["discount"]
+    c["tolerance"] = np.maximum(abs_tolerance, rel_tolerance * c["expected_amount"].abs())
+
+    failed_rules = pd.Series("", index=c.index)
+    reasons = pd.Series("", index=c.index)
+    for name, mask_fn, reason_fn in RULES:
+        mask = mask_fn(c).fillna(False).astype(bool)
+        if not mask.any():
+            continue
+        failing = c[mask]
+        separator = np.where(failed_rules[mask] == "", "", "; ")
+        failed_rules[mask] = failed_rules[mask] + np.where(failed_rules[mask] == "", "", ",") + name
+        reasons[mask] = reasons[mask] + separator + reason_fn(failing)
+
+    result = claims.copy()
+    result["recomputed_amount"] = c["recomputed"]
+    result["qc_passed"] = failed_rules == ""
+    result["qc_failed_rules"] = failed_rules
+    result["qc_reasons"] = reasons
+    return result
+
+
+def summarize(results: pd.DataFrame) -> dict:
+    """Pass/fail counts overall and per rule."""
+    rules = results["qc_failed_rules"].str.split(",").explode()
+    return {
+        "claims": len(results),
+        "passed": int(results["qc_passed"].sum()),
+        "failed": int((~results["qc_passed"]).sum()),
+        "by_rule": {k: int(v) for k, v in rules[rules != ""].value_counts().items()},
+    }
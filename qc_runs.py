@@ -0,0 +1,175 @@
+# qc_runs.py (durable QC runs executed by background workers)
+# Every QC node's state is checkpointed to a local SQLite file, so a run that
+# was interrupted by a crash or redeploy continues from its last completed step.
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+from graph import build_qc_graph
+from nodes import qc_report_lines
+from metrics import request_trace
+
+logger = logging.getLogger(__name__)
+
+QC_CHECKPOINT_PATH = os.environ.get("QC_CHECKPOINT_PATH", "qc_checkpoints.sqlite3")
+# QC runs executed at the same time; further submissions wait in the queue
+QC_WORKERS = int(os.environ.get("QC_WORKERS", "2"))
+# "0" on all but one app process when several share QC_CHECKPOINT_PATH, so an
+# interrupted run is resumed once rather than by every process
+QC_RESUME_ON_START = os.environ.get("QC_RESUME_ON_START", "1") == "1"
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+
+class QCRunManager:
+    """
+    Submits QC runs to a worker pool and tracks them in a `qc_runs` table next to
+    the LangGraph checkpoints. The run id is the checkpoint thread id.
+    """
+
+    def __init__(self, path: str = QC_CHECKPOINT_PATH, workers: int = QC_WORKERS):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS qc_runs (
+                    run_id TEXT PRIMARY KEY,
+                    question TEXT,
+                    status TEXT,
+                    error TEXT,
+                    answer TEXT,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            self._conn.commit()
+        # Separate connection: the saver serializes its own writes with an internal lock
+        self.checkpointer = SqliteSaver(sqlite3.connect(path, timeout=30, check_same_thread=False))
+        self.checkpointer.setup()
+        self.graph = build_qc_graph(self.checkpointer)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="qc-run")
+
+    def _update(self, run_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE qc_runs SET {assignments} WHERE run_id = :run_id", {**fields, "run_id": run_id})
+            self._conn.commit()
+
+    def _config(self, run_id: str) -> dict:
+        return {"configurable": {"thread_id": run_id}}
+
+    def _execute(self, run_id: str, question: str) -> None:
+        config = self._config(run_id)
+        self._update(run_id, status=RUNNING, error=None)
+        try:
+            with request_trace(f"qc:{run_id}"):
+                if self.checkpointer.get_tuple(config) is None:
+                    result = self.graph.invoke({"question": question, "context": "", "answer": "", "mode": "qc"}, config)
+                else:
+                    # Input None continues from the last checkpoint; reviews already written are not redone
+                    logger.info(f"Resuming QC run {run_id} at {self.graph.get_state(config).next}")
+                    result = self.graph.invoke(None, config)
+            self._update(run_id, status=COMPLETED, answer=result.get("answer", ""))
+        except Exception as e:
+            logger.error(f"QC run {run_id} failed: {str(e)}")
+            self._update(run_id, status=FAILED, error=str(e))
+
+    def submit(self, question: str) -> str:
+        """Queue a QC run for the case in `question` and return its run id immediately."""
+        run_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO qc_runs (run_id, question, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, question, QUEUED, now, now),
+            )
+            self._conn.commit()
+        self._executor.submit(self._execute, run_id, question)
+        return run_id
+
+    def _requeue(self, run_id: str, question: str) -> None:
+        self._update(run_id, status=QUEUED)
+        self._executor.submit(self._execute, run_id, question)
+
+    def resume(self, run_id: str) -> bool:
+        """Re-queue a failed run from its last checkpoint; False if it did not fail."""
+        run = self._row(run_id)
+        if run is None or run["status"] != FAILED:
+            return False
+        self._requeue(run_id, run["question"])
+        return True
+
+    def resume_incomplete(self) -> list[str]:
+        """Re-queue runs left queued or running by a previous process."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, question FROM qc_runs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        for run_id, question in rows:
+            self._requeue(run_id, question)
+        run_ids = [row[0] for row in rows]
+        if run_ids:
+            logger.info(f"Resuming {len(run_ids)} interrupted QC runs")
+        return run_ids
+
+    def _row(self, run_id: str):
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM qc_runs WHERE run_id = ?", (run_id,))
+            row = cursor.fetchone()
+            columns = [d[0] for d in cursor.description]
+        return dict(zip(columns, row)) if row else None
+
+    def status(self, run_id: str):
+        """Run record plus progress and per-claim reviews from its latest checkpoint, or None if unknown."""
+        run = self._row(run_id)
+        if run is None:
+            return None
+        snapshot = self.graph.get_state(self._config(run_id))
+        values = snapshot.values or {}
+        run.update({
+            "case_number": values.get("case_number", ""),
+            "next": list(snapshot.next),
+            "qc_status": values.get("qc_status", ""),
+            "qc_progress": values.get("qc_progress", []),
+            # qc_progress with the reviewed claims in place, as the UI shows it
+            "report": qc_report_lines(values),
+            "claims": len(values.get("qualified_claims", [])),
+            "reviewed": len(values.get("reviewed_claims", [])),
+            "reviewed_claims": values.get("reviewed_claims", []),
+            "failed_claims": [c for c in values.get("reviewed_claims", []) if "Failed" in c],
+        })
+        return run
+
+    def list_runs(self, limit: int = 20) -> list[dict]:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT run_id, question, status, updated_at FROM qc_runs ORDER BY created_at DESC LIMIT ?", (limit,)
+            )
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_qc_runs() -> QCRunManager:
+    """Shared manager; interrupted runs from a previous process are resumed on first use (QC_RESUME_ON_START)."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = QCRunManager()
+                if QC_RESUME_ON_START:
+                    _manager.resume_incomplete()
+    return _manager
@@ -0,0 +1,121 @@
+# query_cache.py (LRU/TTL caches for query embeddings and search results)
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from langchain_core.embeddings import Embeddings
+from metrics import span
+
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "600"))
+
+
+def normalize_query(text: str) -> str:
+    # all-MiniLM-L6-v2 has an uncased tokenizer, so lowercasing does not change the vector
+    return " ".join(text.split()).lower()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (self.ttl <= 0 or time.monotonic() - entry[1] < self.ttl):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute: Callable):
+        value = self.get(key)
+        if value is None:
+            # Computed outside the lock; concurrent misses for one key may both compute
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, predicate: Callable = None) -> None:
+        """Drop every entry, or only those whose key matches `predicate`."""
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+            else:
+                for key in [k for k in self._data if predicate(k)]:
+                    del self._data[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+embedding_cache = TTLCache()
+search_cache = TTLCache()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model so repeated query texts are embedded once."""
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+        self.model_name = getattr(inner, "model_name", type(inner).__name__)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = normalize_query(text)
+        return embedding_cache.get_or_compute((self.model_name, key), lambda: self._embed_query(key))
+
+    def _embed_query(self, text: str) -> list[float]:
+        with span("embed_query"):
+            return self.inner.embed_query(text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with span("embed_documents") as s:
+            s.size = len(texts)
+            return self.inner.embed_documents(texts)
+
+
+def cached_search(index_name: str, version: int, query: str, k: int, search: Callable):
+    """Result of `search()` for (index, version, query, k); bumping `version` invalidates."""
+    return search_cache.get_or_compute((index_name, version, normalize_query(query), k), search)
+
+
+def invalidate_index(index_name: str) -> None:
+    """Drop the cached searches of `index_name`, hybrid ("<name>:hybrid") ones included."""
+    search_cache.invalidate(lambda key: key[0].split(":")[0] == index_name)
+
+
+def get_cache_stats() -> dict:
+    return {"embedding": embedding_cache.stats(), "search": search_cache.stats()}
@@ -0,0 +1,234 @@
+# retrieval_service.py (one retrieval process shared by many app workers)
+# The service owns the case index, claims engine, chat index and embedding model,
+# keeps the live indexes in sync, and answers searches over HTTP. App workers
+# started with RETRIEVAL_SERVICE_URL hold none of them, so each worker needs only
+# the QA model and workers can be added on this host or on others.
+#
+#     python -m retrieval_service
+#     RETRIEVAL_SERVICE_URL=http://127.0.0.1:8765 chainlit run chain_app.py --port 8001
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from langchain_core.documents import Document
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Workers: address of a running service; empty keeps every index in-process
+RETRIEVAL_SERVICE_URL = os.environ.get("RETRIEVAL_SERVICE_URL", "")
+# Service: bind address and port ("0.0.0.0" to serve workers on other hosts)
+RETRIEVAL_SERVICE_HOST = os.environ.get("RETRIEVAL_SERVICE_HOST", "127.0.0.1")
+RETRIEVAL_SERVICE_PORT = int(os.environ.get("RETRIEVAL_SERVICE_PORT", "8765"))
+# Seconds a worker waits per search, and for an index to be ready at start-up
+RETRIEVAL_TIMEOUT = float(os.environ.get("RETRIEVAL_TIMEOUT", "30"))
+RETRIEVAL_CONNECT_TIMEOUT = float(os.environ.get("RETRIEVAL_CONNECT_TIMEOUT", "600"))
+
+# Methods workers may call, per index
+METHODS = {
+    "cases": ("similarity_search_with_score", "hybrid_search_with_score", "filtered_similarity_search_with_score",
+              "batch_similarity_search_with_score", "vectors_for"),
+    "claims": ("similarity_search_with_score", "similar_to_claim", "search_values", "vectors_for"),
+    "chat": ("similarity_search_with_score", "hybrid_search_with_score"),
+}
+# Warm-up resource (see startup.RESOURCES) behind each index
+RESOURCES = {"cases": "case_index", "claims": "claims_engine", "chat": "chat_index"}
+
+
+def encode(value):
+    """JSON-ready form of search arguments and results (Documents, tuples, NumPy values)."""
+    import numpy as np
+
+    if isinstance(value, Document):
+        return {"__document__": {"id": value.id, "page_content": value.page_content,
+                                 "metadata": encode(value.metadata)}}
+    if isinstance(value, np.ndarray):
+        return {"__ndarray__": value.tolist(), "dtype": str(value.dtype)}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {key: encode(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode(v) for v in value]
+    return value
+
+
+def decode(value):
+    if isinstance(value, dict):
+        if "__document__" in value:
+            return Document(**value["__document__"])
+        if "__ndarray__" in value:
+            import numpy as np
+            return np.asarray(value["__ndarray__"], dtype=value["dtype"])
+        return {key: decode(v) for key, v in value.items()}
+    if isinstance(value, list):
+        # (doc, score) pairs come back as 2-lists; tuples keep them identical to local results
+        if (len(value) == 2 and isinstance(value[0], dict) and "__document__" in value[0]
+                and isinstance(value[1], (int, float))):
+            return decode(value[0]), value[1]
+        return [decode(v) for v in value]
+    return value
+
+
+class RemoteIndex:
+    """
+    Proxy with the search methods of one index in the retrieval service (LiveIndex,
+    StaticIndex or ClaimsSimilarityEngine); results are the same (doc, score) lists.
+    Each thread keeps one persistent connection.
+    """
+
+    def __init__(self, name: str, url: str = None):
+        self.name = name
+        parts = urlsplit(url or RETRIEVAL_SERVICE_URL)
+        self._host, self._port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self._host, self._port, timeout=RETRIEVAL_TIMEOUT)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        for attempt in (1, 2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                response = connection.getresponse()
+                data = json.loads(response.read() or b"{}")
+            except (http.client.HTTPException, ConnectionError):
+                # The service closed an idle connection (or restarted); reconnect once
+                connection.close()
+                self._local.connection = None
+                if attempt == 2:
+                    raise
+                continue
+            if response.status != 200:
+                raise RuntimeError(f"Retrieval service {method} {path}: {data.get('error', response.status)}")
+            return data
+
+    def health(self) -> dict:
+        return self._request("GET", "/health")
+
+    def wait_ready(self, timeout: float = RETRIEVAL_CONNECT_TIMEOUT) -> None:
+        """Block until the service has loaded this index; raises on failure or timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                state = self.health()["resources"][RESOURCES[self.name]]
+                if state["state"] == "ready":
+                    return
+                if state["state"] == "failed":
+                    raise RuntimeError(f"Retrieval service failed to load {self.name}: {state['error']}")
+            except (OSError, http.client.HTTPException) as e:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Retrieval service at {self._host}:{self._port} unreachable: {e}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Retrieval service did not load {self.name} within {timeout:.0f}s")
+            time.sleep(0.5)
+
+    def _call(self, method: str, *args, **kwargs):
+        with span(f"retrieval_service:{self.name}"):
+            data = self._request("POST", f"/{self.name}/{method}",
+                                 {"args": encode(list(args)), "kwargs": encode(kwargs)})
+        return decode(data["result"])
+
+    def __getattr__(self, method: str):
+        if method not in METHODS.get(self.name, ()):
+            raise AttributeError(f"{type(self).__name__} {self.name!r} has no method {method!r}")
+        return lambda *args, **kwargs: self._call(method, *args, **kwargs)
+
+
+def connect_remote(name: str):
+    """RemoteIndex for `name` once the service has it ready, or None without RETRIEVAL_SERVICE_URL."""
+    if not RETRIEVAL_SERVICE_URL:
+        return None
+    remote = RemoteIndex(name)
+    remote.wait_ready()
+    logger.info(f"Using {name} index of the retrieval service at {RETRIEVAL_SERVICE_URL}")
+    return remote
+
+
+def _local_indexes() -> dict:
+    from claims_similarity import get_claims_engine
+    from vector_store_case_data import get_case_index
+    from vector_store_chat_data import get_chat_index
+
+    return {"cases": get_case_index, "claims": get_claims_engine, "chat": get_chat_index}
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so workers reuse their connection
+    # Headers and body are separate writes; with Nagle each reply would wait for a delayed ACK
+    disable_nagle_algorithm = True
+    warmup = None
+
+    def _reply(self, status: int, payload: dict, content_type: str = "application/json") -> None:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"resources": self.warmup.status(), "ready": self.warmup.ready_modes()})
+        elif self.path == "/metrics":
+            from metrics import render_prometheus
+            self._reply(200, render_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        _, name, method = (self.path.split("/") + ["", ""])[:3]
+        if method not in METHODS.get(name, ()):
+            self._reply(404, {"error": f"unknown method {name}/{method}"})
+            return
+        try:
+            index = _local_indexes()[name]()
+            result = getattr(index, method)(*decode(request.get("args", [])), **decode(request.get("kwargs", {})))
+        except Exception as e:
+            logger.error(f"Retrieval {name}/{method} failed: {str(e)}")
+            self._reply(500, {"error": str(e)})
+            return
+        self._reply(200, {"result": encode(result)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = RETRIEVAL_SERVICE_HOST, port: int = RETRIEVAL_SERVICE_PORT) -> ThreadingHTTPServer:
+    """Load the indexes in the background and serve them; returns the running server."""
+    global RETRIEVAL_SERVICE_URL
+    from startup import RESOURCES as STARTUP_RESOURCES, Warmup
+
+    # The service builds its own indexes even when started with the workers' environment
+    RETRIEVAL_SERVICE_URL = ""
+    warmup = Warmup(
+        resources={RESOURCES[name]: STARTUP_RESOURCES[RESOURCES[name]] for name in METHODS},
+        mode_resources={name: (RESOURCES[name],) for name in METHODS},
+    )
+    warmup.start()
+    handler = type("ServiceHandler", (_ServiceHandler,), {"warmup": warmup})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="retrieval-http", daemon=True).start()
+    logger.info(f"Retrieval service listening on {host}:{server.server_address[1]}")
+    return server
+
+
+if __name__ == "__main__":
+    # Through the importable module: the index getters read its RETRIEVAL_SERVICE_URL, not __main__'s
+    from retrieval_service import serve as serve_indexes
+
+    logging.basicConfig(level=logging.INFO)
+    serve_indexes()
+    threading.Event().wait()
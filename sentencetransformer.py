@@ -1,5 +1,115 @@
-from sentence_transformers import SentenceTransformer
+# sentencetransformer.py (process-wide model registry)
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+QA_MODEL = "distilbert-base-cased-distilled-squad"
+# Inference backend per model kind: torch, torch-int8, onnx or onnx-int8 (see inference_backends.py)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+QA_BACKEND = os.environ.get("QA_BACKEND", "torch")
+
+# Loaded models and their load statistics, keyed by (kind, model_name)
+_models = {}
+_model_stats = {}
+_registry_lock = threading.Lock()
+_load_locks = {}
+
 
 def getSentenceModel():
-    model="sentence-transformers/all-MiniLM-L6-v2"
-    return model
\ No newline at end of file
+    model = SENTENCE_MODEL
+    return model
+
+
+def _registry_name(model_name: str, backend: str) -> str:
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def embedding_model_id(model_name: str = None, backend: str = None) -> str:
+    """Model name plus non-default backend; part of index fingerprints, since vectors differ slightly."""
+    return _registry_name(model_name or getSentenceModel(), backend or EMBEDDING_BACKEND)
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak RSS in KiB on Linux; good enough as a fallback
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _load(kind: str, model_name: str, loader):
+    key = (kind, model_name)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        lock = _load_locks.setdefault(key, threading.Lock())
+
+    # Per-model lock so the embedding and QA models can warm up in parallel
+    with lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = loader()
+        elapsed = time.perf_counter() - start
+        rss_delta = max(_rss_bytes() - rss_before, 0)
+
+        _model_stats[key] = {
+            "kind": kind,
+            "model_name": model_name,
+            "load_seconds": round(elapsed, 3),
+            "rss_delta_bytes": rss_delta,
+            "loaded_at": time.time(),
+        }
+        _models[key] = model
+        logger.info(
+            f"Loaded {kind} model {model_name} in {elapsed:.2f}s "
+            f"(+{rss_delta / 2**20:.1f} MiB RSS)"
+        )
+    return model
+
+
+def get_embedding_model(model_name: str = None, backend: str = None):
+    """Shared embedding model on `backend` (default EMBEDDING_BACKEND), loaded once per process on first use."""
+    name = model_name or getSentenceModel()
+    backend = backend or EMBEDDING_BACKEND
+
+    def loader():
+        from inference_backends import load_embeddings
+        return load_embeddings(name, backend)
+
+    return _load("embedding", _registry_name(name, backend), loader)
+
+
+def get_qa_pipeline(model_name: str = QA_MODEL, backend: str = None):
+    """Shared question-answering pipeline on `backend` (default QA_BACKEND), loaded once per process on first use."""
+    backend = backend or QA_BACKEND
+
+    def loader():
+        from inference_backends import load_qa_pipeline
+        return load_qa_pipeline(model_name, backend)
+
+    return _load("qa", _registry_name(model_name, backend), loader)
+
+
+def get_model_stats() -> dict:
+    """Load time and memory footprint of every model loaded so far."""
+    return {
+        "models": {f"{kind}:{name}": dict(info) for (kind, name), info in _model_stats.items()},
+        "process_rss_bytes": _rss_bytes(),
+    }
+
+
+def is_model_loaded(kind: str, model_name: str) -> bool:
+    return (kind, model_name) in _models
@@ -0,0 +1,153 @@
+# startup.py (staged start-up: models and indexes warm up in the background)
+# The UI accepts connections right away; each mode is served as soon as the
+# resources it needs are loaded, while the others keep loading.
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# "0" skips the warm-up; resources are then loaded by the first request that needs them
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "1") == "1"
+# Resources loaded at the same time during warm-up
+WARMUP_WORKERS = int(os.environ.get("WARMUP_WORKERS", "2"))
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+def _claims_engine():
+    from claims_similarity import get_claims_engine
+    return get_claims_engine()
+
+
+def _qc_runs():
+    from qc_runs import get_qc_runs
+    return get_qc_runs()
+
+
+def _case_index():
+    from vector_store_case_data import get_case_index
+    return get_case_index()
+
+
+def _chat_index():
+    from vector_store_chat_data import get_chat_index
+    return get_chat_index()
+
+
+def _qa_model():
+    from sentencetransformer import get_qa_pipeline
+    return get_qa_pipeline()
+
+
+# Loaded in this order: cheap resources first so their modes open early
+RESOURCES = {
+    "claims_engine": _claims_engine,
+    "qc_runs": _qc_runs,
+    "case_index": _case_index,
+    "chat_index": _chat_index,
+    "qa_model": _qa_model,
+}
+MODE_RESOURCES = {
+    "similarity": ("case_index", "claims_engine"),
+    "chat": ("chat_index", "qa_model"),
+    "qc": ("qc_runs",),
+}
+
+
+class Warmup:
+    """Loads `resources` on a small pool and tracks each one's state for readiness checks."""
+
+    def __init__(self, resources: dict = None, mode_resources: dict = None, workers: int = WARMUP_WORKERS):
+        self.resources = resources or RESOURCES
+        self.mode_resources = mode_resources or MODE_RESOURCES
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._state = {name: {"state": PENDING, "seconds": None, "error": None} for name in self.resources}
+        self._events = {name: threading.Event() for name in self.resources}
+        self._started = time.perf_counter()
+
+    def start(self) -> None:
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="warmup")
+        for name in self.resources:
+            executor.submit(self._load, name)
+        # Let queued loads finish without keeping a handle to the pool
+        executor.shutdown(wait=False)
+
+    def _load(self, name: str) -> None:
+        with self._lock:
+            self._state[name]["state"] = LOADING
+        start = time.perf_counter()
+        try:
+            self.resources[name]()
+            state, error = READY, None
+        except Exception as e:
+            logger.error(f"Warm-up of {name} failed: {str(e)}")
+            state, error = FAILED, str(e)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._state[name].update(state=state, seconds=round(elapsed, 3), error=error)
+        self._events[name].set()
+        logger.info(f"Warm-up: {name} {state} in {elapsed:.2f}s "
+                    f"({time.perf_counter() - self._started:.2f}s since start-up)")
+
+    def missing(self, mode: str) -> list[str]:
+        """Resources of `mode` that are not ready yet (failed ones included)."""
+        with self._lock:
+            return [name for name in self.mode_resources.get(mode, ()) if self._state[name]["state"] != READY]
+
+    def is_ready(self, mode: str) -> bool:
+        return not self.missing(mode)
+
+    def errors(self, mode: str) -> dict:
+        with self._lock:
+            return {name: self._state[name]["error"] for name in self.mode_resources.get(mode, ())
+                    if self._state[name]["state"] == FAILED}
+
+    def retry(self, mode: str) -> None:
+        """Load the failed resources of `mode` again in the background."""
+        for name in self.errors(mode):
+            with self._lock:
+                self._state[name]["state"] = PENDING
+            self._events[name].clear()
+            threading.Thread(target=self._load, args=(name,), name=f"warmup-{name}", daemon=True).start()
+
+    def ready_modes(self) -> list[str]:
+        return [mode for mode in self.mode_resources if self.is_ready(mode)]
+
+    def wait(self, mode: str, timeout: float = None) -> bool:
+        """Block until every resource of `mode` has finished loading; True if all are ready."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in self.mode_resources.get(mode, ()):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._events[name].wait(remaining):
+                return False
+        return self.is_ready(mode)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {name: dict(state) for name, state in self._state.items()}
+
+
+class _OnDemand(Warmup):
+    """Warm-up disabled: every mode is treated as ready and loads on first use."""
+
+    def start(self) -> None:
+        pass
+
+    def missing(self, mode: str) -> list[str]:
+        return []
+
+    def errors(self, mode: str) -> dict:
+        return {}
+
+    def wait(self, mode: str, timeout: float = None) -> bool:
+        return True
+
+
+def start_warmup() -> Warmup:
+    warmup = Warmup() if STARTUP_WARMUP else _OnDemand()
+    warmup.start()
+    return warmup
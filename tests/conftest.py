@@ -0,0 +1,75 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Every test builds its own stores; a shared search cache would mix their results
+os.environ.setdefault("QUERY_CACHE_SIZE", "0")
+
+DIM = 16
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic stand-in for the embedding model: one pseudo-random vector per text."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls += 1
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(DIM).astype("float32").tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def case_documents(n: int, per_group: int = 10, revision: int = 0) -> list[Document]:
+    """Rows shaped like the case table, keyed by case_number, plus a `group` field to filter on."""
+    return [
+        Document(page_content=f"case {i} group {i // per_group} rev {revision}",
+                 metadata={"case_number": f"C{i:05d}", "group": f"G{i // per_group:03d}"})
+        for i in range(n)
+    ]
+
+
+_trained = {}
+
+
+def build_live_index(name: str, documents: list[Document], index_type: str, embeddings, rows=None):
+    """LiveIndex over `documents`, re-reading `rows` (a mutable list, default `documents`) on sync."""
+    import faiss
+
+    import index_store
+    from index_sync import LiveIndex
+
+    rows = documents if rows is None else rows
+    texts = [doc.page_content for doc in documents]
+    vectors = embeddings.embed_documents(texts)
+    # Training PQ codebooks takes seconds; tests on the same rows share one trained index
+    key = (index_type, index_store.ANN_MIN_VECTORS, tuple(texts))
+    if key not in _trained:
+        _trained[key] = index_store.make_index(vectors, index_type)
+    store = index_store.faiss_from_vectors(texts, vectors, [dict(d.metadata) for d in documents],
+                                           embeddings, "flat")
+    store.index = faiss.clone_index(_trained[key])
+    index_store.configure_index(store.index)
+    return LiveIndex(name, store, lambda: list(rows), key_field="case_number", index_type=index_type)
+
+
+@pytest.fixture
+def embeddings():
+    return HashEmbeddings()
+
+
+@pytest.fixture
+def ann_everywhere(monkeypatch):
+    """Build the requested index type even for the small stores of these tests."""
+    import index_store
+
+    monkeypatch.setattr(index_store, "ANN_MIN_VECTORS", 0)
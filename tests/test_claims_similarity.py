@@ -0,0 +1,96 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import oracle_client
+from claims_similarity import ClaimsSimilarityEngine
+from oracle_client import ConnectionPool, fetch_claim_block_sums, fetch_claims_in_blocks, get_claims_data
+
+
+def claim(number: int, case: str, base_rate: int, units: int = 1, discount: int = 0) -> dict:
+    amount = base_rate * units - discount
+    return {"claim_number": f"CL{number:06d}", "case_number": case, "base_rate": base_rate, "units": units,
+            "discount": discount, "calculated_amount": amount, "expected_amount": amount}
+
+
+CLAIMS = pd.DataFrame(
+    [claim(i, "100", 100 + i) for i in range(5)] + [claim(1000 + i, "200", 500 + 10 * i) for i in range(5)]
+)
+
+
+def claim_numbers(hits) -> list:
+    return [doc.metadata["claim_number"] for doc, _ in hits]
+
+
+def test_nearest_claims_by_pricing_values():
+    engine = ClaimsSimilarityEngine(load_claims=lambda: CLAIMS)
+    hits = engine.similar_to_claim("CL000002", k=3)
+    assert claim_numbers(hits)[0] == "CL000002" and hits[0][1] == pytest.approx(0, abs=1e-6)
+    assert set(claim_numbers(hits)) == {"CL000001", "CL000002", "CL000003"}
+    assert all(a[1] <= b[1] for a, b in zip(hits, hits[1:]))
+
+
+def test_same_case_and_exclude_self():
+    engine = ClaimsSimilarityEngine(load_claims=lambda: CLAIMS)
+    # CL000004 is closest to case 100's claims, but only case 200 is searched
+    hits = engine.similar_to_claim("CL001000", k=10, same_case=True, exclude_self=True)
+    assert set(claim_numbers(hits)) == {f"CL00100{i}" for i in range(1, 5)}
+    assert engine.similar_to_claim("CL999999") == []
+
+
+def test_free_text_and_batch_queries_agree():
+    engine = ClaimsSimilarityEngine(load_claims=lambda: CLAIMS)
+    values = CLAIMS.iloc[7][["base_rate", "units", "discount", "calculated_amount", "expected_amount"]].tolist()
+    text_hits = engine.similarity_search_with_score("claim text: " + " ".join(str(v) for v in values), k=2)
+    (batch_hits,) = engine.search_values([values], k=2, exclude_claims=["CL001002"])
+    assert claim_numbers(text_hits)[0] == "CL001002"
+    assert "CL001002" not in claim_numbers(batch_hits)
+    assert engine.vectors_for([doc for doc, _ in text_hits]).shape == (2, 7)
+
+
+@pytest.fixture
+def claims_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "claims.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE claims_table (claim_number TEXT PRIMARY KEY, case_number TEXT, base_rate INTEGER, "
+                     "units INTEGER, discount INTEGER, calculated_amount INTEGER, expected_amount INTEGER)")
+        conn.executemany("INSERT INTO claims_table VALUES (:claim_number, :case_number, :base_rate, :units, "
+                         ":discount, :calculated_amount, :expected_amount)", CLAIMS.to_dict("records"))
+    monkeypatch.setattr(oracle_client, "_pool",
+                        ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False)))
+    return path
+
+
+def test_refresh_reads_only_the_changed_claim_blocks(claims_db):
+    full_loads, block_loads = [], []
+
+    def load_claims():
+        full_loads.append(1)
+        return get_claims_data()
+
+    def load_blocks(blocks):
+        block_loads.append(blocks)
+        return fetch_claims_in_blocks(blocks)
+
+    engine = ClaimsSimilarityEngine(load_claims, fetch_claim_block_sums, load_blocks)
+    assert engine.refresh() == 0 and engine.version == 0
+
+    with sqlite3.connect(claims_db) as conn:
+        conn.execute("UPDATE claims_table SET base_rate = 900, calculated_amount = 900 WHERE claim_number = 'CL000003'")
+        conn.execute("DELETE FROM claims_table WHERE claim_number = 'CL001004'")
+        conn.execute("INSERT INTO claims_table VALUES ('CL005000', '300', 100, 1, 0, 100, 100)")
+    assert engine.refresh() == 3
+    assert block_loads == [["CL000", "CL001", "CL005"]] and len(full_loads) == 1
+
+    assert engine.similar_to_claim("CL001004") == []
+    assert claim_numbers(engine.similar_to_claim("CL005000", k=1, same_case=True)) == ["CL005000"]
+    (hits,) = engine.search_values([[900, 1, 0, 900, 100]], k=1)
+    assert claim_numbers(hits) == ["CL000003"]
+
+    assert sorted(engine._snapshot.claim_numbers) == sorted(get_claims_data()["claim_number"])
+
+    # Nothing changed since: no rows are read
+    assert engine.refresh() == 0 and len(block_loads) == 1
+    engine.refresh(full=True)
+    assert len(full_loads) == 2
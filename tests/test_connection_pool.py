@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from oracle_client import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, number: int):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connect():
+    made = []
+
+    def connect():
+        made.append(FakeConnection(len(made)))
+        return made[-1]
+
+    connect.made = made
+    return connect
+
+
+def test_idle_connection_is_reused(connect):
+    pool = ConnectionPool(connect, size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert len(connect.made) == 1
+    assert pool.stats()["created"] == 1 and pool.stats()["in_use"] == 0
+
+
+def test_most_recently_used_connection_is_handed_out_first(connect):
+    pool = ConnectionPool(connect, size=2)
+    with pool.connection() as a, pool.connection() as b:
+        pass
+    with pool.connection() as conn:
+        # `a` was returned last
+        assert conn is a and conn is not b
+
+
+def test_connection_is_discarded_after_an_error(connect):
+    pool = ConnectionPool(connect, size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as broken:
+            raise RuntimeError("connection lost")
+    assert broken.closed
+    assert pool.stats()["created"] == 0 and pool.stats()["in_use"] == 0
+
+    with pool.connection() as conn:
+        assert conn is not broken and not conn.closed
+    assert pool.stats()["created"] == 1
+
+
+def test_failed_connect_frees_its_slot():
+    calls = []
+
+    def connect():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("refused")
+        return FakeConnection(len(calls))
+
+    pool = ConnectionPool(connect, size=1)
+    with pytest.raises(ConnectionError):
+        with pool.connection():
+            pass
+    with pool.connection() as conn:
+        assert conn.number == 2
+    assert pool.stats()["created"] == 1
+
+
+def test_exhausted_pool_times_out(connect):
+    pool = ConnectionPool(connect, size=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    assert pool.stats()["waits"] == 1
+
+
+def test_discarded_connection_frees_the_slot_for_a_waiting_thread(connect):
+    pool = ConnectionPool(connect, size=1, timeout=5)
+    result = []
+
+    def waiter():
+        with pool.connection() as conn:
+            result.append(conn)
+
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            while pool.stats()["waits"] == 0:
+                time.sleep(0.01)
+            raise RuntimeError("connection lost")
+    thread.join(5)
+    assert [conn.number for conn in result] == [1]
+    assert connect.made[0].closed and not result[0].closed
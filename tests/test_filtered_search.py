@@ -0,0 +1,91 @@
+import pytest
+
+from conftest import build_live_index, case_documents
+from index_store import INDEX_TYPES
+
+N = 400
+
+
+def keys(hits) -> list:
+    return [doc.metadata["case_number"] for doc, _ in hits]
+
+
+@pytest.fixture(params=INDEX_TYPES)
+def index(request, embeddings, ann_everywhere):
+    rows = case_documents(N)
+    live = build_live_index(f"filtered_{request.param}", rows, request.param, embeddings, rows=rows)
+    live.rows = rows
+    return live
+
+
+def test_exclude_self(index):
+    query = index.rows[3]
+    hits = index.filtered_similarity_search_with_score(query.page_content, k=5,
+                                                       exclude={"case_number": query.metadata["case_number"]})
+    assert len(hits) == 5
+    assert query.metadata["case_number"] not in keys(hits)
+    # Without the filter the row finds itself first (exact and approximate indexes alike)
+    unfiltered = index.similarity_search_with_score(query.page_content, k=5)
+    assert keys(unfiltered)[0] == query.metadata["case_number"]
+
+
+def test_where_and_exclude(index):
+    query = index.rows[42]
+    hits = index.filtered_similarity_search_with_score(
+        query.page_content, k=5, where={"group": "G004"}, exclude={"case_number": query.metadata["case_number"]})
+    assert len(hits) == 5
+    assert all(doc.metadata["group"] == "G004" for doc, _ in hits)
+    assert query.metadata["case_number"] not in keys(hits)
+    assert [score for _, score in hits] == sorted(score for _, score in hits)
+
+
+def test_where_with_list_of_values(index):
+    hits = index.filtered_similarity_search_with_score("anything", k=30, where={"group": ["G001", "G002"]})
+    assert len(hits) == 20
+    assert {doc.metadata["group"] for doc, _ in hits} == {"G001", "G002"}
+
+
+def test_large_filter_uses_selector_or_exact_fallback(index, monkeypatch):
+    import index_sync
+
+    monkeypatch.setattr(index_sync, "FILTER_EXACT_MAX", 0)
+    hits = index.filtered_similarity_search_with_score(index.rows[10].page_content, k=3,
+                                                       where={"group": ["G001", "G002"]})
+    assert hits and all(doc.metadata["group"] in ("G001", "G002") for doc, _ in hits)
+
+
+def test_filters_follow_sync_without_a_rebuild_on_the_query_path(index):
+    index.filtered_similarity_search_with_score("warm", k=1, where={"group": "G000"})
+    rows = index.rows
+    # Delete group G000 and move row 15 into a new group
+    moved = rows[15].model_copy(update={"metadata": {**rows[15].metadata, "group": "G999"}})
+    rows[:] = [moved if i == 15 else doc for i, doc in enumerate(rows) if doc.metadata["group"] != "G000"]
+    index.sync()
+
+    # Maintained by sync(), not rebuilt by the next filtered query
+    by_value = index._positions_by_field["group"]
+    assert "G000" not in by_value
+    assert index.filtered_similarity_search_with_score("x", k=5, where={"group": "G000"}) == []
+    hits = index.filtered_similarity_search_with_score("x", k=5, where={"group": "G999"})
+    assert keys(hits) == [moved.metadata["case_number"]]
+    assert index._positions_by_field["group"] is by_value
+    hits = index.filtered_similarity_search_with_score("x", k=20, where={"group": "G001"})
+    assert sorted(keys(hits)) == sorted(d.metadata["case_number"] for d in rows if d.metadata["group"] == "G001")
+
+
+def test_index_has_the_requested_type(index, request):
+    import faiss
+
+    expected = {"flat": faiss.IndexFlat, "sq8": faiss.IndexScalarQuantizer, "pq": faiss.IndexPQ,
+                "hnsw": faiss.IndexHNSW, "ivf": faiss.IndexIVFFlat, "ivfsq8": faiss.IndexIVFScalarQuantizer,
+                "ivfpq": faiss.IndexIVFPQ}[request.node.callspec.params["index"]]
+    assert isinstance(index.store.index, expected)
+
+
+@pytest.mark.parametrize("node", ["format_case_table_node", "format_claim_table_node"])
+def test_no_results_keep_the_warning(node):
+    import nodes
+
+    warning = "⚠️ No similar documents found for MR123456."
+    state = getattr(nodes, node)({"retrieved_docs": [], "answer": warning})
+    assert state["answer"] == warning
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from conftest import build_live_index, case_documents
+from index_store import INDEX_TYPES
+
+N = 400
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_sync_round_trip(index_type, embeddings, ann_everywhere):
+    rows = case_documents(N)
+    index = build_live_index(f"sync_{index_type}", rows, index_type, embeddings, rows=rows)
+    assert index.sync() == {"added": 0, "updated": 0, "deleted": 0}
+
+    # Update every 10th row, delete the last 20 and insert 5 new ones
+    changed = case_documents(N + 5, revision=1)
+    rows[:] = [changed[i] if i % 10 == 0 else rows[i] for i in range(N - 20)] + changed[N:]
+    version = index.version
+    assert index.sync() == {"added": 5, "updated": 38, "deleted": 20}
+    assert index.version == version + 1
+    assert index.store.index.ntotal == len(rows)
+
+    # Every stored vector is still reachable by position and matches its row
+    vectors = index.vectors_for(rows)
+    expected = np.asarray(embeddings.embed_documents([d.page_content for d in rows]), dtype="float32")
+    assert vectors is not None and vectors.shape == expected.shape
+    if index_type in ("flat", "hnsw", "ivf"):
+        np.testing.assert_allclose(vectors, expected, rtol=1e-5, atol=1e-5)
+
+    # A second round of changes goes through remove_documents again
+    rows[:] = rows[5:]
+    assert index.sync() == {"added": 0, "updated": 0, "deleted": 5}
+    assert index.vectors_for(rows) is not None
+    assert index.store.index.ntotal == len(rows)
+    keys = {index.store.docstore.search(i).metadata["case_number"] for i in index.store.index_to_docstore_id.values()}
+    assert keys == {d.metadata["case_number"] for d in rows}
+
+
+@pytest.mark.parametrize("index_type", ("flat", "ivf", "hnsw"))
+def test_updated_row_is_found_by_its_new_text(index_type, embeddings, ann_everywhere):
+    rows = case_documents(N)
+    index = build_live_index(f"sync_text_{index_type}", rows, index_type, embeddings, rows=rows)
+
+    rows[7] = case_documents(N, revision=2)[7]
+    index.sync()
+    hits = index.similarity_search_with_score(rows[7].page_content, k=1)
+    assert hits[0][0].metadata["case_number"] == rows[7].metadata["case_number"]
+    assert hits[0][0].page_content == rows[7].page_content
+
+
+def test_flat_index_becomes_the_configured_type_once_the_table_grows(embeddings, monkeypatch):
+    import index_store
+
+    rows = case_documents(N)
+    index = build_live_index("sync_growth", rows, "hnsw", embeddings, rows=rows)
+    assert index_store.index_type_of(index.store.index) == "flat"
+
+    monkeypatch.setattr(index_store, "ANN_MIN_VECTORS", N + 3)
+    rows[:] = rows[5:] + case_documents(N + 10, revision=1)[N:]
+    assert index.sync() == {"added": 10, "updated": 0, "deleted": 5}
+    assert index_store.index_type_of(index.store.index) == "hnsw"
+    np.testing.assert_allclose(index.vectors_for(rows), embeddings.embed_documents([d.page_content for d in rows]),
+                               rtol=1e-5, atol=1e-5)
+    hits = index.similarity_search_with_score(rows[-1].page_content, k=1)
+    assert hits[0][0].metadata["case_number"] == rows[-1].metadata["case_number"]
+
+
+def test_saved_index_records_the_type_actually_built(embeddings, tmp_path, monkeypatch):
+    import index_store
+
+    monkeypatch.setattr(index_store, "INDEX_DIR", str(tmp_path))
+    monkeypatch.setenv("SAVED_INDEX_TYPE", "hnsw")
+    rows = case_documents(N)
+    index = build_live_index("saved", rows, "flat", embeddings)
+    index_store.save_index("saved", index.store, "fp", model_name="test-model")
+    assert index_store._read_meta("saved")["index_type"] == "flat"
+
+    # Still below ANN_MIN_VECTORS: the flat index is what would be built anyway
+    assert index_store.index_type_of(index_store.load_index("saved", "fp", embeddings).index) == "flat"
+    # Past it, the stored vectors are converted instead of re-embedded
+    monkeypatch.setattr(index_store, "ANN_MIN_VECTORS", N)
+    assert index_store.index_type_of(index_store.load_index("saved", "fp", embeddings).index) == "hnsw"
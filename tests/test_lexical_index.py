@@ -0,0 +1,92 @@
+import pytest
+from langchain_core.documents import Document
+
+import lexical_index
+from lexical_index import LexicalIndex, fuse, hybrid_search, matches_filter, tokenize
+
+
+def doc(i: int, text: str) -> Document:
+    return Document(id=f"d{i}", page_content=text, metadata={"case_number": f"C{i}"})
+
+
+DOCS = [
+    doc(0, "Login failure for admin accounts after the password reset"),
+    doc(1, "Data sync slow between nodes"),
+    doc(2, "Admin login page times out"),
+    doc(3, "Invoice totals differ from the expected amount"),
+    doc(4, "SNAP benefits recalculated after the income change"),
+    doc(5, "Login failure on mobile, works on desktop"),
+]
+
+
+@pytest.fixture
+def lexical():
+    index = LexicalIndex()
+    index.add([d.id for d in DOCS], DOCS)
+    return index
+
+
+def test_tokenize_drops_stop_words_and_punctuation():
+    assert tokenize("What is the SNAP re-calculation?") == ["snap", "re", "calculation"]
+
+
+def test_fuse_sums_reciprocal_ranks_and_deduplicates():
+    k = lexical_index.HYBRID_RRF_K
+    dense = [(DOCS[0], 0.1), (DOCS[1], 0.2), (DOCS[2], 0.3)]
+    sparse = [(DOCS[2], 9.0), (DOCS[0], 5.0)]
+    fused = fuse([dense, sparse], k=3)
+
+    assert [d.id for d, _ in fused] == ["d0", "d2", "d1"]
+    assert fused[0][1] == pytest.approx(1 / (k + 1) + 1 / (k + 2))
+    assert fused[1][1] == pytest.approx(1 / (k + 3) + 1 / (k + 1))
+    assert fused[2][1] == pytest.approx(1 / (k + 2))
+    assert fuse([dense, sparse], k=1) == fused[:1]
+    assert fuse([], k=3) == []
+
+
+def test_bm25_ranks_documents_with_more_matching_terms_first(lexical):
+    hits = lexical.search(tokenize("admin login failure"), k=3)
+    assert [d.id for d, _ in hits][:1] == ["d0"]
+    assert {d.id for d, _ in hits} == {"d0", "d2", "d5"}
+
+
+def test_remove_and_re_add(lexical):
+    lexical.remove(["d4"])
+    assert lexical.search(["snap"], k=5) == []
+    assert len(lexical) == 5
+    lexical.add(["d4"], [DOCS[4]])
+    assert [d.id for d, _ in lexical.search(["snap"], k=5)] == ["d4"]
+
+
+def test_filters_apply_to_lexical_hits(lexical):
+    accept = lambda d: matches_filter(d.metadata, exclude={"case_number": "C0"})
+    assert "d0" not in [d.id for d, _ in lexical.search(tokenize("login failure"), k=5, accept=accept)]
+    assert matches_filter({"case_number": "C1"}, where={"case_number": ["C1", "C2"]})
+    assert not matches_filter({"case_number": "C1"}, where={"case_number": "C2"})
+    assert not matches_filter({}, where={"case_number": "C1"})
+
+
+def test_keyword_fast_path_skips_dense_search_with_enough_matches(lexical):
+    calls = []
+    hits = hybrid_search("test", "login failure", 2, lambda n: calls.append(n) or [], lexical)
+    assert calls == []
+    assert len(hits) == 2 and {d.id for d, _ in hits} <= {"d0", "d5", "d2"}
+
+
+def test_keyword_fast_path_falls_through_to_dense_with_too_few_matches(lexical):
+    calls = []
+
+    def dense(n):
+        calls.append(n)
+        return [(d, float(i)) for i, d in enumerate(DOCS[:n])]
+
+    hits = hybrid_search("test", "snap", 5, dense, lexical)
+    assert calls and len(hits) == 5
+    # The only keyword match ranks first: it is in both rankings
+    assert hits[0][0].id == "d4"
+
+
+def test_non_keyword_query_fuses_dense_and_lexical(lexical):
+    dense = lambda n: [(DOCS[3], 0.5), (DOCS[1], 0.9)]
+    hits = hybrid_search("test", "why do invoice totals and the expected amount disagree", 3, dense, lexical)
+    assert hits[0][0].id == "d3"
@@ -0,0 +1,62 @@
+import pytest
+
+from load_data import iter_documents, split_text
+
+
+def words_of(chunks: list[str]) -> set[str]:
+    return {word for chunk in chunks for word in chunk.split()}
+
+
+def test_short_text_is_one_chunk():
+    assert split_text("short line", 100, 10) == ["short line"]
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(5, 1), (5, 2), (6, 1), (6, 2), (6, 4), (8, 3)])
+def test_no_word_is_cut_when_every_word_fits(chunk_size, chunk_overlap):
+    text = "abc defgh ij"
+    chunks = split_text(text, chunk_size, chunk_overlap)
+    assert words_of(chunks) == set(text.split())
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+
+
+def test_overlap_is_whole_words_within_the_overlap_size():
+    chunks = split_text("one two three four five six seven", 14, 9)
+    assert chunks == ["one two three", "two three four", "four five six", "five six seven"]
+
+
+def test_no_overlap_when_no_word_starts_inside_it():
+    # "defgh" is 5 characters, longer than the 2-character overlap
+    assert split_text("abc defgh ij", 6, 2) == ["abc", "defgh", "ij"]
+
+
+def test_text_without_spaces_is_cut_after_punctuation():
+    chunks = split_text("alpha,beta,gamma,delta", 12, 3)
+    assert chunks == ["alpha,beta,", "gamma,delta"]
+
+
+def test_only_a_word_longer_than_the_chunk_is_cut():
+    chunks = split_text("abcdefghijklmnop qr", 5, 2)
+    assert all(len(chunk) <= 5 for chunk in chunks)
+    assert "".join(chunks).replace(" ", "") == "abcdefghijklmnopqr"
+    assert chunks[-1].endswith("qr")
+
+
+def test_chunks_cover_the_text_in_order():
+    text = " ".join(f"word{i}" for i in range(200))
+    chunks = split_text(text, 50, 12)
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert words_of(chunks) == set(text.split())
+    firsts = [int(chunk.split()[0][4:]) for chunk in chunks]
+    assert firsts == sorted(firsts) and len(set(firsts)) == len(firsts)
+    # Consecutive chunks share at least one word
+    assert all(set(a.split()) & set(b.split()) for a, b in zip(chunks, chunks[1:]))
+
+
+def test_iter_documents_numbers_lines_and_chunks(tmp_path):
+    path = tmp_path / "kb.txt"
+    path.write_text("first paragraph\n\n" + "x " * 30 + "\n", encoding="utf-8")
+    docs = list(iter_documents([str(tmp_path)], chunk_size=20, chunk_overlap=4))
+    assert docs[0].page_content == "first paragraph"
+    assert docs[0].metadata == {"source": str(path), "line": 1, "chunk": 0}
+    assert {d.metadata["line"] for d in docs[1:]} == {3}
+    assert [d.metadata["chunk"] for d in docs[1:]] == list(range(len(docs) - 1))
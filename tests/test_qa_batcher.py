@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from qa_batcher import QABatcher
+
+
+class FakePipeline:
+    """Answers with the context; returns a bare dict for one item like the HF pipeline."""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self.called = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, question, context, batch_size):
+        self.called.set()
+        self.release.wait(5)
+        self.batches.append(len(question))
+        if self.fail:
+            raise RuntimeError("model crashed")
+        results = [{"answer": c, "question": q} for q, c in zip(question, context)]
+        return results[0] if len(results) == 1 else results
+
+
+def test_requests_arriving_together_share_one_batch():
+    pipeline = FakePipeline()
+    batcher = QABatcher(pipeline, max_batch_size=8, max_wait_ms=500)
+    futures = batcher.submit_many("q", [f"c{i}" for i in range(5)])
+    assert [f.result(5)["answer"] for f in futures] == [f"c{i}" for i in range(5)]
+    assert pipeline.batches == [5]
+
+    stats = batcher.stats()
+    assert stats["requests"] == 5 and stats["batches"] == 1 and stats["avg_batch_size"] == 5
+
+
+def test_batches_are_capped_and_a_single_result_is_unwrapped():
+    pipeline = FakePipeline()
+    pipeline.release.clear()
+    batcher = QABatcher(pipeline, max_batch_size=2, max_wait_ms=200)
+    # The first request is taken alone while the worker is blocked in the pipeline
+    first = batcher.submit("q", "c0")
+    assert pipeline.called.wait(5)
+    rest = batcher.submit_many("q", ["c1", "c2", "c3"])
+    pipeline.release.set()
+    assert first.result(5) == {"answer": "c0", "question": "q"}
+    assert [f.result(5)["answer"] for f in rest] == ["c1", "c2", "c3"]
+    assert pipeline.batches == [1, 2, 1]
+
+
+def test_a_failed_batch_fails_its_callers_and_the_worker_continues():
+    pipeline = FakePipeline(fail=True)
+    batcher = QABatcher(pipeline, max_wait_ms=50)
+    futures = batcher.submit_many("q", ["a", "b"])
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(5)
+
+    pipeline.fail = False
+    assert batcher("q", "again")["answer"] == "again"
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from qc_rules import evaluate_claims, summarize
+
+
+def claims(*rows) -> pd.DataFrame:
+    columns = ["claim_number", "base_rate", "units", "discount", "calculated_amount", "expected_amount"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def test_consistent_claim_passes():
+    result = evaluate_claims(claims(("CL1", 100, 3, 50, 250, 250)))
+    row = result.iloc[0]
+    assert row["qc_passed"] and row["qc_failed_rules"] == "" and row["qc_reasons"] == ""
+    assert row["recomputed_amount"] == 250
+
+
+def test_each_rule_names_its_reason():
+    result = evaluate_claims(claims(
+        ("ok", 90, 4, 30, 330, 330),         # 90*4-30 = 330: passes
+        ("mismatch", 90, 4, 30, 340, 330),   # calculated differs from recomputed and expected
+        ("expected", 80, 5, 20, 380, 400),
+        ("discount", 10, 2, 30, -10, -10),  # discount above gross, negative amount
+        ("missing", 10, None, 0, 10, 10),
+    )).set_index("claim_number")
+
+    assert result.loc["ok", "qc_passed"]
+    assert result.loc["mismatch", "qc_failed_rules"] == "calculated_mismatch,expected_mismatch"
+    assert result.loc["mismatch", "qc_reasons"] == (
+        "calculated 340 != base_rate*units-discount 330; calculated 340 != expected 330")
+    assert result.loc["expected", "qc_failed_rules"] == "expected_mismatch"
+    assert result.loc["discount", "qc_failed_rules"] == "discount_exceeds_gross,negative_amount"
+    assert result.loc["discount", "qc_reasons"].startswith("discount 30 exceeds base_rate*units 20; negative amount")
+    assert result.loc["missing", "qc_failed_rules"] == "missing_values"
+    assert not result["qc_passed"].drop("ok").any()
+
+
+def test_tolerances():
+    frame = claims(("CL1", 100, 1, 0, 100.005, 100), ("CL2", 1000, 1, 0, 1000, 1004))
+    assert evaluate_claims(frame)["qc_passed"].tolist() == [True, False]
+    assert evaluate_claims(frame, rel_tolerance=0.005)["qc_passed"].tolist() == [True, True]
+
+
+def test_string_values_are_coerced_and_input_is_untouched():
+    frame = claims(("CL1", "100", "3", "50", "250", "250"), ("CL2", "abc", 1, 0, 1, 1))
+    before = frame.copy()
+    result = evaluate_claims(frame)
+    pd.testing.assert_frame_equal(frame, before)
+    assert result["qc_passed"].tolist() == [True, False]
+    assert result.loc[1, "qc_failed_rules"] == "missing_values"
+    assert np.isnan(result.loc[1, "recomputed_amount"])
+
+
+def test_summarize_counts_each_rule():
+    summary = summarize(evaluate_claims(claims(
+        ("CL1", 100, 3, 50, 250, 250), ("CL2", 90, 4, 30, 340, 330), ("CL3", 80, 5, 20, 380, 400),
+    )))
+    assert summary == {"claims": 3, "passed": 1, "failed": 2,
+                       "by_rule": {"expected_mismatch": 2, "calculated_mismatch": 1}}
@@ -0,0 +1,120 @@
+import time
+
+import pandas as pd
+import pytest
+
+import graph
+import nodes
+from qc_runs import COMPLETED, FAILED, QCRunManager
+
+CLAIMS = pd.DataFrame([
+    # base_rate * units - discount == calculated == expected: passes
+    {"case_number": "123456", "claim_number": "CL000001", "base_rate": 100, "units": 3, "discount": 50,
+     "calculated_amount": 250, "expected_amount": 250},
+    {"case_number": "123456", "claim_number": "CL000002", "base_rate": 80, "units": 5, "discount": 20,
+     "calculated_amount": 380, "expected_amount": 380},
+    # calculated differs from base_rate * units - discount: fails
+    {"case_number": "123456", "claim_number": "CL000003", "base_rate": 90, "units": 4, "discount": 30,
+     "calculated_amount": 330, "expected_amount": 360},
+])
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+
+    def fetch_claims_for_case(case_number):
+        calls.append(case_number)
+        return CLAIMS.copy()
+
+    monkeypatch.setattr(nodes, "fetch_claims_for_case", fetch_claims_for_case)
+    return calls
+
+
+def make_manager(tmp_path) -> QCRunManager:
+    return QCRunManager(path=str(tmp_path / "qc.sqlite3"), workers=1)
+
+
+def wait_for(manager: QCRunManager, run_id: str, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = manager.status(run_id)
+        if status["status"] in (COMPLETED, FAILED):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"QC run {run_id} did not finish")
+
+
+def test_run_reports_each_claim_and_the_failures(tmp_path, fetches):
+    manager = make_manager(tmp_path)
+    status = wait_for(manager, manager.submit("MR123456"))
+
+    assert status["status"] == COMPLETED
+    assert status["case_number"] == "MR123456"
+    assert status["claims"] == status["reviewed"] == 3
+    assert sorted(status["reviewed_claims"])[:2] == ["CL000001: Reviewed ✅ Passed", "CL000002: Reviewed ✅ Passed"]
+    assert len(status["failed_claims"]) == 1 and status["failed_claims"][0].startswith("CL000003: Reviewed ❌ Failed (")
+
+    # Reviews are listed right after the task was created, and in the stored answer
+    report = status["report"]
+    assert report[1] == "✅ Created QC Task"
+    assert sorted(report[2:5]) == sorted(f"• {c}" for c in status["reviewed_claims"])
+    assert report[5].startswith("✅ Reviewed each claim") and "(2 passed, 1 failed)" in report[5]
+    assert status["answer"] == "\n".join(report)
+    manager.shutdown()
+
+
+def test_failed_run_resumes_from_its_checkpoint(tmp_path, fetches, monkeypatch):
+    attempts = []
+
+    def flaky_review(payload):
+        attempts.append(payload["claim"]["claim_number"])
+        if len(attempts) == 1:
+            raise RuntimeError("review service unavailable")
+        return nodes.qc_review_node(payload)
+
+    monkeypatch.setattr(graph, "qc_review_node", flaky_review)
+    manager = make_manager(tmp_path)
+    run_id = manager.submit("MR123456")
+    status = wait_for(manager, run_id)
+    assert status["status"] == FAILED and "review service unavailable" in status["error"]
+    assert status["next"] and status["reviewed"] < 3
+
+    assert manager.resume(run_id)
+    status = wait_for(manager, run_id)
+    assert status["status"] == COMPLETED and status["reviewed"] == 3
+    # The claims were fetched once; the resumed run continued after the fetch and task steps
+    assert fetches == ["MR123456"]
+    assert not manager.resume(run_id)
+    manager.shutdown()
+
+
+def test_incomplete_runs_are_resumed_by_a_new_manager(tmp_path, fetches):
+    manager = make_manager(tmp_path)
+    manager.shutdown()
+    # A run recorded as running by a process that went away before finishing it
+    manager._conn.execute("INSERT INTO qc_runs (run_id, question, status, created_at, updated_at) "
+                          "VALUES ('orphan', 'MR123456', 'running', 0, 0)")
+    manager._conn.commit()
+
+    restarted = make_manager(tmp_path)
+    assert restarted.resume_incomplete() == ["orphan"]
+    assert wait_for(restarted, "orphan")["status"] == COMPLETED
+    assert [r["run_id"] for r in restarted.list_runs()] == ["orphan"]
+    restarted.shutdown()
+
+
+def test_case_without_claims_stops_without_sending_the_email(tmp_path, monkeypatch):
+    evaluated = []
+    monkeypatch.setattr(nodes, "fetch_claims_for_case", lambda case_number: CLAIMS.iloc[:0])
+    monkeypatch.setattr(graph, "qc_create_task_node", lambda state: evaluated.append(state) or {})
+    manager = make_manager(tmp_path)
+    status = wait_for(manager, manager.submit("MR999999"))
+
+    assert status["status"] == COMPLETED
+    assert status["qc_status"] == "QC Incomplete"
+    assert status["report"] == ["⚠️ No claims found for case MR999999; QC was not run"]
+    assert status["answer"] == status["report"][0]
+    assert status["claims"] == status["reviewed"] == 0
+    assert evaluated == []
+    manager.shutdown()
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import query_cache
+from query_cache import CachedEmbeddings, TTLCache, cached_search, invalidate_index, normalize_query
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache, "time", SimpleNamespace(monotonic=clock))
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.put("a", 1)
+    clock.now += 59
+    assert cache.get("a") == 1
+    # A hit does not extend the entry's life
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_size_zero_disables_caching():
+    cache = TTLCache(maxsize=0)
+    assert cache.get_or_compute("a", lambda: 1) == 1
+    assert cache.get("a") is None
+
+
+def test_query_embeddings_are_cached_by_normalized_text(monkeypatch):
+    monkeypatch.setattr(query_cache, "embedding_cache", TTLCache(maxsize=10, ttl=0))
+    calls = []
+
+    class Inner:
+        model_name = "fake"
+
+        def embed_query(self, text):
+            calls.append(text)
+            return [float(len(text))]
+
+    embeddings = CachedEmbeddings(Inner())
+    assert embeddings.embed_query("  Login   FAILURE ") == embeddings.embed_query("login failure")
+    assert calls == [normalize_query("login failure")]
+
+
+def test_searches_are_keyed_by_index_version_and_invalidated(monkeypatch):
+    monkeypatch.setattr(query_cache, "search_cache", TTLCache(maxsize=10, ttl=0))
+    calls = []
+
+    def search():
+        calls.append(1)
+        return len(calls)
+
+    assert cached_search("cases", 0, "Q", 4, search) == cached_search("cases", 0, "q ", 4, search) == 1
+    assert cached_search("cases", 1, "q", 4, search) == 2
+    assert cached_search("cases:hybrid", 1, "q", 4, search) == 3
+    assert cached_search("chat", 1, "q", 4, search) == 4
+
+    invalidate_index("cases")
+    assert cached_search("cases", 1, "q", 4, search) == 5
+    assert cached_search("cases:hybrid", 1, "q", 4, search) == 6
+    assert cached_search("chat", 1, "q", 4, search) == 4
@@ -0,0 +1,73 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+import retrieval_service
+from conftest import build_live_index, case_documents
+from retrieval_service import RemoteIndex, _ServiceHandler, decode, encode
+
+
+def test_encode_decode_round_trip():
+    doc = Document(id="d1", page_content="text", metadata={"case_number": "MR1", "n": np.int64(3)})
+    value = {"hits": [(doc, np.float32(0.25))], "docs": [doc, doc], "vectors": np.eye(2, dtype="float32")}
+    decoded = decode(encode(value))
+
+    hit_doc, score = decoded["hits"][0]
+    assert hit_doc == Document(id="d1", page_content="text", metadata={"case_number": "MR1", "n": 3})
+    assert score == pytest.approx(0.25)
+    # A list of two documents is not mistaken for a (doc, score) pair
+    assert decoded["docs"] == [hit_doc, hit_doc]
+    assert decoded["vectors"].dtype == np.float32 and (decoded["vectors"] == np.eye(2)).all()
+
+
+class _Ready:
+    """Warm-up stand-in with every resource loaded."""
+
+    def status(self) -> dict:
+        return {resource: {"state": "ready", "error": None} for resource in retrieval_service.RESOURCES.values()}
+
+    def ready_modes(self) -> list:
+        return list(retrieval_service.METHODS)
+
+
+@pytest.fixture
+def service(embeddings, monkeypatch):
+    rows = case_documents(100)
+    index = build_live_index("service_cases", rows, "flat", embeddings)
+    monkeypatch.setattr(retrieval_service, "_local_indexes", lambda: {"cases": lambda: index})
+    handler = type("TestHandler", (_ServiceHandler,), {"warmup": _Ready()})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield index, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_remote_index_matches_the_local_one(service):
+    index, url = service
+    remote = RemoteIndex("cases", url)
+    remote.wait_ready(timeout=5)
+
+    query = index.store.docstore.search(index.store.index_to_docstore_id[7]).page_content
+    exclude = {"case_number": "C00007"}
+    local = index.hybrid_search_with_score(query, k=3, exclude=exclude)
+    hits = remote.hybrid_search_with_score(query, k=3, exclude=exclude)
+    assert [(d.page_content, d.metadata) for d, _ in hits] == [(d.page_content, d.metadata) for d, _ in local]
+    assert [s for _, s in hits] == pytest.approx([s for _, s in local])
+
+    # The thread's connection is reused for the next call
+    connection = remote._local.connection
+    assert len(remote.batch_similarity_search_with_score([query, "other"], k=2)) == 2
+    assert remote._local.connection is connection
+
+
+def test_only_listed_methods_are_served(service):
+    _, url = service
+    remote = RemoteIndex("cases", url)
+    with pytest.raises(AttributeError):
+        remote.sync
+    with pytest.raises(RuntimeError, match="unknown method"):
+        remote._call("sync")
@@ -1,31 +1,41 @@
 # vector_plot.py
-import matplotlib.pyplot as plt
+import io
+
+import numpy as np
+from matplotlib.figure import Figure
 from sklearn.decomposition import PCA
 
-def plot_similarity_results(docs_and_scores, embedding_model):
+def plot_similarity_results(docs_and_scores, vectors) -> tuple[bytes, list]:
+    """
+    Render the 2D PCA projection of already-stored document vectors to a PNG.
+    Uses an Agg-backed Figure (no pyplot global state), so it is safe on a server thread.
+    Returns (png_bytes, [(text, [x, y], score), ...]).
+    """
     texts = [doc.page_content for doc, _ in docs_and_scores]
-    embeddings = embedding_model.embed_documents(texts)
+    scores = [float(score) for _, score in docs_and_scores]
 
     # Reduce to 2D
-    reduced = PCA(n_components=2).fit_transform(embeddings)
-    scores = [score for _, score in docs_and_scores]
+    reduced = PCA(n_components=2).fit_transform(np.asarray(vectors, dtype="float32"))
 
     # Plot
-    plt.figure(figsize=(8, 6))
-    scatter = plt.scatter(reduced[:, 0], reduced[:, 1], c=scores, cmap='viridis', s=100)
+    fig = Figure(figsize=(8, 6))
+    ax = fig.add_subplot()
+    scatter = ax.scatter(reduced[:, 0], reduced[:, 1], c=scores, cmap='viridis', s=100)
 
     for i, text in enumerate(texts):
         snippet = text[:40].replace('\n', ' ') + "..."
-        plt.text(reduced[i, 0]+0.01, reduced[i, 1]+0.01, snippet, fontsize=8)
+        ax.text(reduced[i, 0]+0.01, reduced[i, 1]+0.01, snippet, fontsize=8)
 
-    plt.title("2D Vector Space of Similar Documents")
-    plt.xlabel("PCA Dimension 1")
-    plt.ylabel("PCA Dimension 2")
-    plt.grid(True)
-    cbar = plt.colorbar(scatter)
+    ax.set_title("2D Vector Space of Similar Documents")
+    ax.set_xlabel("PCA Dimension 1")
+    ax.set_ylabel("PCA Dimension 2")
+    ax.grid(True)
+    cbar = fig.colorbar(scatter, ax=ax)
     cbar.set_label("Similarity Score")
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
 
     # Also return reduced coordinates and scores for programmatic comparison
-    return list(zip(texts, reduced.tolist(), scores))
\ No newline at end of file
+    return buffer.getvalue(), list(zip(texts, reduced.tolist(), scores))
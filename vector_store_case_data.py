@@ -1,23 +1,27 @@
 # oracle_vector_store.py
+import os
+import threading
 from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from sentencetransformer import getSentenceModel
-from oracle_client import DB_CONN
+from index_store import fingerprint_documents, index_type_for, load_or_build, save_index
+from index_sync import LiveIndex
+from oracle_client import fetch_all_cases
+from retrieval_service import connect_remote
 
-embedding_model = HuggingFaceEmbeddings(model_name=getSentenceModel())
+# Seconds between incremental syncs against cases_table (0 disables the background sync).
+# cases_table has no change-marker column (no updated-at time or version), so each sync
+# reads every row and LiveIndex diffs them; only changed rows are re-embedded
+SYNC_INTERVAL = float(os.environ.get("CASE_INDEX_SYNC_INTERVAL", "30"))
 
-# Global vectorstore instance (already built during app startup)
+# Global vectorstore instance (built on first use or by the startup warm-up)
 case_vectorstore = None
+case_index: LiveIndex = None
+_build_lock = threading.Lock()
 
-def build_oracle_vectorstore() -> FAISS:
-    global case_vectorstore
-
-    cursor = DB_CONN.cursor()
-    cursor.execute("SELECT case_number, case_description, case_comments FROM cases_table")
-    rows = cursor.fetchall()
+def load_case_documents() -> list[Document]:
+    rows = fetch_all_cases()
 
-    documents = [
+    return [
         Document(
             page_content=f"{desc} {comments}",
             metadata={"case_number": num}
@@ -25,20 +29,46 @@ def build_oracle_vectorstore() -> FAISS:
         for num, desc, comments in rows
     ]
 
-    embeddings = HuggingFaceEmbeddings(model_name=getSentenceModel())
-    case_vectorstore = FAISS.from_documents(documents, embeddings)
+def build_oracle_vectorstore() -> FAISS:
+    global case_vectorstore, case_index
+
+    documents = load_case_documents()
+    case_vectorstore = load_or_build("cases", documents, mmap=False)
+
+    case_index = LiveIndex(
+        "cases",
+        case_vectorstore,
+        load_case_documents,
+        key_field="case_number",
+        on_synced=lambda docs: save_index("cases", case_vectorstore, fingerprint_documents(docs)),
+        index_type=index_type_for("cases"),
+    )
+    case_index.start(SYNC_INTERVAL)
     return case_vectorstore
 
+def get_case_index() -> LiveIndex:
+    """Live case index, or the retrieval service's when RETRIEVAL_SERVICE_URL is set."""
+    global case_index
+    if case_index is None:
+        with _build_lock:
+            if case_index is None:
+                remote = connect_remote("cases")
+                if remote is not None:
+                    case_index = remote
+                else:
+                    build_oracle_vectorstore()
+    return case_index
+
 def find_similar_cases(query_text: str, top_n: int = 5) -> list[tuple[str, float]]:
     """
     Perform similarity search using free-text input and return top N case summaries with scores.
     Returns a list of tuples: (case_text, score)
     """
-    if case_vectorstore is None:
+    if case_index is None:
         raise ValueError("Vectorstore not initialized. Call build_oracle_vectorstore() first.")
 
     # Perform semantic similarity search
-    results = case_vectorstore.similarity_search_with_score(query_text, k=top_n)
+    results = case_index.similarity_search_with_score(query_text, k=top_n)
 
     # Format the output as tuples: (text, score)
     return [(doc.page_content, score) for doc, score in results]
@@ -1,12 +1,153 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Callable
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from load_data import load_documents_from_txt
-from sentence_transformers import SentenceTransformer
-from sentencetransformer import getSentenceModel
+from load_data import CHUNK_OVERLAP, CHUNK_SIZE, SPLIT_VERSION, iter_documents, iter_text_files
+from index_sync import StaticIndex
+from index_store import convert_index, faiss_from_vectors, fingerprint_files, index_type_for, load_index, save_index
+from parallel_embed import EMBED_WORKERS, ParallelEmbedder
+from query_cache import CachedEmbeddings
+from retrieval_service import connect_remote
+from sentencetransformer import get_embedding_model, getSentenceModel
 
-model=getSentenceModel()
+logger = logging.getLogger(__name__)
 
-def build_vectorstore(file_path: str) -> FAISS:
-    documents = load_documents_from_txt(file_path)
-    embeddings = HuggingFaceEmbeddings(model_name=model)
-    return FAISS.from_documents(documents, embeddings)
\ No newline at end of file
+# Chunks embedded per call during ingestion
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))
+# Files/directories of the chat knowledge base
+CHAT_DATA_PATHS = os.environ.get("CHAT_DATA_PATHS", "data.txt").split(",")
+
+
+def _index_name(paths: list[str]) -> str:
+    if len(paths) == 1:
+        return f"chat_{os.path.splitext(os.path.basename(paths[0].rstrip(os.sep)))[0]}"
+    digest = hashlib.sha1("\x1f".join(sorted(os.path.abspath(p) for p in paths)).encode("utf-8")).hexdigest()
+    return f"chat_corpus_{digest[:12]}"
+
+
+def _embedded_batches(documents, batch_size: int, embeddings, workers: int):
+    """Yield (documents, vectors) per batch, in order; with workers > 1 the batches
+    are embedded by a process pool a few batches ahead of the consumer."""
+    def batches():
+        while True:
+            batch = list(islice(documents, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    if workers <= 1:
+        for batch in batches():
+            yield batch, embeddings.embed_documents([doc.page_content for doc in batch])
+        return
+
+    pending = deque()
+
+    def texts():
+        for batch in batches():
+            pending.append(batch)
+            yield [doc.page_content for doc in batch]
+
+    with ParallelEmbedder(workers) as embedder:
+        for vectors in embedder.imap(texts()):
+            yield pending.popleft(), vectors
+
+
+def ingest_documents(paths: list[str], batch_size: int = EMBED_BATCH_SIZE,
+                     progress: Callable[[dict], None] = None, workers: int = EMBED_WORKERS) -> FAISS:
+    """
+    Stream chunks from `paths`, embed them `batch_size` at a time and append to
+    one FAISS index. Only the in-flight batches of text and vectors are held besides
+    the index itself, so corpus size is bounded by index memory, not file size.
+    """
+    embeddings = CachedEmbeddings(get_embedding_model())
+    files = list(iter_text_files(paths))
+    file_position = {f: i + 1 for i, f in enumerate(files)}
+    total_bytes = sum(os.path.getsize(f) for f in files)
+    documents = iter_documents(files)
+
+    store = None
+    chunks = 0
+    start = time.perf_counter()
+    for batch, vectors in _embedded_batches(documents, batch_size, embeddings, workers):
+        texts = [doc.page_content for doc in batch]
+        metadatas = [doc.metadata for doc in batch]
+        if store is None:
+            store = faiss_from_vectors(texts, vectors, metadatas, embeddings)
+        else:
+            store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+
+        chunks += len(batch)
+        elapsed = time.perf_counter() - start
+        current = batch[-1].metadata["source"]
+        report = {
+            "chunks": chunks,
+            "files": len(files),
+            "current_file": current,
+            "file_index": file_position[current],
+            "total_bytes": total_bytes,
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(chunks / elapsed, 1) if elapsed else 0.0,
+        }
+        if progress is not None:
+            progress(report)
+        elif chunks % (batch_size * 50) < batch_size:
+            logger.info(f"Ingested {chunks} chunks ({report['chunks_per_second']}/s), "
+                        f"file {report['file_index']}/{len(files)}")
+
+    if store is None:
+        raise ValueError(f"No text found in {paths}")
+    return store
+
+
+_chat_store = None
+_chat_store_lock = threading.Lock()
+_chat_index = None
+
+
+def build_vectorstore(file_path, progress: Callable[[dict], None] = None) -> FAISS:
+    """Chat knowledge base from one path or a list of files/directories; reloaded
+    from disk when the files, chunking and embedding model are unchanged."""
+    paths = [file_path] if isinstance(file_path, str) else list(file_path)
+    name = _index_name(paths)
+    fingerprint = fingerprint_files(
+        list(iter_text_files(paths)), getSentenceModel(), extra=f"chunks:{CHUNK_SIZE}:{CHUNK_OVERLAP}:{SPLIT_VERSION}"
+    )
+
+    store = load_index(name, fingerprint)
+    if store is not None:
+        logger.info(f"Loaded {name} index from disk ({store.index.ntotal} vectors)")
+        return store
+
+    store = ingest_documents(paths, progress=progress)
+    # Ingestion appends batch by batch, so approximate indexes are trained once at the end
+    convert_index(store, index_type_for(name))
+    save_index(name, store, fingerprint)
+    return store
+
+
+def get_chat_vectorstore() -> FAISS:
+    """Chat knowledge base from CHAT_DATA_PATHS, built (or loaded) once on first use."""
+    global _chat_store
+    if _chat_store is None:
+        with _chat_store_lock:
+            if _chat_store is None:
+                _chat_store = build_vectorstore(CHAT_DATA_PATHS)
+    return _chat_store
+
+
+def get_chat_index():
+    """Search interface of the chat knowledge base: the retrieval service's when
+    RETRIEVAL_SERVICE_URL is set, otherwise a StaticIndex over get_chat_vectorstore()."""
+    global _chat_index
+    if _chat_index is None:
+        remote = connect_remote("chat")
+        index = remote if remote is not None else StaticIndex("chat", get_chat_vectorstore())
+        with _chat_store_lock:
+            if _chat_index is None:
+                _chat_index = index
+    return _chat_index